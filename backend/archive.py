@@ -0,0 +1,85 @@
+# archive.py
+# Hot/cold storage for tasks: only active tasks stay in `tasks`; everything else lives in `tasks_archive`.
+
+import asyncio
+import os
+from dotenv import load_dotenv
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import PyMongoError
+
+from database import tasks_collection, tasks_archive_collection
+from etags import bump_data_version
+
+# Load environment variables from .env file
+load_dotenv()
+# How many tasks the background mover handles per round trip, and how long it sleeps between sweeps
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "300"))
+
+ACTIVE_STATUS = "active"
+ARCHIVED_QUERY = {"status": {"$ne": ACTIVE_STATUS}}
+ACTIVE_QUERY = {"status": ACTIVE_STATUS}
+
+
+def is_archived_status(task_status: str) -> bool:
+    """Tasks in any status other than "active" belong in the archive."""
+    return task_status != ACTIVE_STATUS
+
+def collection_for_status(task_status: str):
+    """Returns the collection a task with this status is stored in."""
+    return tasks_archive_collection if is_archived_status(task_status) else tasks_collection
+
+async def _move_tasks(source, target, query: dict, limit: int = 0) -> list:
+    """
+    Moves tasks matching `query` from one collection to the other and returns the moved documents.
+
+    Documents are upserted into `target` before being deleted from `source`, so a crash
+    in between only leaves a duplicate that the next move overwrites. Each source document is
+    deleted only if it still equals the copy, so a task changed while it is being moved stays
+    in `source` with its change, and its stale copy is removed (the next move picks it up again).
+    """
+    documents = await source.find(query).limit(limit).to_list()
+    if not documents:
+        return []
+    task_ids = [document["_id"] for document in documents]
+    await target.bulk_write([ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents], ordered=False)
+    await source.bulk_write([DeleteOne(document) for document in documents], ordered=False)
+
+    remaining = {document["_id"] for document in await source.find({"_id": {"$in": task_ids}}, {"_id": 1}).to_list()}
+    if remaining:
+        await target.delete_many({"_id": {"$in": list(remaining)}})
+    return [document for document in documents if document["_id"] not in remaining]
+
+async def archive_tasks(query: dict) -> int:
+    """Moves the hot tasks matching `query` that are no longer active into the archive."""
+    return len(await _move_tasks(tasks_collection, tasks_archive_collection, {"$and": [query, ARCHIVED_QUERY]}))
+
+async def restore_tasks(query: dict) -> int:
+    """Moves the archived tasks matching `query` that are active again back into the hot collection."""
+    return len(await _move_tasks(tasks_archive_collection, tasks_collection, {"$and": [query, ACTIVE_QUERY]}))
+
+async def archive_inactive_tasks(batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Sweeps every non-active task out of the hot collection in batches, e.g. tasks completed
+    before the archive existed. Safe to interrupt and re-run; returns how many tasks moved.
+    """
+    moved_total = 0
+    while True:
+        moved = await _move_tasks(tasks_collection, tasks_archive_collection, ARCHIVED_QUERY, batch_size)
+        moved_total += len(moved)
+        # Cached list responses of these users no longer match where their tasks are stored
+        for user_id in {document["userId"] for document in moved}:
+            await bump_data_version(user_id)
+        if len(moved) < batch_size:
+            return moved_total
+
+async def run_archive_mover():
+    """Background loop started from the app lifespan; sweeps the hot collection every ARCHIVE_INTERVAL_SECONDS."""
+    while True:
+        try:
+            moved = await archive_inactive_tasks()
+            if moved:
+                print(f"Archived {moved} inactive tasks.")
+        except PyMongoError as error:
+            print(f"Archive mover failed, retrying later: {error}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
@@ -1,6 +1,11 @@
 # auth.py
 
+import base64
+import hashlib
+import hmac
 import os
+import secrets
+import time
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
@@ -8,7 +13,11 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
-from database import users_collection
+from cache import user_cache
+from bson import ObjectId
+from database import refresh_tokens_collection, users_collection
+from hashing import hash_pool, HashPoolSaturated
+from metrics import bcrypt_duration
 
 # --- CONFIGURATION ---
 
@@ -17,6 +26,13 @@ load_dotenv()
 JWT_SECRET = os.getenv("JWT_SECRET")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Refresh tokens renew access tokens without a password, so sessions outlive the 30 minutes
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# A token spent this recently may be presented again (e.g. by a second tab) and gets the same successor
+REFRESH_REUSE_GRACE_SECONDS = float(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "30"))
+# EventSource cannot send headers, so GET /events takes a token in the URL; it only opens a stream
+EVENTS_TOKEN_EXPIRE_SECONDS = float(os.getenv("EVENTS_TOKEN_EXPIRE_SECONDS", "60"))
+EVENTS_TOKEN_SCOPE = "events"
 
 # --- SETUP ---
 
@@ -26,18 +42,46 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 Scheme
 # tokenUrl="token" tells FastAPI that the client should go to the /token path to get the token.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
+# The same scheme for routes that also accept another credential, so a missing header is not an error
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login", auto_error=False)
 
 
 # --- UTILITY FUNCTIONS ---
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies a plain-text password against a hashed password."""
+def _verify_password_blocking(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    """Hashes a plain-text password."""
+def _hash_password_blocking(password: str) -> str:
     return pwd_context.hash(password)
 
+# Histogram samples for the two bcrypt operations, looked up once
+_BCRYPT_TIMINGS = {
+    _verify_password_blocking: bcrypt_duration.labels("verify"),
+    _hash_password_blocking: bcrypt_duration.labels("hash"),
+}
+
+async def _run_in_hash_pool(func, *args):
+    """Runs a bcrypt call in the hash pool, answering 503 when the pool is saturated."""
+    started = time.perf_counter()
+    try:
+        result = await hash_pool.run(func, *args)
+        _BCRYPT_TIMINGS[func].observe(time.perf_counter() - started)
+        return result
+    except HashPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a plain-text password against a hashed password."""
+    return await _run_in_hash_pool(_verify_password_blocking, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    """Hashes a plain-text password."""
+    return await _run_in_hash_pool(_hash_password_blocking, password)
+
 def create_access_token(data: dict):
     """Creates a new JWT access token."""
     to_encode = data.copy()
@@ -46,14 +90,103 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_events_token(user: dict) -> str:
+    """
+    Creates a short-lived JWT for opening GET /events, which takes it as ?token=.
+    It carries a scope, so it is refused everywhere an access token is expected.
+    """
+    expire = datetime.now(timezone.utc) + timedelta(seconds=EVENTS_TOKEN_EXPIRE_SECONDS)
+    return jwt.encode({"sub": user["email"], "scope": EVENTS_TOKEN_SCOPE, "exp": expire}, JWT_SECRET, algorithm=ALGORITHM)
+
 
-# --- CORE DEPENDENCY ---
+# --- REFRESH TOKENS ---
+# Refresh tokens are random strings; only their SHA-256 is stored, as the document _id.
+# Every refresh spends the presented token and issues a new one in the same family. A spent
+# token coming back means it was copied, so the whole family is revoked and both the thief
+# and the real user have to log in again. The exception is a replay within
+# REFRESH_REUSE_GRACE_SECONDS, which is what two tabs sharing one stored token look like.
+# A successor is derived from the token it replaces, so such a replay gets the same successor
+# back without the raw token ever being stored.
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _successor_token(token: str) -> str:
+    digest = hmac.new(JWT_SECRET.encode("utf-8"), token.encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+async def create_refresh_token(user: dict, family_id: ObjectId | None = None, token: str | None = None) -> str:
+    """Issues a refresh token for the user; a new family starts at every login."""
+    token = token or secrets.token_urlsafe(32)
+    now = datetime.now(timezone.utc)
+    await refresh_tokens_collection.insert_one({
+        "_id": _hash_refresh_token(token),
+        "familyId": family_id or ObjectId(),
+        "userId": user["_id"],
+        "email": user["email"],
+        "createdAt": now,
+        "expiresAt": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    })
+    return token
+
+async def rotate_refresh_token(token: str) -> dict:
     """
-    The main dependency to protect routes.
-    Decodes the JWT, validates its signature, and fetches the user from the database.
+    Spends a refresh token and returns a new access token and refresh token.
+    The happy path is a single update by _id: no user lookup and no bcrypt.
     """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_hash = _hash_refresh_token(token)
+    now = datetime.now(timezone.utc)
+    # Marking the token used in the same operation means two concurrent refreshes cannot both win
+    stored = await refresh_tokens_collection.find_one_and_update(
+        {"_id": token_hash, "usedAt": {"$exists": False}, "expiresAt": {"$gt": now}},
+        {"$set": {"usedAt": now}},
+    )
+    if stored is None:
+        spent = await refresh_tokens_collection.find_one({"_id": token_hash, "usedAt": {"$exists": True}}, {"familyId": 1, "userId": 1, "email": 1, "usedAt": 1})
+        if spent is not None and await _within_reuse_grace(spent, token, now):
+            return {
+                "access_token": create_access_token(data={"sub": spent["email"]}),
+                "refresh_token": _successor_token(token),
+            }
+        if spent is not None:
+            result = await refresh_tokens_collection.delete_many({"familyId": spent["familyId"]})
+            print(f"Refresh token reuse for user {spent['userId']}: revoked {result.deleted_count} token(s) in its family.")
+        raise credentials_exception
+
+    user = {"_id": stored["userId"], "email": stored["email"]}
+    return {
+        "access_token": create_access_token(data={"sub": stored["email"]}),
+        "refresh_token": await create_refresh_token(user, stored["familyId"], _successor_token(token)),
+    }
+
+async def _within_reuse_grace(spent: dict, token: str, now: datetime) -> bool:
+    """True if the token was spent moments ago and its successor has not been spent or revoked since."""
+    used_at = spent["usedAt"]
+    if used_at.tzinfo is None:
+        used_at = used_at.replace(tzinfo=timezone.utc)  # Mongo hands back naive UTC datetimes
+    if now - used_at > timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+        return False
+    successor = await refresh_tokens_collection.find_one(
+        {"_id": _hash_refresh_token(_successor_token(token)), "usedAt": {"$exists": False}, "expiresAt": {"$gt": now}},
+        {"_id": 1},
+    )
+    return successor is not None
+
+async def revoke_refresh_tokens(user_id: ObjectId) -> int:
+    """Revokes every refresh token of a user, e.g. after a password change."""
+    result = await refresh_tokens_collection.delete_many({"userId": user_id})
+    return result.deleted_count
+
+
+# --- CORE DEPENDENCY ---
+
+async def _user_from_token(token: str, scope: str | None):
+    """Decodes a JWT issued for `scope` (None for access tokens) and returns its user."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -62,12 +195,38 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("scope") != scope:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
         
-    user = users_collection.find_one({"email": email})
+    # Serve repeat requests from the user cache instead of a database round trip
+    user = await user_cache.get(email)
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        user = await users_collection.find_one({"email": email})
+        if user is None:
+            raise credentials_exception
+        await user_cache.set(email, user)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    The main dependency to protect routes.
+    Decodes the JWT, validates its signature, and fetches the user from the database.
+    """
+    return await _user_from_token(token, None)
+
+async def get_events_user(token: str | None = None, bearer_token: str | None = Depends(optional_oauth2_scheme)):
+    """
+    Authenticates GET /events with an access token in the Authorization header or, for
+    browsers' EventSource, an events token from create_events_token() as ?token=.
+    """
+    if token is not None:
+        return await _user_from_token(token, EVENTS_TOKEN_SCOPE)
+    if bearer_token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await _user_from_token(bearer_token, None)
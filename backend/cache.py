@@ -0,0 +1,94 @@
+# cache.py
+# Small in-process caches with a pluggable storage backend.
+
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+
+class CacheBackend:
+    """
+    Storage interface used by the caches in this module.
+    The default is an in-process LRU; a shared store (e.g. Redis) can implement the
+    same three coroutines so that several workers see the same entries.
+    """
+
+    async def get(self, key: str):
+        raise NotImplementedError
+
+    async def set(self, key: str, value, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+
+class InMemoryBackend(CacheBackend):
+    """A per-process store with TTL expiry and least-recently-used eviction."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl: float):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class UserCache:
+    """Caches user documents by token subject (the user's email) and counts hits and misses."""
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, email: str):
+        user = await self.backend.get(email)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    async def set(self, email: str, user: dict):
+        await self.backend.set(email, user, self.ttl)
+
+    async def invalidate(self, email: str):
+        """Drops a cached user; call this whenever the stored user document changes."""
+        await self.backend.delete(email)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "ttl_seconds": self.ttl}
+
+
+# --- Shared Cache ---
+
+# Load environment variables from .env file
+load_dotenv()
+# A short TTL bounds how long another worker can serve a stale user after a change.
+user_cache = UserCache(
+    backend=InMemoryBackend(max_size=int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+)
@@ -1,6 +1,12 @@
+import asyncio
 import os
+import weakref
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, TEXT, AsyncMongoClient, IndexModel, MongoClient
+from pymongo.errors import OperationFailure
+
+from metrics import command_listener
+from profiler import QUERY_PROFILER_ENABLED, query_profiler
 
 # Load environment variables from .env file
 load_dotenv()
@@ -8,11 +14,184 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
 
-# Establish connection to the database
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DB_NAME]
+# --- Async Client ---
+
+# PyMongo's async client binds itself to the event loop it first runs on, so we
+# keep one client per loop. Under uvicorn there is a single loop per worker; the
+# FastAPI TestClient starts a fresh loop for every request made outside a `with` block.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncMongoClient]" = weakref.WeakKeyDictionary()
+# Per loop, the generator that closes its client and the task that started it (see below)
+_close_guards: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+async def _close_on_loop_shutdown(client: AsyncMongoClient):
+    """
+    Parks at its yield until the loop shuts down its async generators, which asyncio.run(),
+    uvicorn and the TestClient's portal all do before closing the loop. The finally block
+    then closes the client on its own loop, so no connection pool outlives the loop.
+    """
+    try:
+        yield
+    finally:
+        loop = asyncio.get_running_loop()
+        if _clients.get(loop) is client:
+            del _clients[loop]
+        _close_guards.pop(loop, None)
+        await client.close()
+
+def get_client() -> AsyncMongoClient:
+    """Returns the async client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        # The listeners feed the command timings exposed at /metrics and, when enabled, the query profiler
+        listeners = [command_listener, query_profiler] if QUERY_PROFILER_ENABLED else [command_listener]
+        client = AsyncMongoClient(MONGO_URI, event_listeners=listeners)
+        _clients[loop] = client
+        guard = _close_on_loop_shutdown(client)
+        # Run it up to its yield; the loop only tracks it weakly, so keep it referenced here
+        _close_guards[loop] = (guard, loop.create_task(guard.__anext__()))
+    return client
+
+def get_database():
+    """Returns the application database on the running event loop's client."""
+    return get_client()[MONGO_DB_NAME]
+
+async def close_client():
+    """Closes the client bound to the running event loop, if one was created."""
+    loop = asyncio.get_running_loop()
+    entry = _close_guards.pop(loop, None)
+    if entry is not None:
+        guard, started = entry
+        await started
+        await guard.aclose()  # runs the guard's finally block, which closes the client
+    client = _clients.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+class _CollectionHandle:
+    """
+    A module-level stand-in for an AsyncCollection.
+    Attribute access is forwarded to the named collection on the current loop's client,
+    so routers can keep importing `courses_collection` and friends directly.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_database()[self.name], attr)
 
 # Create handles for your collections (like tables in SQL)
-users_collection = db.users
-courses_collection = db.courses
-tasks_collection = db.tasks
\ No newline at end of file
+users_collection = _CollectionHandle("users")
+courses_collection = _CollectionHandle("courses")
+tasks_collection = _CollectionHandle("tasks")
+# Tasks that are no longer active, kept out of the hot collection (see archive.py)
+tasks_archive_collection = _CollectionHandle("tasks_archive")
+# One tiny document per user, bumped on every course or task write (see etags.py)
+versions_collection = _CollectionHandle("data_versions")
+notifications_collection = _CollectionHandle("notifications")
+# Hashes of issued refresh tokens, one document per token (see auth.py)
+refresh_tokens_collection = _CollectionHandle("refresh_tokens")
+# IDs of recently purged courses, swept again for tasks written during the purge (see purge.py)
+purged_courses_collection = _CollectionHandle("purged_courses")
+# One marker document per finished one-off data migration, so it is not run again at startup
+migrations_collection = _CollectionHandle("migrations")
+
+# --- Indexes ---
+
+# Every index the application relies on, keyed by collection name.
+# ensure_indexes() creates them at startup; creation is a no-op when they already exist.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "courses": [
+        # The trailing _id lets paginated course lists walk the index in order
+        IndexModel([("userId", ASCENDING), ("_id", ASCENDING)], name="userId_id"),
+        # Only tombstoned courses are indexed, so the purge worker finds them without a scan
+        IndexModel([("deletedAt", ASCENDING)], name="deletedAt_tombstones", partialFilterExpression={"deletedAt": {"$exists": True}}),
+        # GET /search; the userId prefix keeps every search inside one user's entries (weights match search.SEARCH_FIELDS)
+        IndexModel([("userId", ASCENDING), ("courseName", TEXT), ("courseCode", TEXT), ("description", TEXT)], name="userId_text",
+                   weights={"courseName": 3, "courseCode": 2, "description": 1}),
+    ],
+    "tasks": [
+        IndexModel([("userId", ASCENDING), ("courseId", ASCENDING)], name="userId_courseId"),
+        # Status-filtered task lists, one index per sort order (see routers/tasks.py TASK_SORTS)
+        IndexModel([("userId", ASCENDING), ("status", ASCENDING), ("dueDate", ASCENDING), ("_id", ASCENDING)], name="userId_status_dueDate_id"),
+        IndexModel([("userId", ASCENDING), ("status", ASCENDING), ("priorityRank", DESCENDING), ("dueDate", ASCENDING), ("_id", ASCENDING)], name="userId_status_priorityRank_dueDate_id"),
+        IndexModel([("userId", ASCENDING), ("status", ASCENDING), ("title", ASCENDING), ("_id", ASCENDING)], name="userId_status_title_id"),
+        IndexModel([("userId", ASCENDING), ("dueDate", ASCENDING), ("_id", ASCENDING)], name="userId_dueDate_id"),
+        # Lets the reminder scheduler load upcoming due dates across all users window by window
+        IndexModel([("status", ASCENDING), ("dueDate", ASCENDING)], name="status_dueDate"),
+        IndexModel([("userId", ASCENDING), ("title", TEXT), ("description", TEXT)], name="userId_text", weights={"title": 3, "description": 1}),
+    ],
+    "tasks_archive": [
+        IndexModel([("userId", ASCENDING), ("courseId", ASCENDING)], name="userId_courseId"),
+        IndexModel([("userId", ASCENDING), ("dueDate", ASCENDING), ("_id", ASCENDING)], name="userId_dueDate_id"),
+        IndexModel([("userId", ASCENDING), ("title", TEXT), ("description", TEXT)], name="userId_text", weights={"title": 3, "description": 1}),
+    ],
+    "notifications": [
+        # Each reminder fires once per task, kind and due date, however many schedulers race for it
+        IndexModel([("taskId", ASCENDING), ("kind", ASCENDING), ("dueDate", ASCENDING)], name="taskId_kind_dueDate_unique", unique=True),
+        IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING)], name="userId_createdAt"),
+    ],
+    "refresh_tokens": [
+        # Refreshing looks tokens up by _id (the token hash); these serve revocation
+        IndexModel([("familyId", ASCENDING)], name="familyId"),
+        IndexModel([("userId", ASCENDING)], name="userId"),
+        # Mongo deletes expired tokens on its own
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ],
+    "purged_courses": [
+        # Mongo forgets purged courses once their retention passes
+        IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+    ],
+}
+
+async def ensure_indexes() -> dict:
+    """
+    Idempotently creates the indexes declared in INDEXES and reports on them.
+
+    Returns a dict keyed by collection name with:
+      - "missing": declared indexes that could not be created (e.g. duplicate emails block the unique index)
+      - "unused": existing indexes with no recorded accesses since the server started
+      - "undeclared": existing indexes that INDEXES does not know about
+    """
+    database = get_database()
+    report = {}
+    for name, models in INDEXES.items():
+        collection = database[name]
+        for model in models:
+            try:
+                await collection.create_indexes([model])
+            except OperationFailure as error:
+                print(f"Could not create index {name}.{model.document['name']}: {error}")
+
+        declared = {model.document["name"] for model in models}
+        existing = set((await collection.index_information()).keys())
+        try:
+            stats = await (await collection.aggregate([{"$indexStats": {}}])).to_list()
+            unused = sorted(s["name"] for s in stats if s["name"] != "_id_" and s["accesses"]["ops"] == 0)
+        except OperationFailure:
+            # $indexStats needs the clusterMonitor role, which some Atlas users lack
+            unused = []
+        report[name] = {
+            "missing": sorted(declared - existing),
+            "unused": unused,
+            "undeclared": sorted(existing - declared - {"_id_"}),
+        }
+    return report
+
+# --- Blocking Client ---
+
+_sync_client: MongoClient | None = None
+
+def get_sync_database():
+    """
+    Returns a blocking database handle for standalone scripts and test fixtures.
+    Never call this from inside a request handler.
+    """
+    global _sync_client
+    # One client, and so one connection pool, however often this is called
+    if _sync_client is None:
+        _sync_client = MongoClient(MONGO_URI)
+    return _sync_client[MONGO_DB_NAME]
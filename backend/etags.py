@@ -0,0 +1,51 @@
+# etags.py
+# Conditional GET support driven by a per-user data version counter.
+
+import hashlib
+from fastapi import Depends, HTTPException, Request, Response, status
+
+import auth
+from database import versions_collection
+
+
+async def bump_data_version(user_id):
+    """
+    Marks the user's courses and tasks as changed.
+    Call this after every successful write, never before, so a reader can't tag old data with a new version.
+    """
+    await versions_collection.update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+
+async def get_data_version(user_id) -> int:
+    """Returns the user's current data version; users who never wrote anything are at version 0."""
+    document = await versions_collection.find_one({"_id": user_id})
+    return document["version"] if document else 0
+
+def make_etag(user_id, version: int, request: Request) -> str:
+    """Builds a strong ETag for this user, data version and exact URL (path and query)."""
+    representation = f"{user_id}:{request.url.path}?{request.url.query}".encode("utf-8")
+    return f'"{version}-{hashlib.sha1(representation).hexdigest()[:16]}"'
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """Implements the If-None-Match comparison, which ignores the weak-validator prefix."""
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in [candidate.removeprefix("W/") for candidate in candidates]
+
+async def check_not_modified(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    A route dependency for cacheable GETs.
+    Answers 304 Not Modified when the client's ETag is still current, before any
+    course or task is read; otherwise attaches the ETag to the response.
+    Add it through the route's `dependencies=[...]` so it runs before the other dependencies.
+    """
+    # Read the version before the handler reads any data (see bump_data_version)
+    version = await get_data_version(current_user["_id"])
+    etag = make_etag(current_user["_id"], version, request)
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and etag_matches(etag, if_none_match):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
@@ -0,0 +1,198 @@
+# events.py
+# An in-process pub/sub broker that pushes course and task changes to connected clients (GET /events).
+
+import asyncio
+import itertools
+import os
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
+
+from database import get_database
+
+
+class Subscription:
+    """One connected client: a bounded queue of events waiting to be streamed to it."""
+
+    def __init__(self, user_id: str, max_queue: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = False
+
+    def offer(self, event: dict) -> bool:
+        """Queues an event without waiting; returns False when the client has fallen too far behind."""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def drop(self):
+        """Discards the backlog and wakes the stream so it can close; the client reconnects and refetches."""
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class BrokerBackend:
+    """
+    Transport interface used by EventBroker.
+    The default delivers within this process; a shared transport (e.g. a Mongo change
+    stream or Redis pub/sub) implements the same coroutines so every worker sees every event.
+    """
+
+    # Set by EventBroker; hands an event to this worker's subscribers
+    deliver = None
+
+    async def start(self):
+        pass
+
+    async def publish(self, user_id: str, event: dict):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class LocalBackend(BrokerBackend):
+    """Delivers events straight to this worker's subscribers. Enough for a single worker."""
+
+    async def publish(self, user_id: str, event: dict):
+        self.deliver(user_id, event)
+
+
+class MongoChangeStreamBackend(BrokerBackend):
+    """
+    Fans events out across workers through a Mongo collection: publishing inserts a document
+    and every worker tails inserts with a change stream. Change streams need a replica set
+    (Atlas clusters are one); old events expire through a TTL index.
+    """
+
+    def __init__(self, collection_name: str = "events", ttl_seconds: int = 3600):
+        self.collection_name = collection_name
+        self.ttl_seconds = ttl_seconds
+        self._watcher: asyncio.Task | None = None
+
+    async def start(self):
+        collection = get_database()[self.collection_name]
+        await collection.create_index("createdAt", name="createdAt_ttl", expireAfterSeconds=self.ttl_seconds)
+        self._watcher = asyncio.create_task(self._watch(collection))
+
+    async def _watch(self, collection):
+        while True:
+            try:
+                async with await collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+                    async for change in stream:
+                        document = change["fullDocument"]
+                        self.deliver(document["userId"], document["event"])
+            except PyMongoError as error:
+                print(f"Event change stream failed, reconnecting: {error}")
+                await asyncio.sleep(1)
+
+    async def publish(self, user_id: str, event: dict):
+        await get_database()[self.collection_name].insert_one(
+            {"userId": user_id, "event": event, "createdAt": datetime.now(timezone.utc)}
+        )
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+
+
+class EventBroker:
+    """
+    Routes change events to the subscriptions of the user they belong to.
+
+    Each subscription holds at most `max_queue` undelivered events. A client that falls
+    further behind is dropped rather than buffered without limit, so one stalled tab can
+    never grow the worker's memory or slow down publishers.
+    """
+
+    def __init__(self, backend: BrokerBackend, max_queue: int):
+        self.backend = backend
+        self.backend.deliver = self.deliver
+        self.max_queue = max_queue
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        # In-process consumers of every user's events, e.g. the in-memory search index
+        self._listeners: list = []
+        self._ids = itertools.count(1)
+
+        # --- Metrics ---
+        self.published = 0
+        self.delivered = 0
+        self.dropped_consumers = 0
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def subscribe(self, user_id) -> Subscription:
+        subscription = Subscription(str(user_id), self.max_queue)
+        self._subscriptions.setdefault(subscription.user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def add_listener(self, listener):
+        """Calls listener(user_id, event) for every event this worker receives; it must not block."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    async def publish(self, user_id, event_type: str, object_id=None, data: dict | None = None):
+        """
+        Publishes a compact change event, e.g. ("task.updated", task_id, formatted_task).
+        Call it after the write succeeded. A failing transport is logged, never raised,
+        so a change feed outage can't fail the write that triggered it.
+        """
+        event = {"type": event_type}
+        if object_id is not None:
+            event["id"] = str(object_id)
+        if data is not None:
+            event["data"] = data
+        self.published += 1
+        try:
+            await self.backend.publish(str(user_id), event)
+        except PyMongoError as error:
+            print(f"Could not publish {event_type} event: {error}")
+
+    def deliver(self, user_id: str, event: dict):
+        """Called by the backend for every event; queues it for each of the user's subscriptions."""
+        for listener in self._listeners:
+            listener(user_id, event)
+        event = {**event, "seq": next(self._ids)}
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            if subscription.offer(event):
+                self.delivered += 1
+            else:
+                self.dropped_consumers += 1
+                self.unsubscribe(subscription)
+                subscription.drop()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_consumers": self.dropped_consumers,
+        }
+
+
+# --- Shared Broker ---
+
+# Load environment variables from .env file
+load_dotenv()
+# Seconds between keep-alive comments on an idle stream, so proxies don't close it
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# Set EVENTS_BACKEND=mongo to share events between workers through a change stream
+_backend = MongoChangeStreamBackend() if os.getenv("EVENTS_BACKEND", "local") == "mongo" else LocalBackend()
+broker = EventBroker(backend=_backend, max_queue=int(os.getenv("EVENTS_MAX_QUEUE", "100")))
@@ -0,0 +1,108 @@
+# hashing.py
+# A bounded executor pool that keeps bcrypt work off the event loop.
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
+
+
+class HashPoolSaturated(Exception):
+    """Raised when the pool already has as much work queued as it is allowed to hold."""
+
+
+class HashPool:
+    """
+    Runs CPU-heavy hashing functions in a thread or process pool.
+
+    At most `max_workers + max_queue` calls may be in flight at once. Anything beyond
+    that is rejected immediately with HashPoolSaturated, so a burst of logins fails fast
+    instead of piling up behind the executor and freezing the worker.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown hash pool kind: {kind!r}")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self._executor: Executor | None = None
+
+        # --- Metrics ---
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing the app never forks or spawns threads
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, func, *args):
+        """Runs func(*args) in the pool and returns its result without blocking the loop."""
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HashPoolSaturated()
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+        except BaseException:
+            # Errors and cancellations are counted apart, so latency only reflects finished hashes
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        elapsed = time.perf_counter() - started
+        self.completed += 1
+        self.latency_total += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+        return result
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a free worker."""
+        return max(self.in_flight - self.max_workers, 0)
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the pool's counters and hash latency."""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "latency_avg_seconds": self.latency_total / self.completed if self.completed else 0.0,
+            "latency_max_seconds": self.latency_max,
+        }
+
+    def shutdown(self):
+        """Stops the underlying executor; a later call to run() starts a fresh one."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# --- Shared Pool ---
+
+# Load environment variables from .env file
+load_dotenv()
+# Configured from the environment; defaults to one worker per CPU and a short queue.
+hash_pool = HashPool(
+    max_workers=int(os.getenv("HASH_POOL_WORKERS", os.cpu_count() or 1)),
+    max_queue=int(os.getenv("HASH_POOL_MAX_QUEUE", "16")),
+    kind=os.getenv("HASH_POOL_KIND", "thread"),
+)
@@ -0,0 +1,194 @@
+# ical.py
+# Per-user iCalendar feeds of task due dates, rendered from a date-range query and cached until the user's data changes.
+
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+from cache import CacheBackend, InMemoryBackend
+from database import courses_collection, tasks_collection, users_collection
+from events import broker
+from purge import LIVE_COURSE_QUERY
+
+# Identifies this app in PRODID and in every event UID
+PRODUCT_ID = "-//CourseWork Lite//Task Deadlines//EN"
+UID_DOMAIN = "coursework-lite"
+# Tasks read per cursor batch while rendering
+RENDER_BATCH_SIZE = 500
+
+
+def hash_feed_token(token: str) -> str:
+    """Feed tokens are stored (and cached) only as their SHA-256, like refresh tokens."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _escape(text: str) -> str:
+    """Escapes a TEXT value (RFC 5545 section 3.3.11)."""
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+def _fold(line: str) -> str:
+    """Folds a content line into 75-octet pieces joined by CRLF and a space, never splitting a UTF-8 character."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    pieces, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Step back off UTF-8 continuation bytes
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        pieces.append(encoded[start:end].decode("utf-8"))
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(pieces)
+
+def _format_utc(value: datetime) -> str:
+    # Mongo hands back naive datetimes in UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+def render_event(task: dict, course: dict | None, stamp: str) -> str:
+    """Renders one task as a VEVENT, a point in time at its due date."""
+    due = _format_utc(task["dueDate"])
+    label = (course.get("courseCode") or course["courseName"]) if course else None
+    summary = f"[{label}] {task['title']}" if label else task["title"]
+    description = f"Priority: {task.get('priority', 'Medium')}"
+    if task.get("description"):
+        description = f"{task['description']}\n\n{description}"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{task['_id']}@{UID_DOMAIN}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{due}",
+        f"DTEND:{due}",
+        f"SUMMARY:{_escape(summary)}",
+        f"DESCRIPTION:{_escape(description)}",
+    ]
+    if course:
+        lines.append(f"CATEGORIES:{_escape(course['courseName'])}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+class CalendarFeeds:
+    """
+    Renders and caches each user's feed, keyed by user and feed token hash. A cached feed
+    stays valid until a course or task change event for its user arrives (or the TTL passes,
+    which also moves the date window along), so polling calendar clients are answered with
+    a single user lookup that confirms the token is still current.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, past_days: float, future_days: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.past_days = past_days
+        self.future_days = future_days
+        self._invalidations: set = set()  # keeps invalidation tasks referenced until they finish
+        self._renders: dict = {}  # user id -> states of renders in progress, flagged stale by a change
+        self._keys: dict = {}  # user id -> cache key (user id and token hash) of the user's cached feed
+
+        # --- Metrics ---
+        self.hits = 0
+        self.renders = 0
+
+    async def render(self, user_id) -> bytes:
+        """Renders the user's active tasks due inside the feed window, streaming them in due-date order."""
+        now = datetime.now(timezone.utc)
+        stamp = _format_utc(now)
+        courses = {
+            course["_id"]: course
+            async for course in courses_collection.find({"userId": user_id, **LIVE_COURSE_QUERY}, {"courseName": 1, "courseCode": 1})
+        }
+        query = {
+            "userId": user_id,
+            "status": "active",
+            "dueDate": {"$gte": now - timedelta(days=self.past_days), "$lte": now + timedelta(days=self.future_days)},
+        }
+        projection = {"courseId": 1, "title": 1, "description": 1, "dueDate": 1, "priority": 1}
+        parts = [
+            "BEGIN:VCALENDAR\r\n",
+            "VERSION:2.0\r\n",
+            f"PRODID:{PRODUCT_ID}\r\n",
+            "CALSCALE:GREGORIAN\r\n",
+            "X-WR-CALNAME:CourseWork Deadlines\r\n",
+        ]
+        # Served by the (userId, status, dueDate, _id) index; tasks of a deleted course are left out
+        tasks = tasks_collection.find(query, projection).sort([("dueDate", 1), ("_id", 1)]).batch_size(RENDER_BATCH_SIZE)
+        async for task in tasks:
+            course = courses.get(task["courseId"])
+            if course is not None:
+                parts.append(render_event(task, course, stamp))
+        parts.append("END:VCALENDAR\r\n")
+        self.renders += 1
+        return "".join(parts).encode("utf-8")
+
+    async def get(self, user_id, token: str) -> dict | None:
+        """
+        Returns the cached or freshly rendered feed ({"body", "etag", "lastModified"}) when
+        `token` is the user's current feed token, otherwise None.
+        """
+        token_hash = hash_feed_token(token)
+        # Checked on every request, so a rotated or revoked token stops working at once in
+        # every worker, even where the "calendar.token" event never arrives
+        user = await users_collection.find_one({"_id": user_id}, {"calendarTokenHash": 1})
+        if user is None or user.get("calendarTokenHash") != token_hash:
+            return None
+        key = f"{user_id}:{token_hash}"
+        feed = await self.backend.get(key)
+        if feed is not None:
+            self.hits += 1
+            return feed
+
+        # A change landing mid-render may not be in the body, so that body must not be cached
+        state = {"stale": False}
+        self._renders.setdefault(str(user_id), []).append(state)
+        try:
+            body = await self.render(user_id)
+        finally:
+            renders = self._renders[str(user_id)]
+            renders.remove(state)
+            if not renders:
+                del self._renders[str(user_id)]
+        feed = {
+            "body": body,
+            "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+            # HTTP dates have whole seconds
+            "lastModified": datetime.now(timezone.utc).replace(microsecond=0),
+        }
+        if not state["stale"]:
+            await self.backend.set(key, feed, self.ttl)
+            self._keys[str(user_id)] = key
+        return feed
+
+    async def invalidate(self, user_id):
+        key = self._keys.pop(str(user_id), None)
+        if key is not None:
+            await self.backend.delete(key)
+
+    def apply_event(self, user_id: str, event: dict):
+        """Broker listener: drops the user's cached feed when their courses, tasks or feed token change."""
+        event_type = event["type"]
+        if event_type.startswith(("task.", "course.")) or event_type in ("resync", "calendar.token"):
+            for state in self._renders.get(user_id, ()):
+                state["stale"] = True
+            invalidation = asyncio.get_running_loop().create_task(self.invalidate(user_id))
+            self._invalidations.add(invalidation)
+            invalidation.add_done_callback(self._invalidations.discard)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "renders": self.renders, "ttl_seconds": self.ttl}
+
+
+# --- Shared Feeds ---
+
+# Load environment variables from .env file
+load_dotenv()
+calendar_feeds = CalendarFeeds(
+    backend=InMemoryBackend(max_size=int(os.getenv("CALENDAR_CACHE_MAX_SIZE", "1024"))),
+    ttl=float(os.getenv("CALENDAR_CACHE_TTL_SECONDS", "3600")),
+    past_days=float(os.getenv("CALENDAR_PAST_DAYS", "30")),
+    future_days=float(os.getenv("CALENDAR_FUTURE_DAYS", "365")),
+)
+# Every course and task write publishes a change event; with EVENTS_BACKEND=mongo every worker sees it
+broker.add_listener(calendar_feeds.apply_event)
@@ -1,15 +1,62 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import users, courses, tasks
+
+import archive
+import database
+import purge
+from events import broker
+from hashing import hash_pool
+from metrics import MetricsMiddleware
+from pagination import NEXT_CURSOR_HEADER
+from profiler import QUERY_PROFILER_ENABLED, ProfilerMiddleware, query_profiler
+from reminders import scheduler
+from routers import users, courses, tasks, dashboard, events, metrics, admin, search, ical
+
+# --- Lifespan ---
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Runs startup work before the app serves requests and cleanup on shutdown."""
+    # Make sure every index the routers rely on exists, and report any drift
+    index_report = await database.ensure_indexes()
+    for collection_name, report in index_report.items():
+        if report["missing"]:
+            print(f"Missing indexes on '{collection_name}': {report['missing']}")
+        if report["unused"]:
+            print(f"Unused indexes on '{collection_name}': {report['unused']}")
+        if report["undeclared"]:
+            print(f"Undeclared indexes on '{collection_name}': {report['undeclared']}")
+    # Give tasks created before priorityRank existed a rank so priority sorting works
+    await tasks.backfill_priority_rank()
+    # Keep moving finished tasks out of the hot collection in the background
+    archive_mover = asyncio.create_task(archive.run_archive_mover())
+    # Finish purges of deleted courses left over from a restart, and sweep orphaned tasks
+    purge_worker = asyncio.create_task(purge.run_purge_worker())
+    # Start the transport that feeds GET /events
+    await broker.start()
+    # Fire due-soon and overdue reminders as their time comes
+    reminder_scheduler = asyncio.create_task(scheduler.run())
+    yield
+    reminder_scheduler.cancel()
+    await broker.stop()
+    archive_mover.cancel()
+    purge_worker.cancel()
+    await query_profiler.stop()
+    # Release the Mongo connection pool owned by this worker's event loop
+    await database.close_client()
+    hash_pool.shutdown()
 
 # --- Application Setup ---
 # Initialize FastAPI app
 app = FastAPI(
     title="CourseWork Lite API",
     description="API for managing academic tasks and courses.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Load environment variables from .env file
@@ -26,15 +73,29 @@ if origins:
         allow_credentials=True,      # Allows cookies to be included in requests
         allow_methods=["*"],         # Allows all methods (GET, POST, etc.)
         allow_headers=["*"],         # Allows all headers
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag"],  # Lets browsers read the pagination cursor and ETags
     )
     print(f"CORS middleware configured for origins: {origins}")
 else:
     raise Exception("CORS middleware not configured. No CORS_ORIGINS environment variable found.")
 
+if QUERY_PROFILER_ENABLED:
+    # Lets the profiler attribute each Mongo command to the endpoint that issued it
+    app.add_middleware(ProfilerMiddleware)
+    print("Query profiler enabled.")
+# Added last so it is outermost and times the whole request, including CORS handling
+app.add_middleware(MetricsMiddleware)
+
 # Include routers for different functionalities / endpoints
 app.include_router(users.router)
 app.include_router(courses.router)
 app.include_router(tasks.router)
+app.include_router(dashboard.router)
+app.include_router(search.router)
+app.include_router(ical.router)
+app.include_router(events.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
 # --- Root Endpoint ---
 
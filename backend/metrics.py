@@ -0,0 +1,254 @@
+# metrics.py
+# Minimal Prometheus-style metrics: counters, histograms and callback gauges and counters rendered in the text format.
+# Kept dependency-free and cheap enough to leave on in production: every label combination gets its
+# sample storage once, and recording a value is a dict lookup plus a few additions.
+
+import time
+from bisect import bisect_left
+from pymongo import monitoring
+
+# Latency buckets in seconds, from sub-millisecond Mongo commands up to slow bcrypt calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Counter:
+    """A monotonically increasing count per label combination; exposed with a _total suffix."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = f"{name}_total"
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict = {}
+
+    def labels(self, *values) -> _CounterChild:
+        """Returns the sample for these label values; hold on to it on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _CounterChild()
+        return child
+
+    def samples(self):
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Histogram:
+    """Cumulative latency buckets, a sum and a count per label combination."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._children: dict = {}
+
+    def labels(self, *values) -> _HistogramChild:
+        """Returns the sample for these label values; hold on to it on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def samples(self):
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(child.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {child.count}"
+
+
+class Gauge:
+    """A value read from a callback at scrape time, e.g. a pool's queue depth."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def samples(self):
+        yield f"{self.name} {_format_value(self.callback())}"
+
+
+class CallbackCounter:
+    """A running total read from a callback at scrape time, e.g. a pool's rejections; exposed with a _total suffix."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, callback):
+        self.name = f"{name}_total"
+        self.documentation = documentation
+        self.callback = callback
+
+    def samples(self):
+        yield f"{self.name} {_format_value(self.callback())}"
+
+
+class Registry:
+    """Holds every metric and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, callback) -> Gauge:
+        return self.register(Gauge(name, documentation, callback))
+
+    def callback_counter(self, name: str, documentation: str, callback) -> CallbackCounter:
+        return self.register(CallbackCounter(name, documentation, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# --- Shared Registry ---
+
+registry = Registry()
+
+http_requests = registry.counter("http_requests", "HTTP requests by method, route template and status code.", ("method", "route", "status"))
+http_request_duration = registry.histogram("http_request_duration_seconds", "HTTP request latency by method and route template.", ("method", "route"))
+mongo_command_duration = registry.histogram("mongodb_command_duration_seconds", "MongoDB command latency by collection and command.", ("collection", "command"))
+mongo_command_failures = registry.counter("mongodb_command_failures", "Failed MongoDB commands by collection and command.", ("collection", "command"))
+bcrypt_duration = registry.histogram("bcrypt_duration_seconds", "Time to hash or verify a password, including time queued for the hash pool.", ("operation",))
+
+
+# --- ASGI Middleware ---
+
+class MetricsMiddleware:
+    """
+    Records a count and a latency per request, labelled by the matched route's path template
+    (e.g. /tasks/{task_id}) so label cardinality stays bounded. Unmatched paths share one label.
+    Latency is measured up to the response headers, so streamed bodies (GET /events, exports)
+    and background tasks that run after the response do not count towards it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # (method, route) -> histogram sample and (method, route, status) -> counter sample
+        self._durations: dict = {}
+        self._counts: dict = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        recorded = False
+        async def send_wrapper(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                self._record(scope, message["status"], time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not recorded:
+                # The app failed before sending a response
+                self._record(scope, 500, time.perf_counter() - started)
+
+    def _record(self, scope, status_code: int, elapsed: float):
+        # The router stores the matched route on the shared scope dict
+        route = scope.get("route")
+        key = (scope["method"], route.path if route is not None else "unmatched")
+        duration = self._durations.get(key)
+        if duration is None:
+            duration = self._durations[key] = http_request_duration.labels(*key)
+        duration.observe(elapsed)
+        count_key = key + (status_code,)
+        count = self._counts.get(count_key)
+        if count is None:
+            count = self._counts[count_key] = http_requests.labels(*count_key)
+        count.inc()
+
+
+# --- MongoDB Command Listener ---
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Times every command the async client runs, per collection and command name."""
+
+    def __init__(self):
+        # In-flight commands: (request_id, connection_id) -> (collection, command)
+        self._pending: dict = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = "-"  # admin commands such as ping or endSessions
+        self._pending[(event.request_id, event.connection_id)] = (collection, event.command_name)
+
+    def succeeded(self, event):
+        labels = self._pending.pop((event.request_id, event.connection_id), None)
+        if labels is not None:
+            mongo_command_duration.labels(*labels).observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        labels = self._pending.pop((event.request_id, event.connection_id), None)
+        if labels is not None:
+            mongo_command_duration.labels(*labels).observe(event.duration_micros / 1_000_000)
+            mongo_command_failures.labels(*labels).inc()
+
+
+command_listener = CommandMetricsListener()
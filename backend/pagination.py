@@ -0,0 +1,68 @@
+# pagination.py
+# Keyset (cursor) pagination helpers shared by the list endpoints.
+
+import base64
+import bson
+from fastapi import HTTPException, status
+
+# Response header carrying the opaque cursor for the next page; absent on the last page.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values: list) -> str:
+    """Packs the sort-key values of the last document on a page into an opaque string."""
+    return base64.urlsafe_b64encode(bson.encode({"v": values})).decode("ascii")
+
+def decode_cursor(cursor: str, sort: list) -> list:
+    """Unpacks a cursor produced by encode_cursor, rejecting anything malformed with a 400."""
+    try:
+        values = bson.decode(base64.urlsafe_b64decode(cursor.encode("ascii")))["v"]
+    except Exception:
+        values = None
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+def _after(field: str, direction: int, value):
+    """
+    Condition matching documents that sort strictly after `value` on a single field.
+    Mongo sorts missing/null values first ascending and last descending, and range
+    operators never match null, so nulls need their own branches.
+    """
+    if direction > 0:
+        return {field: {"$ne": None}} if value is None else {field: {"$gt": value}}
+    if value is None:
+        return None
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+def keyset_filter(sort: list, values: list) -> dict:
+    """
+    Builds the filter selecting documents after the cursor position for a sort spec such as
+    [("dueDate", 1), ("_id", 1)]. The spec must end in a unique field so every position is distinct.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        after = _after(field, direction, values[i])
+        if after is None:
+            continue
+        prefix = {sort_field: value for (sort_field, _), value in zip(sort[:i], values[:i])}
+        clauses.append({**prefix, **after})
+    return {"$or": clauses}
+
+async def fetch_page(collection, query: dict, projection: dict, sort: list, limit: int, cursor: str | None):
+    """
+    Returns one page of documents matching `query` in `sort` order and the cursor for the next page.
+    One extra document is fetched to find out whether another page exists.
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+
+    documents = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list()
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor([documents[-1].get(field) for field, _ in sort])
+    return documents, next_cursor
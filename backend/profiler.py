@@ -0,0 +1,224 @@
+# profiler.py
+# An opt-in slow-query profiler built on pymongo command monitoring.
+# Logs slow queries with their filter shape and calling endpoint, samples explain plans to catch
+# collection scans and poor index selectivity, and keeps a top-N table of query shapes.
+
+import asyncio
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+# The HTTP scope of the request running the current coroutine, so a command can be traced to its endpoint
+_request_scope: ContextVar = ContextVar("request_scope", default=None)
+
+# Commands that read or write documents by filter; everything else (hello, explain, ...) is ignored
+PROFILED_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Command fields that carry the filter, per command
+FILTER_FIELDS = {"find": "filter", "count": "query", "distinct": "query", "findAndModify": "query"}
+# Session and routing fields that must not be sent back inside an explain
+_DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "cursor", "writeConcern", "readConcern"}
+
+
+def query_shape(value):
+    """Replaces every literal in a filter with "?" so queries that differ only by values group together."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        # $and/$or hold sub-filters; $in and friends hold values, which collapse to one placeholder
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return ["?"]
+    return "?"
+
+def _command_filter(command_name: str, command: dict):
+    """Returns the filter (or pipeline) of a profiled command, in shape form."""
+    if command_name in FILTER_FIELDS:
+        return query_shape(command.get(FILTER_FIELDS[command_name], {}))
+    if command_name == "aggregate":
+        return query_shape(command.get("pipeline", []))
+    # update and delete batch their statements; the first one stands for the batch
+    statements = command.get("updates") or command.get("deletes") or [{}]
+    return query_shape(statements[0].get("q", {}))
+
+def _find_stages(plan, stage: str) -> bool:
+    """True if any stage of an explain plan (at any depth) is `stage`."""
+    if isinstance(plan, dict):
+        return plan.get("stage") == stage or any(_find_stages(item, stage) for item in plan.values())
+    if isinstance(plan, list):
+        return any(_find_stages(item, stage) for item in plan)
+    return False
+
+def _find_number(document, key: str):
+    """Returns the first value stored under `key` anywhere in an explain document."""
+    if isinstance(document, dict):
+        if isinstance(document.get(key), (int, float)):
+            return document[key]
+        values = (_find_number(item, key) for item in document.values())
+    elif isinstance(document, list):
+        values = (_find_number(item, key) for item in document)
+    else:
+        return None
+    return next((value for value in values if value is not None), None)
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """
+    Times filter-based commands, aggregates them by (collection, command, filter shape, sort)
+    and reports slow ones. With `sample_rate` > 0, a slow query's shape is explained now and
+    then to flag collection scans and scans that examine far more documents than they return.
+    """
+
+    def __init__(self, slow_ms: float, sample_rate: float, examined_ratio: float, max_shapes: int, explain_cooldown: float):
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.examined_ratio = examined_ratio
+        self.max_shapes = max_shapes
+        self.explain_cooldown = explain_cooldown
+        self._pending: dict = {}
+        self._shapes: dict = {}
+        self._explained_at: dict = {}
+        self._explains: set = set()  # keeps sampled explain tasks referenced until they finish
+        self.untracked = 0
+
+    # --- Command Events ---
+
+    def started(self, event):
+        if event.command_name not in PROFILED_COMMANDS:
+            return
+        scope = _request_scope.get()
+        route = scope.get("route") if scope else None
+        endpoint = f"{scope['method']} {route.path if route else scope['path']}" if scope else "background"
+        self._pending[(event.request_id, event.connection_id)] = (event.command_name, event.database_name, dict(event.command), endpoint)
+
+    def succeeded(self, event):
+        pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is not None:
+            self._record(*pending, event.duration_micros / 1000)
+
+    def failed(self, event):
+        self._pending.pop((event.request_id, event.connection_id), None)
+
+    # --- Aggregation ---
+
+    def _record(self, command_name: str, database_name: str, command: dict, endpoint: str, duration_ms: float):
+        collection = command.get(command_name)
+        shape = json.dumps(_command_filter(command_name, command), sort_keys=True, default=str)
+        sort = json.dumps(query_shape(command.get("sort")), sort_keys=True) if command.get("sort") else None
+        key = (collection, command_name, shape, sort)
+
+        stats = self._shapes.get(key)
+        if stats is None:
+            if len(self._shapes) >= self.max_shapes:
+                self.untracked += 1
+                return
+            stats = self._shapes[key] = {
+                "collection": collection, "command": command_name, "filter": shape, "sort": sort,
+                "count": 0, "slowCount": 0, "totalMs": 0.0, "maxMs": 0.0, "endpoints": {}, "plan": None,
+            }
+        stats["count"] += 1
+        stats["totalMs"] += duration_ms
+        stats["maxMs"] = max(stats["maxMs"], duration_ms)
+        stats["endpoints"][endpoint] = stats["endpoints"].get(endpoint, 0) + 1
+
+        if duration_ms < self.slow_ms:
+            return
+        stats["slowCount"] += 1
+        print(f"Slow query ({duration_ms:.1f} ms) from {endpoint}: {command_name} {collection} filter={shape} sort={sort}")
+        if self.sample_rate and random.random() < self.sample_rate and self._explain_due(key):
+            try:
+                explain = asyncio.get_running_loop().create_task(self._explain(key, database_name, command_name, command))
+            except RuntimeError:
+                return  # no loop here (a blocking client); skip the sample
+            self._explains.add(explain)
+            explain.add_done_callback(self._explains.discard)
+
+    def _explain_due(self, key) -> bool:
+        now = time.monotonic()
+        if now - self._explained_at.get(key, float("-inf")) < self.explain_cooldown:
+            return False
+        self._explained_at[key] = now
+        return True
+
+    async def _explain(self, key, database_name: str, command_name: str, command: dict):
+        """Explains one sampled query and records (and warns about) what its plan does."""
+        from database import get_client  # imported here because database.py imports this module
+
+        explained = {field: value for field, value in command.items() if field not in _DRIVER_FIELDS}
+        if command_name == "aggregate":
+            explained["cursor"] = {}
+        try:
+            plan = await get_client()[database_name].command({"explain": explained, "verbosity": "executionStats"})
+        except PyMongoError as error:
+            print(f"Could not explain {command_name} on {command.get(command_name)}: {error}")
+            return
+
+        examined = _find_number(plan, "totalDocsExamined") or 0
+        returned = _find_number(plan, "nReturned") or 0
+        collscan = _find_stages(plan.get("queryPlanner", plan), "COLLSCAN")
+        summary = {"collscan": collscan, "docsExamined": examined, "nReturned": returned}
+        if key in self._shapes:
+            self._shapes[key]["plan"] = summary
+
+        collection, _, shape, sort = key
+        if collscan:
+            print(f"WARNING: {command_name} on '{collection}' is a COLLSCAN: filter={shape} sort={sort}")
+        elif examined > self.examined_ratio * max(returned, 1):
+            print(f"WARNING: {command_name} on '{collection}' examined {examined} documents to return {returned}: filter={shape} sort={sort}")
+
+    async def stop(self):
+        """Cancels the explains still running on this event loop; call on shutdown, before the client closes."""
+        loop = asyncio.get_running_loop()
+        explains = [explain for explain in self._explains if explain.get_loop() is loop]
+        for explain in explains:
+            explain.cancel()
+        await asyncio.gather(*explains, return_exceptions=True)
+
+    # --- Reporting ---
+
+    def top(self, limit: int = 20, order: str = "totalMs") -> list:
+        """Returns the `limit` query shapes with the highest `order` (totalMs, maxMs, count or slowCount)."""
+        shapes = sorted(self._shapes.values(), key=lambda stats: stats[order], reverse=True)[:limit]
+        return [{**stats, "avgMs": stats["totalMs"] / stats["count"]} for stats in shapes]
+
+    def reset(self):
+        self._shapes.clear()
+        self._explained_at.clear()
+        self.untracked = 0
+
+
+class ProfilerMiddleware:
+    """Makes the current request's scope visible to the profiler while the request runs."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+# --- Shared Profiler ---
+
+# Load environment variables from .env file
+load_dotenv()
+# Off by default; QUERY_PROFILER=1 turns it on for every worker
+QUERY_PROFILER_ENABLED = os.getenv("QUERY_PROFILER", "").lower() in ("1", "true", "yes")
+query_profiler = QueryProfiler(
+    slow_ms=float(os.getenv("QUERY_PROFILER_SLOW_MS", "100")),
+    # Fraction of slow queries whose shape gets explained (at most once per shape per cooldown)
+    sample_rate=float(os.getenv("QUERY_PROFILER_SAMPLE_RATE", "0")),
+    examined_ratio=float(os.getenv("QUERY_PROFILER_EXAMINED_RATIO", "100")),
+    max_shapes=int(os.getenv("QUERY_PROFILER_MAX_SHAPES", "1000")),
+    explain_cooldown=float(os.getenv("QUERY_PROFILER_EXPLAIN_COOLDOWN_SECONDS", "300")),
+)
@@ -0,0 +1,158 @@
+# purge.py
+# Cascade deletion of courses: a DELETE only tombstones the course, and its tasks are purged here in batches.
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
+
+from database import courses_collection, purged_courses_collection, tasks_collection, tasks_archive_collection
+from etags import bump_data_version
+
+# Load environment variables from .env file
+load_dotenv()
+# Tasks deleted per round trip, and the pause between batches so a large purge does not starve live traffic
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+PURGE_BATCH_PAUSE_SECONDS = float(os.getenv("PURGE_BATCH_PAUSE_SECONDS", "0.1"))
+# How often the background worker looks for unfinished purges and for orphaned tasks
+PURGE_INTERVAL_SECONDS = float(os.getenv("PURGE_INTERVAL_SECONDS", "60"))
+ORPHAN_SWEEP_INTERVAL_SECONDS = float(os.getenv("ORPHAN_SWEEP_INTERVAL_SECONDS", "3600"))
+# How long a purged course's ID is kept for those sweeps
+PURGED_COURSE_RETENTION_HOURS = float(os.getenv("PURGED_COURSE_RETENTION_HOURS", "24"))
+
+# Courses that have not been deleted; every course read goes through this filter
+LIVE_COURSE_QUERY = {"deletedAt": {"$exists": False}}
+TOMBSTONED_COURSE_QUERY = {"deletedAt": {"$exists": True}}
+
+TASK_COLLECTIONS = (tasks_collection, tasks_archive_collection)
+
+
+async def tombstone_course(course_id) -> bool:
+    """Marks a course as deleted so it disappears from every read. Returns False if it was already gone."""
+    result = await courses_collection.update_one(
+        {"_id": course_id, **LIVE_COURSE_QUERY},
+        {"$set": {"deletedAt": datetime.now(timezone.utc)}}
+    )
+    return result.modified_count == 1
+
+async def tombstoned_course_ids(user_id) -> list:
+    """IDs of the user's deleted courses whose tasks may not be purged yet; almost always empty."""
+    return [course["_id"] async for course in courses_collection.find({"userId": user_id, **TOMBSTONED_COURSE_QUERY}, {"_id": 1})]
+
+def exclude_courses(query: dict, course_ids: list) -> dict:
+    """Narrows a task query to leave out the tasks of `course_ids`, e.g. from tombstoned_course_ids()."""
+    if not course_ids:
+        return query
+    if "courseId" in query:
+        return {"$and": [query, {"courseId": {"$nin": course_ids}}]}
+    return {**query, "courseId": {"$nin": course_ids}}
+
+async def _delete_in_batches(collection, query: dict) -> int:
+    """Deletes the documents matching `query` PURGE_BATCH_SIZE at a time and returns how many were deleted."""
+    deleted_total = 0
+    while True:
+        batch = await collection.find(query, {"_id": 1}).limit(PURGE_BATCH_SIZE).to_list()
+        if not batch:
+            return deleted_total
+        result = await collection.delete_many({"_id": {"$in": [document["_id"] for document in batch]}})
+        deleted_total += result.deleted_count
+        if len(batch) < PURGE_BATCH_SIZE:
+            return deleted_total
+        await asyncio.sleep(PURGE_BATCH_PAUSE_SECONDS)
+
+async def purge_course(course: dict) -> int:
+    """
+    Deletes a tombstoned course's tasks in throttled batches, then the course itself.
+    The tombstone is removed last, so an interrupted purge is picked up again by the worker.
+    The course ID is remembered for a while, so tasks written while the purge ran are swept later.
+    """
+    deleted = 0
+    for collection in TASK_COLLECTIONS:
+        # The userId lets the (userId, courseId) index serve the lookup
+        deleted += await _delete_in_batches(collection, {"userId": course["userId"], "courseId": course["_id"]})
+    await purged_courses_collection.update_one(
+        {"_id": course["_id"]},
+        {"$set": {"userId": course["userId"], "expiresAt": datetime.now(timezone.utc) + timedelta(hours=PURGED_COURSE_RETENTION_HOURS)}},
+        upsert=True
+    )
+    await courses_collection.delete_one({"_id": course["_id"], **TOMBSTONED_COURSE_QUERY})
+    if deleted:
+        await bump_data_version(course["userId"])
+    return deleted
+
+async def purge_deleted_courses() -> int:
+    """Finishes the purge of every tombstoned course, e.g. ones left over from before a restart."""
+    purged = 0
+    async for course in courses_collection.find(TOMBSTONED_COURSE_QUERY, {"userId": 1}):
+        await purge_course(course)
+        purged += 1
+    return purged
+
+async def sweep_purged_courses() -> int:
+    """
+    Deletes tasks written to recently purged courses, e.g. created just as their course was
+    deleted. Each course is swept through the (userId, courseId) index, so the cost depends
+    on how many courses were purged lately, not on the size of the task collections.
+    """
+    deleted = 0
+    async for course in purged_courses_collection.find({}, {"userId": 1}):
+        swept = 0
+        for collection in TASK_COLLECTIONS:
+            swept += await _delete_in_batches(collection, {"userId": course["userId"], "courseId": course["_id"]})
+        if swept:
+            await bump_data_version(course["userId"])
+        deleted += swept
+    return deleted
+
+async def _delete_orphans(collection, groups: list) -> int:
+    """Deletes the tasks of every course in `groups` (rows of {_id: courseId, userIds}) that no longer exists."""
+    course_ids = [group["_id"] for group in groups]
+    existing = {course["_id"] for course in await courses_collection.find({"_id": {"$in": course_ids}}, {"_id": 1}).to_list()}
+    orphaned = [group for group in groups if group["_id"] not in existing]
+    if not orphaned:
+        return 0
+    deleted = await _delete_in_batches(collection, {"courseId": {"$in": [group["_id"] for group in orphaned]}})
+    for user_id in {user_id for group in orphaned for user_id in group["userIds"]}:
+        await bump_data_version(user_id)
+    return deleted
+
+async def sweep_orphaned_tasks() -> int:
+    """
+    Deletes tasks whose course no longer exists at all, whenever they were left behind.
+    Tombstoned courses still exist and are left to the purge. This reads every task, so it
+    is not run in the background; operators start it with POST /admin/orphans/sweep.
+
+    Course IDs are streamed from a $group aggregation (which may spill to disk) and checked
+    PURGE_BATCH_SIZE at a time, so no single result has to hold every course ID in the collection.
+    """
+    pipeline = [{"$group": {"_id": "$courseId", "userIds": {"$addToSet": "$userId"}}}]
+    deleted = 0
+    for collection in TASK_COLLECTIONS:
+        groups = []
+        async for group in await collection.aggregate(pipeline, allowDiskUse=True, batchSize=PURGE_BATCH_SIZE):
+            groups.append(group)
+            if len(groups) == PURGE_BATCH_SIZE:
+                deleted += await _delete_orphans(collection, groups)
+                groups = []
+        if groups:
+            deleted += await _delete_orphans(collection, groups)
+    return deleted
+
+async def run_purge_worker():
+    """Background loop started from the app lifespan; resumes unfinished purges and periodically sweeps purged courses."""
+    last_sweep = None
+    while True:
+        try:
+            purged = await purge_deleted_courses()
+            if purged:
+                print(f"Purged {purged} deleted courses.")
+            if last_sweep is None or time.monotonic() - last_sweep >= ORPHAN_SWEEP_INTERVAL_SECONDS:
+                last_sweep = time.monotonic()
+                orphaned = await sweep_purged_courses()
+                if orphaned:
+                    print(f"Deleted {orphaned} orphaned tasks.")
+        except PyMongoError as error:
+            print(f"Purge worker failed, retrying later: {error}")
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
@@ -0,0 +1,117 @@
+# ratelimit.py
+# Token-bucket throttling for the login and registration endpoints, with a pluggable bucket store.
+# Every attempt at these endpoints costs a bcrypt hash or verify, so floods are turned away here,
+# before the hash pool or Mongo are touched.
+
+import math
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+
+from metrics import registry
+
+throttled_attempts = registry.counter("auth_throttled_attempts", "Login and registration attempts rejected by the rate limiter.", ("endpoint", "scope"))
+
+
+class RateLimitStore:
+    """
+    Storage interface for token buckets.
+    The default keeps buckets in process; a shared store (e.g. Redis, with the refill and take
+    done atomically in a Lua script) can implement the same coroutine so that every worker
+    draws from the same buckets.
+    """
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        """Takes one token from `key`'s bucket. Returns 0 on success, else the seconds until a token is available."""
+        raise NotImplementedError
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """
+    A per-process store. Buckets are refilled lazily when they are next used, and the
+    least recently used ones are evicted beyond `max_size` (an evicted bucket starts full again).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._buckets: OrderedDict = OrderedDict()  # key -> (tokens, monotonic time of last update)
+
+    async def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            retry_after = 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            retry_after = (1 - tokens) / refill_per_second
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self):
+        self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class TokenBucket:
+    """A bucket size and refill rate; `capacity` attempts may burst, then `refill_per_second` on average."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+
+
+class LoginThrottle:
+    """
+    Limits attempts per client IP and per account (the email being logged into or registered).
+    The IP bucket is checked first, so a client that is already throttled does not drain
+    the bucket of the accounts it is guessing at.
+    """
+
+    def __init__(self, store: RateLimitStore, per_ip: TokenBucket, per_account: TokenBucket):
+        self.store = store
+        self.per_ip = per_ip
+        self.per_account = per_account
+
+    async def check(self, request: Request, endpoint: str, account: str):
+        """Raises 429 with a Retry-After header if this attempt is over either limit."""
+        # Behind a proxy, run uvicorn with --proxy-headers so this is the real client address
+        client_ip = request.client.host if request.client else "unknown"
+        for scope, key, bucket in (
+            ("ip", f"{endpoint}:ip:{client_ip}", self.per_ip),
+            ("account", f"{endpoint}:account:{account.strip().lower()}", self.per_account),
+        ):
+            retry_after = await self.store.take(key, bucket.capacity, bucket.refill_per_second)
+            if retry_after:
+                throttled_attempts.labels(endpoint, scope).inc()
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many attempts. Please try again later.",
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+
+
+# --- Shared Throttle ---
+
+# Load environment variables from .env file
+load_dotenv()
+# The IP bucket is generous because a whole classroom can share one address; the account
+# bucket is what stops password guessing against a single user.
+login_throttle = LoginThrottle(
+    store=InMemoryRateLimitStore(max_size=int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))),
+    per_ip=TokenBucket(
+        capacity=float(os.getenv("RATE_LIMIT_IP_BURST", "60")),
+        refill_per_second=float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "30")) / 60,
+    ),
+    per_account=TokenBucket(
+        capacity=float(os.getenv("RATE_LIMIT_ACCOUNT_BURST", "10")),
+        refill_per_second=float(os.getenv("RATE_LIMIT_ACCOUNT_PER_MINUTE", "5")) / 60,
+    ),
+)
@@ -0,0 +1,199 @@
+# reminders.py
+# A background scheduler that fires "due soon" and "overdue" reminders from a timer heap.
+
+import asyncio
+import heapq
+import itertools
+import os
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from database import courses_collection, notifications_collection, tasks_collection
+from events import broker
+from purge import LIVE_COURSE_QUERY
+
+DUE_SOON = "dueSoon"
+OVERDUE = "overdue"
+
+
+def _utc_naive(value: datetime) -> datetime:
+    """
+    Mongo hands back naive UTC datetimes with millisecond precision; bring client-supplied
+    values to the same form, so a task scheduled from a request matches it when re-read.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ReminderDelivery:
+    """
+    Output interface for fired reminders. The default stores in-app notifications; email or
+    web push can implement the same coroutine.
+    """
+
+    async def deliver(self, reminder: dict):
+        raise NotImplementedError
+
+
+class NotificationDelivery(ReminderDelivery):
+    """Writes each reminder to the notifications collection and publishes it on the change feed."""
+
+    async def deliver(self, reminder: dict):
+        await notifications_collection.insert_one(reminder)
+        await broker.publish(reminder["userId"], f"reminder.{reminder['kind']}", reminder["taskId"], {
+            "taskId": str(reminder["taskId"]),
+            "title": reminder["title"],
+            "dueDate": reminder["dueDate"],
+            "kind": reminder["kind"],
+        })
+
+
+class ReminderScheduler:
+    """
+    Keeps the fire times of upcoming reminders for active tasks in a min-heap.
+
+    Only tasks due within `horizon` are held in memory; the rest are loaded window by
+    window from the (status, dueDate) index as time moves on. Changed and deleted tasks
+    are not removed from the heap: each task's current due date is tracked separately and
+    stale heap entries are skipped when they come up. Before firing, the task is re-read,
+    and the notifications collection's unique (taskId, kind, dueDate) index makes every
+    reminder fire exactly once, even with several workers running a scheduler.
+    """
+
+    def __init__(self, delivery: ReminderDelivery, due_soon: timedelta, horizon: timedelta):
+        self.delivery = delivery
+        self.due_soon = due_soon
+        self.horizon = horizon
+        self._heap: list = []
+        self._due_dates: dict = {}  # task _id -> due date the heap entries were made for
+        self._sequence = itertools.count()  # breaks ties so tasks are never compared
+        self._loaded_until: datetime | None = None
+        self._wakeup: asyncio.Event | None = None
+
+        # --- Metrics ---
+        self.fired = 0
+        self.skipped = 0
+
+    def schedule(self, task: dict):
+        """Adds or moves a task's reminders. Call after a task is created or changed."""
+        due_date = task.get("dueDate")
+        if task.get("status") != "active" or due_date is None:
+            self.unschedule(task["_id"])
+            return
+        due_date = _utc_naive(due_date)
+        # Tasks beyond the loaded window are picked up by the next window load
+        if self._loaded_until is None or due_date > self._loaded_until:
+            self._due_dates.pop(task["_id"], None)
+            return
+        if self._due_dates.get(task["_id"]) == due_date:
+            return
+        self._due_dates[task["_id"]] = due_date
+        heapq.heappush(self._heap, (due_date - self.due_soon, next(self._sequence), task["_id"], DUE_SOON, due_date))
+        heapq.heappush(self._heap, (due_date, next(self._sequence), task["_id"], OVERDUE, due_date))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def unschedule(self, task_id):
+        """Forgets a task's reminders. Call after a task is deleted, completed or loses its due date."""
+        self._due_dates.pop(task_id, None)
+
+    async def load_window(self, until: datetime):
+        """Schedules every active task due up to `until` that is not loaded yet."""
+        query = {"status": "active", "dueDate": {"$lte": until}}
+        if self._loaded_until is not None:
+            query["dueDate"]["$gt"] = self._loaded_until
+        else:
+            # First load: anything still unreminded from the last day, e.g. missed during a restart
+            query["dueDate"]["$gte"] = _now() - self.due_soon
+        tasks = tasks_collection.find(query, {"dueDate": 1, "status": 1}).sort("dueDate", 1)
+        previous_limit, self._loaded_until = self._loaded_until, until
+        try:
+            async for task in tasks:
+                self.schedule(task)
+        except PyMongoError:
+            # Load the whole window again next time
+            self._loaded_until = previous_limit
+            raise
+
+    async def _fire(self, task_id, kind: str, due_date: datetime):
+        task = await tasks_collection.find_one({"_id": task_id, "status": "active"}, {"userId": 1, "courseId": 1, "dueDate": 1, "title": 1})
+        if task is None or task.get("dueDate") is None or _utc_naive(task["dueDate"]) != due_date:
+            self.skipped += 1
+            return
+        # The task's course may have been deleted, with the purge not yet through its tasks
+        if await courses_collection.find_one({"_id": task["courseId"], **LIVE_COURSE_QUERY}, {"_id": 1}) is None:
+            self.skipped += 1
+            return
+        reminder = {
+            "userId": task["userId"],
+            "taskId": task_id,
+            "kind": kind,
+            "dueDate": due_date,
+            "title": task["title"],
+            "createdAt": _now(),
+            "read": False,
+        }
+        try:
+            await self.delivery.deliver(reminder)
+            self.fired += 1
+        except DuplicateKeyError:
+            # Already fired, by this worker before a restart or by another worker
+            self.skipped += 1
+
+    async def run_due(self) -> int:
+        """Fires every reminder whose time has come and returns how many heap entries were processed."""
+        processed = 0
+        now = _now()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, task_id, kind, due_date = heapq.heappop(self._heap)
+            processed += 1
+            if self._due_dates.get(task_id) != due_date:
+                continue  # the task changed or was removed after this entry was pushed
+            if kind == OVERDUE:
+                self._due_dates.pop(task_id, None)
+            elif due_date <= now:
+                continue  # already overdue, so only the overdue reminder is sent
+            await self._fire(task_id, kind, due_date)
+        return processed
+
+    async def run(self):
+        """Background loop started from the app lifespan."""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                now = _now()
+                if self._loaded_until is None or self._loaded_until - now < self.horizon / 2:
+                    await self.load_window(now + self.horizon)
+                await self.run_due()
+            except PyMongoError as error:
+                print(f"Reminder scheduler failed, retrying later: {error}")
+
+            # Sleep until the next reminder, the next window load, or a newly scheduled task
+            now = _now()
+            wake_at = self._loaded_until - self.horizon / 2 if self._loaded_until else now + timedelta(minutes=1)
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max((wake_at - now).total_seconds(), 0.05))
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {"scheduled": len(self._due_dates), "heap_size": len(self._heap), "fired": self.fired, "skipped": self.skipped}
+
+
+# --- Shared Scheduler ---
+
+# Load environment variables from .env file
+load_dotenv()
+scheduler = ReminderScheduler(
+    delivery=NotificationDelivery(),
+    due_soon=timedelta(hours=float(os.getenv("REMINDER_DUE_SOON_HOURS", "24"))),
+    horizon=timedelta(hours=float(os.getenv("REMINDER_HORIZON_HOURS", "48"))),
+)
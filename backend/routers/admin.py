@@ -0,0 +1,90 @@
+import os
+import secrets
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
+
+import purge
+from profiler import QUERY_PROFILER_ENABLED, query_profiler
+
+# Load environment variables from .env file
+load_dotenv()
+# Operators call these endpoints with "Authorization: Bearer <ADMIN_TOKEN>"; without it they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# --- Pydantic Models ---
+
+class QueryPlanSummary(BaseModel):
+    collscan: bool
+    docsExamined: int
+    nReturned: int
+
+class QueryShapeStats(BaseModel):
+    collection: Optional[str] = None
+    command: str
+    filter: str
+    sort: Optional[str] = None
+    count: int
+    slowCount: int
+    totalMs: float
+    avgMs: float
+    maxMs: float
+    # Calls per endpoint, e.g. {"GET /tasks/": 12}
+    endpoints: Dict[str, int]
+    # Filled in once a slow run of this shape has been explained
+    plan: Optional[QueryPlanSummary] = None
+
+class QueryReport(BaseModel):
+    enabled: bool
+    slowMs: float
+    untrackedShapes: int
+    queries: List[QueryShapeStats]
+
+class SweepResult(BaseModel):
+    deleted: int
+
+# --- Dependencies ---
+
+async def require_admin(request: Request):
+    """Accepts only requests carrying the ADMIN_TOKEN; answers 404 so the endpoints stay hidden otherwise."""
+    authorization = request.headers.get("Authorization", "")
+    if not ADMIN_TOKEN or not secrets.compare_digest(authorization, f"Bearer {ADMIN_TOKEN}"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+# --- Router Setup ---
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)],
+    include_in_schema=False
+)
+
+# --- API Endpoints ---
+
+@router.get("/queries", response_model=QueryReport)
+async def get_query_report(
+    limit: int = Query(20, ge=1, le=500),
+    order: Literal["totalMs", "maxMs", "count", "slowCount"] = "totalMs"
+):
+    """Returns the most expensive query shapes seen by this worker's profiler (QUERY_PROFILER=1)."""
+    return {
+        "enabled": QUERY_PROFILER_ENABLED,
+        "slowMs": query_profiler.slow_ms,
+        "untrackedShapes": query_profiler.untracked,
+        "queries": query_profiler.top(limit, order),
+    }
+
+@router.delete("/queries", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_query_report():
+    """Clears the profiler's table, e.g. after deploying an index."""
+    query_profiler.reset()
+
+@router.post("/orphans/sweep", response_model=SweepResult)
+async def sweep_orphaned_tasks():
+    """
+    Deletes every task whose course no longer exists. This reads the whole task collections,
+    so it is a maintenance command rather than part of the background purge worker.
+    """
+    return {"deleted": await purge.sweep_orphaned_tasks()}
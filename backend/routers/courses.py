@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status, Depends, Query, Response
 from pydantic import BaseModel, Field
 from typing import Optional
 from bson import ObjectId
 from bson.errors import InvalidId
+from pymongo import ReturnDocument
 
 import auth
-from database import courses_collection, tasks_collection
+from etags import bump_data_version, check_not_modified
+from events import broker
+from database import courses_collection
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, fetch_page
+from purge import LIVE_COURSE_QUERY, purge_course, tombstone_course
+from serialization import trusted_response
 
 # --- Pydantic Models (Data Schemas) ---
 class CourseBase(BaseModel):
@@ -34,14 +40,19 @@ router = APIRouter(
 )
 
 # --- Utility Functions ---
+# Only the fields format_course reads; _id is always returned
+COURSE_PROJECTION = {"courseName": 1, "courseCode": 1, "colorTag": 1, "description": 1}
+# Keyset order for paginated course lists (creation order)
+COURSE_PAGE_SORT = [("_id", 1)]
+
 def format_course(course) -> dict:
-    """Formats the course document from DB as a dictionary."""
+    """Formats the course document from DB as a dictionary, with keys in CourseResponse's field order."""
     return {
-        "id": str(course["_id"]),
         "courseName": course["courseName"],
         "courseCode": course.get("courseCode"),
         "colorTag": course.get("colorTag"),
-        "description": course.get("description")
+        "description": course.get("description"),
+        "id": str(course["_id"])
     }
 
 async def get_course_or_404(
@@ -54,8 +65,8 @@ async def get_course_or_404(
     """
     try:
         # This query ensures a user can only access their own courses
-        query = {"_id": ObjectId(course_id), "userId": current_user["_id"]}
-        course = courses_collection.find_one(query)
+        query = {"_id": ObjectId(course_id), "userId": current_user["_id"], **LIVE_COURSE_QUERY}
+        course = await courses_collection.find_one(query)
         if course is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
         return course
@@ -70,53 +81,87 @@ async def create_course(course: CourseCreate, current_user: dict = Depends(auth.
     course_document = course.model_dump()
     course_document["userId"] = current_user["_id"]  # Associate course with the authenticated user
 
-    result = courses_collection.insert_one(course_document)
+    result = await courses_collection.insert_one(course_document)
     if not result.acknowledged:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create course."
         )
-    created_course = courses_collection.find_one({"_id": result.inserted_id})
-    if not created_course:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Course not found after creation."
-        )
-    return format_course(created_course)
+    await bump_data_version(current_user["_id"])
+    # insert_one has already stored the new _id on the document, so no read-back is needed
+    formatted_course = format_course(course_document)
+    await broker.publish(current_user["_id"], "course.created", course_document["_id"], formatted_course)
+    return formatted_course
+
+@router.get("/", response_model=list[CourseResponse],status_code=status.HTTP_200_OK, dependencies=[Depends(check_not_modified)])
+async def get_all_courses(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Retrieves all courses for the authenticated user.
+    Pass `limit` (and then the returned X-Next-Cursor header as `cursor`) to page through them.
+    """
+    query = {"userId": current_user["_id"], **LIVE_COURSE_QUERY}
+    if limit is None and cursor is None:
+        courses = courses_collection.find(query, COURSE_PROJECTION)
+        return trusted_response([format_course(course) async for course in courses], response)
 
-@router.get("/", response_model=list[CourseResponse],status_code=status.HTTP_200_OK)
-async def get_all_courses(current_user: dict = Depends(auth.get_current_user)):
-    """Retrieves all courses for the authenticated user."""
-    courses = courses_collection.find({"userId": current_user["_id"]})
-    return [format_course(course) for course in courses]
+    courses, next_cursor = await fetch_page(
+        courses_collection, query, COURSE_PROJECTION, COURSE_PAGE_SORT, limit or DEFAULT_PAGE_SIZE, cursor
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return trusted_response([format_course(course) for course in courses], response)
 
-@router.get("/{course_id}", response_model=CourseResponse, status_code=status.HTTP_200_OK)
+@router.get("/{course_id}", response_model=CourseResponse, status_code=status.HTTP_200_OK, dependencies=[Depends(check_not_modified)])
 async def get_single_course(course: dict = Depends(get_course_or_404)):
     """Retrieves a specific course by its ID."""
     return format_course(course)
 
 @router.put("/{course_id}", status_code=status.HTTP_200_OK)
 async def update_course(
-    update_data: CourseUpdate, 
-    course: dict = Depends(get_course_or_404)
+    course_id: str,
+    update_data: CourseUpdate,
+    current_user: dict = Depends(auth.get_current_user)
 ):
-    """Updates the details of a specific course."""
-    courses_collection.update_one(
-        {"_id": course["_id"]},
-        {"$set": update_data.model_dump()}
-    )
+    """
+    Updates the details of a specific course.
+    The ownership check, the update and the read of the result are one atomic operation.
+    """
+    try:
+        query = {"_id": ObjectId(course_id), "userId": current_user["_id"], **LIVE_COURSE_QUERY}
+    except InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Course ID format")
 
-    updated_course = courses_collection.find_one({"_id": course["_id"]})
-    return format_course(updated_course)
+    updated_course = await courses_collection.find_one_and_update(
+        query,
+        {"$set": update_data.model_dump()},
+        projection=COURSE_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if updated_course is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+    await bump_data_version(current_user["_id"])
+    formatted_course = format_course(updated_course)
+    await broker.publish(current_user["_id"], "course.updated", updated_course["_id"], formatted_course)
+    return formatted_course
 
 @router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_course(course: dict = Depends(get_course_or_404)):
-    """Deletes a specific course and all associated tasks."""
+async def delete_course(background_tasks: BackgroundTasks, course: dict = Depends(get_course_or_404)):
+    """
+    Deletes a specific course and all associated tasks.
+    The course is tombstoned in one write so the request returns at once; its tasks are
+    purged in batches after the response is sent (and by the purge worker if that is interrupted).
+    """
     # Dependency ensures course exists and belongs to the user
-    course_id = course["_id"]
-    # Delete Course
-    courses_collection.delete_one({"_id": course_id})
-    # Delete all tasks associated with this course
-    tasks_collection.delete_many({"courseId": course_id})
+    if not await tombstone_course(course["_id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+    await bump_data_version(course["userId"])
+    # Clients drop the course's tasks along with it, so no per-task events follow
+    await broker.publish(course["userId"], "course.deleted", course["_id"])
+    background_tasks.add_task(purge_course, course)
 
     return
\ No newline at end of file
@@ -0,0 +1,91 @@
+import asyncio
+from fastapi import APIRouter, Depends, Query, Response, status
+from pydantic import BaseModel
+from typing import List, Optional
+
+import auth
+from database import courses_collection, tasks_collection, tasks_archive_collection
+from pagination import MAX_PAGE_SIZE, fetch_page
+from purge import LIVE_COURSE_QUERY, exclude_courses, tombstoned_course_ids
+from serialization import trusted_response
+from routers.courses import COURSE_PROJECTION, CourseResponse, format_course
+from routers.tasks import (
+    REMINDER_WINDOW_HOURS, MAX_REMINDER_WINDOW_HOURS, TASK_PROJECTION, TASK_SORTS,
+    RemindersResponse, TaskResponse, TaskSort, fetch_reminders, format_task,
+)
+
+# --- Pydantic Models ---
+
+class DashboardResponse(BaseModel):
+    """Everything the dashboard page needs on load."""
+    courses: list[CourseResponse]
+    tasks: List[TaskResponse]
+    # Continue with GET /tasks/?status=active&limit=...&cursor=<nextTasksCursor>
+    nextTasksCursor: Optional[str] = None
+    # Task counts per course ID, split by status, e.g. {"<courseId>": {"active": 3, "complete": 1}}
+    taskCounts: dict[str, dict[str, int]]
+    reminders: RemindersResponse
+
+# --- Router Setup ---
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["Dashboard"],
+    dependencies=[Depends(auth.get_current_user)] # Protect all routes
+)
+
+# --- Helper Functions ---
+
+async def count_tasks_by_course(user_id, excluded_course_ids: list) -> dict:
+    """Counts the user's tasks per course and status with one aggregation per collection (hot and archive)."""
+    pipeline = [
+        {"$match": exclude_courses({"userId": user_id}, excluded_course_ids)},
+        {"$group": {"_id": {"courseId": "$courseId", "status": "$status"}, "count": {"$sum": 1}}},
+    ]
+    counts = {}
+    for collection in (tasks_collection, tasks_archive_collection):
+        async for row in await collection.aggregate(pipeline):
+            course_counts = counts.setdefault(str(row["_id"]["courseId"]), {})
+            status_name = row["_id"]["status"]
+            # The mover may briefly leave a task in both collections; counts are approximate for that instant
+            course_counts[status_name] = course_counts.get(status_name, 0) + row["count"]
+    return counts
+
+async def fetch_active_tasks(user_id, limit: Optional[int], excluded_course_ids: list):
+    """Returns the user's active tasks in due-date order, or just the first page when a limit is given."""
+    query = exclude_courses({"userId": user_id, "status": "active"}, excluded_course_ids)
+    sort_spec = TASK_SORTS[TaskSort.due_date]
+    if limit is None:
+        return await tasks_collection.find(query, TASK_PROJECTION).sort(sort_spec).to_list(), None
+    return await fetch_page(tasks_collection, query, TASK_PROJECTION, sort_spec, limit, None)
+
+# --- API Endpoints ---
+
+@router.get("", response_model=DashboardResponse, status_code=status.HTTP_200_OK)
+async def get_dashboard(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    window_hours: float = Query(REMINDER_WINDOW_HOURS, gt=0, le=MAX_REMINDER_WINDOW_HOURS),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Returns the user's courses, active tasks, per-course task counts and reminder buckets
+    in one response. The underlying queries run concurrently, so the page costs one
+    request and one authentication instead of several.
+    """
+    user_id = current_user["_id"]
+    # Tasks of deleted courses are left out of every part until the purge removes them
+    excluded_course_ids = await tombstoned_course_ids(user_id)
+    courses, (tasks, next_cursor), task_counts, reminders = await asyncio.gather(
+        courses_collection.find({"userId": user_id, **LIVE_COURSE_QUERY}, COURSE_PROJECTION).to_list(),
+        fetch_active_tasks(user_id, limit, excluded_course_ids),
+        count_tasks_by_course(user_id, excluded_course_ids),
+        fetch_reminders(user_id, window_hours, excluded_course_ids=excluded_course_ids),
+    )
+    return trusted_response({
+        "courses": [format_course(course) for course in courses],
+        "tasks": [format_task(task) for task in tasks],
+        "nextTasksCursor": next_cursor,
+        "taskCounts": task_counts,
+        "reminders": reminders,
+    }, response)
@@ -0,0 +1,88 @@
+import asyncio
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+import auth
+from events import EVENTS_HEARTBEAT_SECONDS, broker
+from serialization import encode_json
+
+# --- Pydantic Models ---
+
+class EventsTokenResponse(BaseModel):
+    token: str
+    expiresIn: int
+
+# --- Router Setup ---
+
+# Each route authenticates itself: GET /events also accepts an events token in the URL
+router = APIRouter(
+    prefix="/events",
+    tags=["Events"],
+)
+
+# Event types clients see; the broker also carries internal ones (feed token changes, reminders)
+CLIENT_EVENT_PREFIXES = ("course.", "task.")
+CLIENT_EVENT_TYPES = {"resync"}
+
+# --- Helper Functions ---
+
+def is_client_event(event: dict) -> bool:
+    """True for the course, task and resync events a stream forwards to its client."""
+    return event["type"].startswith(CLIENT_EVENT_PREFIXES) or event["type"] in CLIENT_EVENT_TYPES
+
+def format_event(event: dict) -> bytes:
+    """Frames a change event as a Server-Sent Event; the sequence number doubles as the event ID."""
+    data = {key: value for key, value in event.items() if key != "seq"}
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: ".encode("utf-8") + encode_json(data) + b"\n\n"
+
+# --- API Endpoints ---
+
+@router.post("/token", response_model=EventsTokenResponse, status_code=status.HTTP_201_CREATED)
+async def create_events_token(current_user: dict = Depends(auth.get_current_user)):
+    """
+    Issues a short-lived token for opening the stream as GET /events?token=..., since a
+    browser's EventSource cannot send an Authorization header. The token only opens the
+    stream, and only until it expires; an open stream is not cut off when it does.
+    """
+    return {"token": auth.create_events_token(current_user), "expiresIn": int(auth.EVENTS_TOKEN_EXPIRE_SECONDS)}
+
+@router.get("")
+async def stream_events(request: Request, current_user: dict = Depends(auth.get_events_user)):
+    """
+    Streams the user's course and task changes as Server-Sent Events, so clients can patch
+    their lists in place instead of refetching them. Authenticate with the Authorization
+    header, or with a token from POST /events/token as ?token=.
+
+    Events are "course.created", "course.updated", "course.deleted", "task.created",
+    "task.updated" and "task.deleted" (deletes carry only the ID), plus "resync" after an import.
+    A comment line is sent every EVENTS_HEARTBEAT_SECONDS while idle. A client that falls
+    too far behind gets a final "dropped" event and should reconnect and refetch.
+    """
+    subscription = broker.subscribe(current_user["_id"])
+
+    async def generate_events():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield b": keep-alive\n\n"
+                    continue
+                if event is None:
+                    yield b"event: dropped\ndata: {}\n\n"
+                    return
+                if is_client_event(event):
+                    yield format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        # Stop proxies such as nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,93 @@
+import secrets
+from bson import ObjectId
+from bson.errors import InvalidId
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+import auth
+from cache import user_cache
+from database import users_collection
+from etags import etag_matches
+from events import broker
+from ical import calendar_feeds, hash_feed_token
+
+# --- Pydantic Models ---
+
+class CalendarTokenResponse(BaseModel):
+    """The feed URL, relative to the API base URL; the token in it is shown only once."""
+    url: str
+
+# --- Router Setup ---
+
+router = APIRouter(
+    prefix="/calendar",
+    tags=["Calendar"],
+)
+
+# How long calendar clients and proxies may reuse a feed without asking again
+FEED_CACHE_CONTROL = "private, max-age=300"
+
+# --- Helper Functions ---
+
+def not_modified(request: Request, feed: dict) -> bool:
+    """Evaluates If-None-Match, or If-Modified-Since when no ETag was sent."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        return etag_matches(feed["etag"], if_none_match)
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            return feed["lastModified"] <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+async def set_feed_token(current_user: dict, token_hash: str | None):
+    """Stores (or, with None, removes) the user's feed token; the previous feed URL stops working."""
+    update = {"$set": {"calendarTokenHash": token_hash}} if token_hash else {"$unset": {"calendarTokenHash": ""}}
+    await users_collection.update_one({"_id": current_user["_id"]}, update)
+    await user_cache.invalidate(current_user["email"])
+    # Drops the cached feed, which carries the old token, in every worker
+    await broker.publish(current_user["_id"], "calendar.token")
+
+# --- API Endpoints ---
+
+@router.post("/token", response_model=CalendarTokenResponse, status_code=status.HTTP_201_CREATED)
+async def create_feed_token(current_user: dict = Depends(auth.get_current_user)):
+    """
+    Creates the user's calendar feed URL, replacing any previous one.
+    Calendar apps cannot send an Authorization header, so the URL itself carries a secret token.
+    """
+    token = secrets.token_urlsafe(32)
+    await set_feed_token(current_user, hash_feed_token(token))
+    return {"url": f"/calendar/{current_user['_id']}/{token}.ics"}
+
+@router.delete("/token", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_feed_token(current_user: dict = Depends(auth.get_current_user)):
+    """Turns the user's calendar feed off."""
+    await set_feed_token(current_user, None)
+    return
+
+@router.get("/{user_id}/{token}.ics")
+async def get_feed(user_id: str, token: str, request: Request):
+    """
+    Serves the user's task due dates as an iCalendar feed.
+    Feeds are cached until the user's courses or tasks change, and carry an ETag and
+    Last-Modified so polling clients mostly get 304 Not Modified.
+    """
+    try:
+        feed = await calendar_feeds.get(ObjectId(user_id), token)
+    except InvalidId:
+        feed = None
+    if feed is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Calendar feed not found")
+
+    headers = {
+        "ETag": feed["etag"],
+        "Last-Modified": format_datetime(feed["lastModified"], usegmt=True),
+        "Cache-Control": FEED_CACHE_CONTROL,
+    }
+    if not_modified(request, feed):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=feed["body"], media_type="text/calendar; charset=utf-8", headers=headers)
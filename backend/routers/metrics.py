@@ -0,0 +1,50 @@
+import os
+import secrets
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from cache import user_cache
+from events import broker
+from hashing import hash_pool
+from ical import calendar_feeds
+from metrics import registry
+from ratelimit import login_throttle
+from reminders import scheduler
+
+# Load environment variables from .env file
+load_dotenv()
+# When set, scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# --- Gauges and Counters ---
+# Read from the components' own counters at scrape time, so they cost nothing per request
+
+registry.gauge("hash_pool_in_flight", "bcrypt calls running or queued in the hash pool.", lambda: hash_pool.in_flight)
+registry.gauge("hash_pool_queue_depth", "bcrypt calls waiting for a free hash pool worker.", lambda: hash_pool.queue_depth)
+registry.callback_counter("hash_pool_rejected", "bcrypt calls rejected because the hash pool was full.", lambda: hash_pool.rejected)
+registry.callback_counter("hash_pool_failed", "bcrypt calls that raised or were cancelled in the hash pool.", lambda: hash_pool.failed)
+registry.callback_counter("user_cache_hits", "Authenticated requests served from the user cache.", lambda: user_cache.hits)
+registry.callback_counter("user_cache_misses", "Authenticated requests that had to load the user.", lambda: user_cache.misses)
+registry.gauge("events_subscribers", "Connected GET /events streams.", lambda: broker.stats()["subscribers"])
+registry.callback_counter("events_dropped_consumers", "Event streams dropped for falling behind.", lambda: broker.dropped_consumers)
+registry.gauge("reminders_scheduled", "Tasks with pending reminders in the scheduler.", lambda: scheduler.stats()["scheduled"])
+registry.callback_counter("calendar_feed_hits", "Calendar feed requests answered from the feed cache.", lambda: calendar_feeds.hits)
+registry.callback_counter("calendar_feed_renders", "Calendar feeds rendered from MongoDB.", lambda: calendar_feeds.renders)
+registry.gauge("rate_limit_buckets", "Login and registration token buckets held in memory.", lambda: len(login_throttle.store))
+registry.callback_counter("reminders_fired", "Reminders delivered by this worker.", lambda: scheduler.fired)
+
+# --- Router Setup ---
+
+router = APIRouter(tags=["Metrics"])
+
+# --- API Endpoints ---
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(request: Request):
+    """Exposes this worker's metrics in the Prometheus text format."""
+    if METRICS_TOKEN:
+        authorization = request.headers.get("Authorization", "")
+        if not secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
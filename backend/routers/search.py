@@ -0,0 +1,107 @@
+import os
+from bson import ObjectId
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+import auth
+from database import courses_collection, tasks_collection, tasks_archive_collection
+from events import broker
+from metrics import registry
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from purge import LIVE_COURSE_QUERY, exclude_courses, tombstoned_course_ids
+from search import InMemorySearchIndex, MongoTextSearch
+from routers.courses import COURSE_PROJECTION, CourseResponse, format_course
+from routers.tasks import TASK_PROJECTION, TaskResponse, format_task
+
+# Load environment variables from .env file
+load_dotenv()
+# "mongo" uses the text indexes; "memory" keeps an inverted index per user in each worker
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "mongo")
+# Results beyond this rank are not paged to; a more specific query is the better answer
+MAX_SEARCH_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "500"))
+
+# --- Pydantic Models ---
+
+class SearchHighlight(BaseModel):
+    """A snippet of a matching field; each range is a [start, end) character span of a match within `text`."""
+    field: str
+    text: str
+    ranges: List[List[int]]
+
+class SearchResult(BaseModel):
+    type: Literal["task", "course"]
+    id: str
+    score: float
+    task: Optional[TaskResponse] = None
+    course: Optional[CourseResponse] = None
+    highlights: List[SearchHighlight]
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+
+# --- Search Backend ---
+
+async def live_task_filter(user_id) -> dict:
+    """Leaves out tasks of deleted courses that the purge has not reached yet."""
+    return exclude_courses({}, await tombstoned_course_ids(user_id))
+
+async def load_user_documents(user_id: str) -> list:
+    """Reads everything the in-memory index holds for one user: live courses, then active and archived tasks."""
+    user_id = ObjectId(user_id)
+    documents = [("course", format_course(course)) async for course in courses_collection.find({"userId": user_id, **LIVE_COURSE_QUERY}, COURSE_PROJECTION)]
+    task_query = {"userId": user_id, **await live_task_filter(user_id)}
+    for collection in (tasks_collection, tasks_archive_collection):
+        documents.extend([("task", format_task(task)) async for task in collection.find(task_query, TASK_PROJECTION)])
+    return documents
+
+if SEARCH_BACKEND == "memory":
+    search_backend = InMemorySearchIndex(load_user_documents, max_users=int(os.getenv("SEARCH_INDEX_MAX_USERS", "1000")))
+    # Every write publishes a change event; the index applies them as they arrive
+    broker.add_listener(search_backend.apply_event)
+    registry.gauge("search_index_users", "Users with an in-memory search index in this worker.", lambda: search_backend.stats()["users"])
+else:
+    search_backend = MongoTextSearch([
+        ("task", tasks_collection, live_task_filter, TASK_PROJECTION, format_task),
+        ("task", tasks_archive_collection, live_task_filter, TASK_PROJECTION, format_task),
+        ("course", courses_collection, LIVE_COURSE_QUERY, COURSE_PROJECTION, format_course),
+    ])
+
+# --- Router Setup ---
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Search"],
+    dependencies=[Depends(auth.get_current_user)] # Protect all routes
+)
+
+# --- API Endpoints ---
+
+@router.get("", response_model=SearchResponse, status_code=status.HTTP_200_OK)
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Searches the user's task titles and descriptions (active and archived) and course names,
+    codes and descriptions. Results are ranked best first, with highlighted snippets.
+    When more results exist, the X-Next-Cursor header holds the cursor for the next page.
+    """
+    # Relevance order has no stable sort key to seek on, so the cursor carries the result offset
+    offset = decode_cursor(cursor, [("offset", 1)])[0] if cursor else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    limit = min(limit, MAX_SEARCH_RESULTS - offset)
+    if limit <= 0:
+        return {"results": []}
+    # One extra hit tells whether another page exists, unless this page reaches the cap
+    more_allowed = offset + limit < MAX_SEARCH_RESULTS
+    hits = await search_backend.search(current_user["_id"], q, limit + 1 if more_allowed else limit, offset)
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([offset + limit])
+    return {"results": hits}
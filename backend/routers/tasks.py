@@ -1,15 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel, Field, ConfigDict
+import asyncio
+import os
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pydantic import BaseModel, Field, ConfigDict, field_validator
 from typing import List, Optional
 from bson import ObjectId
 from bson.errors import InvalidId
-from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from datetime import datetime, timedelta, timezone
+from enum import Enum
 
 import auth
-from database import tasks_collection, courses_collection
+from archive import archive_tasks, collection_for_status, is_archived_status, restore_tasks
+from etags import bump_data_version, check_not_modified
+from events import broker
+from database import tasks_collection, tasks_archive_collection, courses_collection, migrations_collection
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, fetch_page
+from purge import LIVE_COURSE_QUERY, exclude_courses, tombstoned_course_ids
+from reminders import scheduler
+from serialization import trusted_response
+
+# Load environment variables from .env file
+load_dotenv()
+# Largest number of items accepted by a single bulk request
+MAX_BULK_ITEMS = int(os.getenv("TASKS_BULK_MAX_ITEMS", "100"))
 
 # --- Pydantic Models ---
 
+def normalize_due_date(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Brings a due date to the form Mongo stores and returns: naive UTC with millisecond precision.
+    Done on input, so the task a write echoes back is exactly the one a later GET returns.
+    """
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
 class TaskBase(BaseModel):
     title: str = Field(..., min_length=3)
     description: Optional[str] = None
@@ -17,6 +45,8 @@ class TaskBase(BaseModel):
     priority: str = "Medium"
     status: str = "active"
 
+    _normalize_due_date = field_validator("dueDate")(normalize_due_date)
+
 class TaskCreate(TaskBase):
     courseId: str
 
@@ -27,33 +57,157 @@ class TaskUpdate(BaseModel):
     priority: Optional[str] = None
     status: Optional[str] = None
 
+    _normalize_due_date = field_validator("dueDate")(normalize_due_date)
+
 class TaskResponse(TaskBase):
     id: str
     courseId: str
     model_config = ConfigDict(from_attributes=True)
 
+class RemindersResponse(BaseModel):
+    """Active tasks that are past due or due within the reminder window, capped per bucket."""
+    overdue: List[TaskResponse]
+    dueSoon: List[TaskResponse]
+    overdueCount: int
+    dueSoonCount: int
+
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class TaskBulkUpdateItem(TaskUpdate):
+    id: str
+
+class TaskBulkUpdate(BaseModel):
+    tasks: List[TaskBulkUpdateItem] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class TaskBulkDelete(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class BulkItemResult(BaseModel):
+    """Outcome of one item in a bulk request, reported with the status code a single request would get."""
+    index: int
+    id: Optional[str] = None
+    status: int
+    detail: Optional[str] = None
+    task: Optional[TaskResponse] = None
+
+class BulkResponse(BaseModel):
+    results: List[BulkItemResult]
+
+class TaskSort(str, Enum):
+    """Sort orders for the task list; a leading '-' reverses the order."""
+    due_date = "dueDate"
+    due_date_desc = "-dueDate"
+    priority = "priority"          # High, then Medium, then Low
+    priority_desc = "-priority"
+    title = "title"
+    title_desc = "-title"
+
 # --- Helper Functions & Dependencies ---
 
+# Only the fields format_task reads; _id is always returned
+TASK_PROJECTION = {"courseId": 1, "title": 1, "description": 1, "dueDate": 1, "priority": 1, "status": 1}
+# Priority is stored as text, so each task also carries a numeric rank that sorts in real order
+PRIORITY_RANKS = {"Low": 1, "Medium": 2, "High": 3}
+
+# Full Mongo sort specs for each TaskSort, each ending in _id so they double as keyset orders.
+# Descending variants are exact reversals so the same (userId, status, ...) index serves both.
+TASK_SORTS = {
+    TaskSort.due_date: [("dueDate", 1), ("_id", 1)],
+    TaskSort.priority: [("priorityRank", -1), ("dueDate", 1), ("_id", 1)],
+    TaskSort.title: [("title", 1), ("_id", 1)],
+}
+TASK_SORTS.update({
+    TaskSort.due_date_desc: [(field, -direction) for field, direction in TASK_SORTS[TaskSort.due_date]],
+    TaskSort.priority_desc: [(field, -direction) for field, direction in TASK_SORTS[TaskSort.priority]],
+    TaskSort.title_desc: [(field, -direction) for field, direction in TASK_SORTS[TaskSort.title]],
+})
+
+def priority_rank(priority: str) -> int:
+    """Numeric rank stored alongside the priority text; unknown priorities sort last."""
+    return PRIORITY_RANKS.get(priority, 0)
+
+# Marks backfill_priority_rank() as done in the migrations collection
+PRIORITY_RANK_MIGRATION = "priorityRank"
+
+async def backfill_priority_rank():
+    """
+    Adds priorityRank to tasks written before it existed. Runs at startup; the update scans
+    the tasks, so a marker document records that it finished and later startups skip it.
+    """
+    if await migrations_collection.find_one({"_id": PRIORITY_RANK_MIGRATION}) is not None:
+        return
+    for priority, rank in PRIORITY_RANKS.items():
+        await tasks_collection.update_many(
+            {"priority": priority, "priorityRank": {"$exists": False}},
+            {"$set": {"priorityRank": rank}}
+        )
+    await migrations_collection.update_one(
+        {"_id": PRIORITY_RANK_MIGRATION},
+        {"$set": {"completedAt": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+# Default look-ahead for the "Due Soon" reminder bucket, and caps on what callers may ask for
+REMINDER_WINDOW_HOURS = 24
+MAX_REMINDER_WINDOW_HOURS = 24 * 14
+MAX_REMINDERS = 100
+
+async def fetch_reminders(user_id, window_hours: float = REMINDER_WINDOW_HOURS, limit: int = 20, excluded_course_ids: Optional[list] = None) -> dict:
+    """
+    Collects the user's overdue and due-soon active tasks, leaving out those of deleted courses
+    (pass `excluded_course_ids` when the caller already looked them up).
+    Both buckets are bounded range scans on the (userId, status, dueDate) index, and the
+    list and count queries run concurrently.
+    """
+    if excluded_course_ids is None:
+        excluded_course_ids = await tombstoned_course_ids(user_id)
+    now = datetime.now(timezone.utc)
+    overdue_query = exclude_courses({"userId": user_id, "status": "active", "dueDate": {"$lt": now}}, excluded_course_ids)
+    due_soon_query = exclude_courses({
+        "userId": user_id,
+        "status": "active",
+        "dueDate": {"$gte": now, "$lte": now + timedelta(hours=window_hours)},
+    }, excluded_course_ids)
+    sort_spec = TASK_SORTS[TaskSort.due_date]
+    overdue, due_soon, overdue_count, due_soon_count = await asyncio.gather(
+        tasks_collection.find(overdue_query, TASK_PROJECTION).sort(sort_spec).limit(limit).to_list(),
+        tasks_collection.find(due_soon_query, TASK_PROJECTION).sort(sort_spec).limit(limit).to_list(),
+        tasks_collection.count_documents(overdue_query),
+        tasks_collection.count_documents(due_soon_query),
+    )
+    return {
+        "overdue": [format_task(task) for task in overdue],
+        "dueSoon": [format_task(task) for task in due_soon],
+        "overdueCount": overdue_count,
+        "dueSoonCount": due_soon_count,
+    }
+
 def format_task(task) -> dict:
-    """Converts a task document from the DB into a dictionary."""
+    """Converts a task document from the DB into a dictionary, with keys in TaskResponse's field order."""
     return {
-        "id": str(task["_id"]),
-        "courseId": str(task["courseId"]),
         "title": task["title"],
         "description": task.get("description"),
         "dueDate": task.get("dueDate"),
         "priority": task["priority"],
-        "status": task["status"]
+        "status": task["status"],
+        "id": str(task["_id"]),
+        "courseId": str(task["courseId"])
     }
 
 async def get_task_or_404(
     task_id: str,
     current_user: dict = Depends(auth.get_current_user)
 ) -> dict:
-    """A reusable dependency that fetches a task and verifies ownership."""
+    """
+    A reusable dependency that fetches a task and verifies ownership.
+    Active tasks are found in the hot collection; anything else falls back to the archive.
+    """
     try:
         query = {"_id": ObjectId(task_id), "userId": current_user["_id"]}
-        task = tasks_collection.find_one(query)
+        task = await tasks_collection.find_one(query)
+        if task is None:
+            task = await tasks_archive_collection.find_one(query)
         if task is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
         return task
@@ -75,10 +229,11 @@ async def create_task(task: TaskCreate, current_user: dict = Depends(auth.get_cu
     """Creates a new task for one of the user's courses."""
     try:
         # Verify the course belongs to the current user before adding a task to it
-        course = courses_collection.find_one({
+        course = await courses_collection.find_one({
             "_id": ObjectId(task.courseId),
-            "userId": current_user["_id"]
-        })
+            "userId": current_user["_id"],
+            **LIVE_COURSE_QUERY
+        }, {"_id": 1})
         if course is None:
             raise HTTPException(status_code=404, detail="Course not found for this user")
     except InvalidId:
@@ -87,50 +242,327 @@ async def create_task(task: TaskCreate, current_user: dict = Depends(auth.get_cu
     task_document = task.model_dump()
     task_document["userId"] = current_user["_id"]
     task_document["courseId"] = ObjectId(task.courseId)
+    task_document["priorityRank"] = priority_rank(task.priority)
     
-    result = tasks_collection.insert_one(task_document)
-    created_task = tasks_collection.find_one({"_id": result.inserted_id})
-    
-    return format_task(created_task)
+    # insert_one stores the new _id on the document, so the response is built without a read-back
+    await collection_for_status(task.status).insert_one(task_document)
+    await bump_data_version(current_user["_id"])
+    scheduler.schedule(task_document)
+    formatted_task = format_task(task_document)
+    await broker.publish(current_user["_id"], "task.created", task_document["_id"], formatted_task)
+    return formatted_task
 
-@router.get("/", response_model=List[TaskResponse])
+@router.get("/", response_model=List[TaskResponse], dependencies=[Depends(check_not_modified)])
 async def get_tasks(
+    response: Response,
     course_id: Optional[str] = None, # Optional query parameter to filter by course
+    task_status: Optional[str] = Query(None, alias="status"),
+    priority: Optional[str] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    sort: Optional[TaskSort] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Retrieves the current user's working set of tasks.
+
+    Only active tasks are kept in the hot collection, so without a `status` filter this
+    returns active tasks. Filtering on any other status reads the archive instead
+    (see also GET /tasks/archive).
+
+    - Filter by `course_id`, `status`, `priority` and an inclusive `due_after`/`due_before` range.
+    - Order with `sort`; combined with a `status` filter every order is served by an index.
+    - Pass `limit` (and then the returned X-Next-Cursor header as `cursor`) to page through
+      the tasks instead of loading them all at once. Pages default to due-date order.
+    """
+    query = {"userId": current_user["_id"]}
+    if course_id:
+        try:
+            query["courseId"] = ObjectId(course_id)
+        except InvalidId:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Course ID format")
+    collection = tasks_collection
+    if task_status:
+        query["status"] = task_status
+        collection = collection_for_status(task_status)
+    if priority:
+        query["priority"] = priority
+    if due_after or due_before:
+        query["dueDate"] = {}
+        if due_after:
+            query["dueDate"]["$gte"] = due_after
+        if due_before:
+            query["dueDate"]["$lte"] = due_before
+    # Tasks of a deleted course stay in the collection until the purge reaches them
+    query = exclude_courses(query, await tombstoned_course_ids(current_user["_id"]))
+
+    if limit is None and cursor is None:
+        user_tasks = collection.find(query, TASK_PROJECTION)
+        if sort:
+            user_tasks = user_tasks.sort(TASK_SORTS[sort])
+        return trusted_response([format_task(task) async for task in user_tasks], response)
+
+    sort_spec = TASK_SORTS[sort or TaskSort.due_date]
+    # The sort keys must come back with each document so the next cursor can be built
+    projection = {**TASK_PROJECTION, **{field: 1 for field, _ in sort_spec}}
+    user_tasks, next_cursor = await fetch_page(
+        collection, query, projection, sort_spec, limit or DEFAULT_PAGE_SIZE, cursor
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return trusted_response([format_task(task) for task in user_tasks], response)
+
+# Declared before /{task_id} so "reminders" is not parsed as a task ID
+@router.get("/reminders", response_model=RemindersResponse)
+async def get_reminders(
+    window_hours: float = Query(REMINDER_WINDOW_HOURS, gt=0, le=MAX_REMINDER_WINDOW_HOURS),
+    limit: int = Query(20, ge=1, le=MAX_REMINDERS),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """
+    Returns the "Past Due" and "Due Soon" reminder buckets for the current user.
+    Each bucket holds at most `limit` tasks (earliest due first) plus the total count.
+    """
+    return await fetch_reminders(current_user["_id"], window_hours, limit)
+
+# --- Bulk Endpoints ---
+# Declared before /{task_id} so "bulk" is not parsed as a task ID.
+# Each bulk request costs a fixed number of round trips no matter how many items it carries.
+
+@router.post("/bulk", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def bulk_create_tasks(payload: TaskBulkCreate, current_user: dict = Depends(auth.get_current_user)):
+    """
+    Creates many tasks at once, e.g. when importing a syllabus.
+    Course ownership for every item is checked with one query and the valid tasks are written with one insert_many.
+    """
+    results = [None] * len(payload.tasks)
+    course_ids = {}
+    for index, task in enumerate(payload.tasks):
+        try:
+            course_ids[index] = ObjectId(task.courseId)
+        except InvalidId:
+            results[index] = BulkItemResult(index=index, status=status.HTTP_400_BAD_REQUEST, detail="Invalid Course ID format")
+
+    owned_courses = await courses_collection.find(
+        {"_id": {"$in": list(set(course_ids.values()))}, "userId": current_user["_id"], **LIVE_COURSE_QUERY},
+        {"_id": 1}
+    ).to_list()
+    owned_course_ids = {course["_id"] for course in owned_courses}
+
+    documents = {}
+    for index, course_id in course_ids.items():
+        if course_id not in owned_course_ids:
+            results[index] = BulkItemResult(index=index, status=status.HTTP_404_NOT_FOUND, detail="Course not found for this user")
+            continue
+        task = payload.tasks[index]
+        task_document = task.model_dump()
+        task_document["userId"] = current_user["_id"]
+        task_document["courseId"] = course_id
+        task_document["priorityRank"] = priority_rank(task.priority)
+        documents[index] = task_document
+
+    if documents:
+        # insert_many stores each new _id on its document, just like insert_one
+        active_documents = [document for document in documents.values() if not is_archived_status(document["status"])]
+        archived_documents = [document for document in documents.values() if is_archived_status(document["status"])]
+        if active_documents:
+            await tasks_collection.insert_many(active_documents, ordered=False)
+        if archived_documents:
+            await tasks_archive_collection.insert_many(archived_documents, ordered=False)
+        await bump_data_version(current_user["_id"])
+    for index, task_document in documents.items():
+        scheduler.schedule(task_document)
+        formatted_task = format_task(task_document)
+        results[index] = BulkItemResult(
+            index=index, id=str(task_document["_id"]), status=status.HTTP_201_CREATED, task=formatted_task
+        )
+        await broker.publish(current_user["_id"], "task.created", task_document["_id"], formatted_task)
+    return {"results": results}
+
+@router.patch("/bulk", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def bulk_update_tasks(payload: TaskBulkUpdate, current_user: dict = Depends(auth.get_current_user)):
+    """
+    Updates many tasks at once, e.g. archiving every task of a finished course.
+    The ownership-filtered updates go out as one bulk_write per collection and the results are
+    read back with one query per collection. Tasks whose status changed are then moved between
+    the hot collection and the archive.
+    """
+    results = [None] * len(payload.tasks)
+    task_ids = {}
+    changed_ids = set()
+    operations = []
+    for index, item in enumerate(payload.tasks):
+        try:
+            task_ids[index] = ObjectId(item.id)
+        except InvalidId:
+            results[index] = BulkItemResult(index=index, id=item.id, status=status.HTTP_400_BAD_REQUEST, detail="Invalid Task ID format")
+            continue
+        update_fields = item.model_dump(exclude_unset=True, exclude={"id"})
+        if "priority" in update_fields:
+            update_fields["priorityRank"] = priority_rank(update_fields["priority"])
+        if update_fields:
+            changed_ids.add(task_ids[index])
+            operations.append(UpdateOne({"_id": task_ids[index], "userId": current_user["_id"]}, {"$set": update_fields}))
+
+    if operations:
+        # A task lives in exactly one collection, so the same operations are sent to both
+        await asyncio.gather(
+            tasks_collection.bulk_write(operations, ordered=False),
+            tasks_archive_collection.bulk_write(operations, ordered=False),
+        )
+        id_query = {"_id": {"$in": list(task_ids.values())}, "userId": current_user["_id"]}
+        await archive_tasks(id_query)
+        await restore_tasks(id_query)
+        await bump_data_version(current_user["_id"])
+    read_query = {"_id": {"$in": list(task_ids.values())}, "userId": current_user["_id"]}
+    hot_tasks, archived_tasks = await asyncio.gather(
+        tasks_collection.find(read_query, TASK_PROJECTION).to_list(),
+        tasks_archive_collection.find(read_query, TASK_PROJECTION).to_list(),
+    )
+    tasks_by_id = {task["_id"]: task for task in hot_tasks + archived_tasks}
+
+    for index, task_id in task_ids.items():
+        task = tasks_by_id.get(task_id)
+        if task is None:
+            results[index] = BulkItemResult(index=index, id=str(task_id), status=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        else:
+            formatted_task = format_task(task)
+            results[index] = BulkItemResult(index=index, id=str(task_id), status=status.HTTP_200_OK, task=formatted_task)
+            if task_id in changed_ids:
+                scheduler.schedule(task)
+                await broker.publish(current_user["_id"], "task.updated", task_id, formatted_task)
+    return {"results": results}
+
+@router.delete("/bulk", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def bulk_delete_tasks(payload: TaskBulkDelete, current_user: dict = Depends(auth.get_current_user)):
+    """Deletes many tasks at once. Ownership is checked with one query and the deletes go out in one delete_many per collection."""
+    results = [None] * len(payload.ids)
+    task_ids = {}
+    for index, task_id in enumerate(payload.ids):
+        try:
+            task_ids[index] = ObjectId(task_id)
+        except InvalidId:
+            results[index] = BulkItemResult(index=index, id=task_id, status=status.HTTP_400_BAD_REQUEST, detail="Invalid Task ID format")
+
+    owned_query = {"_id": {"$in": list(task_ids.values())}, "userId": current_user["_id"]}
+    hot_tasks, archived_tasks = await asyncio.gather(
+        tasks_collection.find(owned_query, {"_id": 1}).to_list(),
+        tasks_archive_collection.find(owned_query, {"_id": 1}).to_list(),
+    )
+    owned_task_ids = [task["_id"] for task in hot_tasks + archived_tasks]
+    if owned_task_ids:
+        delete_query = {"_id": {"$in": owned_task_ids}, "userId": current_user["_id"]}
+        await asyncio.gather(
+            tasks_collection.delete_many(delete_query),
+            tasks_archive_collection.delete_many(delete_query),
+        )
+        await bump_data_version(current_user["_id"])
+
+    for task_id in owned_task_ids:
+        scheduler.unschedule(task_id)
+        await broker.publish(current_user["_id"], "task.deleted", task_id)
+
+    owned_task_ids = set(owned_task_ids)
+    for index, task_id in task_ids.items():
+        if task_id in owned_task_ids:
+            results[index] = BulkItemResult(index=index, id=str(task_id), status=status.HTTP_204_NO_CONTENT)
+        else:
+            results[index] = BulkItemResult(index=index, id=str(task_id), status=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return {"results": results}
+
+# Declared before /{task_id} so "archive" is not parsed as a task ID
+@router.get("/archive", response_model=List[TaskResponse], dependencies=[Depends(check_not_modified)])
+async def get_archived_tasks(
+    response: Response,
+    course_id: Optional[str] = None,
+    sort: TaskSort = TaskSort.due_date_desc,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(auth.get_current_user)
 ):
-    """Retrieves all tasks for the current user, with optional filtering by course."""
+    """
+    Pages through the current user's archived (non-active) tasks, most recently due first.
+    The archive is cold storage that can grow without bound, so this endpoint is always paginated.
+    """
     query = {"userId": current_user["_id"]}
     if course_id:
         try:
             query["courseId"] = ObjectId(course_id)
         except InvalidId:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Course ID format")
-        
-    user_tasks = tasks_collection.find(query)
-    return [format_task(task) for task in user_tasks]
 
-@router.get("/{task_id}", response_model=TaskResponse)
+    query = exclude_courses(query, await tombstoned_course_ids(current_user["_id"]))
+
+    sort_spec = TASK_SORTS[sort]
+    projection = {**TASK_PROJECTION, **{field: 1 for field, _ in sort_spec}}
+    archived_tasks, next_cursor = await fetch_page(tasks_archive_collection, query, projection, sort_spec, limit, cursor)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return trusted_response([format_task(task) for task in archived_tasks], response)
+
+@router.get("/{task_id}", response_model=TaskResponse, dependencies=[Depends(check_not_modified)])
 async def get_single_task(task: dict = Depends(get_task_or_404)):
     """Retrieves a single task by its ID."""
     return format_task(task)
 
 @router.put("/{task_id}", response_model=TaskResponse)
 async def update_task(
+    task_id: str,
     update_data: TaskUpdate,
-    task: dict = Depends(get_task_or_404)
+    current_user: dict = Depends(auth.get_current_user)
 ):
-    """Updates the details of an existing task."""
+    """
+    Updates the details of an existing task.
+    The ownership check, the update and the read of the result are one atomic operation.
+    A status change moves the task between the hot collection and the archive.
+    """
+    try:
+        query = {"_id": ObjectId(task_id), "userId": current_user["_id"]}
+    except InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Task ID format")
+
     # model_dump(exclude_unset=True) ensures we only update fields that were provided
-    update_query = {"$set": update_data.model_dump(exclude_unset=True)}
-    
-    if update_query["$set"]: # Only run update if there is data to update
-        tasks_collection.update_one({"_id": task["_id"]}, update_query)
+    update_fields = update_data.model_dump(exclude_unset=True)
+    if "priority" in update_fields:
+        update_fields["priorityRank"] = priority_rank(update_fields["priority"])
+
+    updated_task = None
+    for collection in (tasks_collection, tasks_archive_collection):
+        if update_fields:
+            updated_task = await collection.find_one_and_update(
+                query,
+                {"$set": update_fields},
+                projection=TASK_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+        else: # Nothing to change, so just return the task as it is
+            updated_task = await collection.find_one(query, TASK_PROJECTION)
+        if updated_task is not None:
+            break
 
-    updated_task = tasks_collection.find_one({"_id": task["_id"]})
-    return format_task(updated_task)
+    if updated_task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    if "status" in update_fields:
+        if collection is tasks_collection:
+            await archive_tasks(query)
+        else:
+            await restore_tasks(query)
+    formatted_task = format_task(updated_task)
+    if update_fields:
+        await bump_data_version(current_user["_id"])
+        scheduler.schedule(updated_task)
+        await broker.publish(current_user["_id"], "task.updated", updated_task["_id"], formatted_task)
+    return formatted_task
 
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_task(task: dict = Depends(get_task_or_404)):
-    """Deletes a task by its ID."""
-    tasks_collection.delete_one({"_id": task["_id"]})
+    """Deletes a task by its ID, wherever it is stored."""
+    result = await tasks_collection.delete_one({"_id": task["_id"]})
+    if result.deleted_count == 0:
+        await tasks_archive_collection.delete_one({"_id": task["_id"]})
+    await bump_data_version(task["userId"])
+    scheduler.unschedule(task["_id"])
+    await broker.publish(task["userId"], "task.deleted", task["_id"])
     return
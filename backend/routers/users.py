@@ -1,9 +1,27 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import json
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Request, status, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
+from pymongo.errors import DuplicateKeyError
+from typing import List
 
-from database import users_collection
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from cache import user_cache
+from archive import is_archived_status
+from database import users_collection, courses_collection, tasks_collection, tasks_archive_collection, refresh_tokens_collection
+from auth import (
+    get_password_hash, verify_password, create_access_token, get_current_user,
+    create_refresh_token, rotate_refresh_token, revoke_refresh_tokens,
+)
+from etags import bump_data_version
+from events import broker
+from purge import LIVE_COURSE_QUERY, exclude_courses, tombstoned_course_ids
+from ratelimit import login_throttle
+from reminders import scheduler
+from serialization import encode_json
+from routers.courses import COURSE_PROJECTION, CourseCreate, format_course
+from routers.tasks import TASK_PROJECTION, TaskCreate, format_task, priority_rank
 
 router = APIRouter(
     prefix="/users",
@@ -33,9 +51,14 @@ class UserLogin(BaseModel):
 class LoginResponse(BaseModel):
     """Model for the response after a successful login."""
     access_token: str
+    refresh_token: str
     token_type: str = "bearer"
     model_config = ConfigDict(from_attributes=True)
 
+class RefreshRequest(BaseModel):
+    """Model for exchanging a refresh token for a new token pair."""
+    refresh_token: str
+
 class UserPasswordChange(BaseModel):
     current_password: str
     new_password: str = Field(..., min_length=8)
@@ -44,26 +67,40 @@ class UserEmailChange(BaseModel):
     new_email: EmailStr
     password: str
 
+class ImportLineError(BaseModel):
+    line: int
+    detail: str
+
+class ImportResponse(BaseModel):
+    """Summary of an NDJSON import; only the first few errors are listed."""
+    coursesImported: int
+    tasksImported: int
+    errorCount: int
+    errors: List[ImportLineError]
+
+# --- Export / Import Settings ---
+
+# Documents per insert_many during an import, and per cursor batch during an export
+IMPORT_BATCH_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+# A single NDJSON line longer than this is rejected instead of being buffered
+MAX_IMPORT_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_IMPORT_ERRORS = 20
+
 # --- API Endpoints ---
 @router.post("/register", response_model=CreationResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user: UserCreation):
+async def register_user(user: UserCreation, request: Request):
     """
     Handles user registration.
     
-    - Checks if a user with the same email already exists.
+    - Rejects clients over the registration rate limit before any hashing.
     - Hashes the password securely using bcrypt.
     - Stores the new user in the database.
+    - Rejects duplicate emails via the unique index on users.email.
     """
-    # Check if user already exists
-    existing_user = users_collection.find_one({"email": user.email})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="A user with this email already exists."
-        )
-
+    await login_throttle.check(request, "register", user.email)
     # Hash the password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
 
     # Create the user document to be inserted
     user_document = {
@@ -73,22 +110,30 @@ async def register_user(user: UserCreation):
     }
     
     # Insert the new user into the collection
-    users_collection.insert_one(user_document)
+    try:
+        await users_collection.insert_one(user_document)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A user with this email already exists."
+        )
     
     return user_document
 
 @router.post("/login", response_model=LoginResponse,status_code=status.HTTP_202_ACCEPTED)
-async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_user(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Handles user login.
     
+    - Rejects clients over the login rate limit before looking up the user.
     - Verifies the user's email and password.
-    - Returns a JWT token if successful.
+    - Returns a JWT token and a refresh token if successful.
     """
+    await login_throttle.check(request, "login", form_data.username)
     # Find the user by email
-    existing_user = get_user_by_email(form_data.username)
+    existing_user = await get_user_by_email(form_data.username)
     # Verify the password
-    if not existing_user or not verify_password(form_data.password, existing_user["password_hash"]):
+    if not existing_user or not await verify_password(form_data.password, existing_user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password."
@@ -98,22 +143,35 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends()):
     access_token = create_access_token(data={"sub": existing_user["email"]})
 
     return {
-        "access_token": access_token
+        "access_token": access_token,
+        "refresh_token": await create_refresh_token(existing_user),
     }
 
+@router.post("/refresh", response_model=LoginResponse, status_code=status.HTTP_200_OK)
+async def refresh_tokens(refresh_data: RefreshRequest):
+    """
+    Exchanges a refresh token for a new access token and refresh token.
+
+    - The presented refresh token is spent; using it again revokes every token issued from the same login.
+    - No password is checked, so this costs one indexed update instead of a bcrypt verification.
+    """
+    return await rotate_refresh_token(refresh_data.refresh_token)
+
 @router.put("/me/password", status_code=status.HTTP_204_NO_CONTENT)
 async def change_password(
     password_data: UserPasswordChange,
     current_user: dict = Depends(get_current_user)
 ):
-    """Allows an authenticated user to change their password."""
-    if not verify_password(password_data.current_password, current_user["password_hash"]):
+    """Allows an authenticated user to change their password and signs out every session's refresh token."""
+    if not await verify_password(password_data.current_password, current_user["password_hash"]):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect current password.")
-    new_hashed_password = get_password_hash(password_data.new_password)
-    users_collection.update_one(
+    new_hashed_password = await get_password_hash(password_data.new_password)
+    await users_collection.update_one(
         {"_id": current_user["_id"]},
         {"$set": {"password_hash": new_hashed_password}}
     )
+    await revoke_refresh_tokens(current_user["_id"])
+    await user_cache.invalidate(current_user["email"])
     return
 
 @router.put("/me/email", response_model=CreationResponse, status_code=status.HTTP_200_OK)
@@ -122,25 +180,140 @@ async def change_email(
     current_user: dict = Depends(get_current_user)
 ):
     """Allows an authenticated user to change their email."""
-    if not verify_password(email_data.password, current_user["password_hash"]):
+    if not await verify_password(email_data.password, current_user["password_hash"]):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect password.")
 
-    if users_collection.find_one({"email": email_data.new_email}):
+    try:
+        await users_collection.update_one(
+            {"_id": current_user["_id"]},
+            {"$set": {"email": email_data.new_email}}
+        )
+    except DuplicateKeyError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This email is already in use.")
+    # Refresh tokens carry the token subject, so sessions keep working under the new email
+    await refresh_tokens_collection.update_many({"userId": current_user["_id"]}, {"$set": {"email": email_data.new_email}})
+    await user_cache.invalidate(current_user["email"])
+    updated_user = await users_collection.find_one({"_id": current_user["_id"]})
+    return updated_user
 
-    users_collection.update_one(
-        {"_id": current_user["_id"]},
-        {"$set": {"email": email_data.new_email}}
+@router.get("/me/export", status_code=status.HTTP_200_OK)
+async def export_data(current_user: dict = Depends(get_current_user)):
+    """
+    Streams the user's courses, then their tasks (active, then archived), as NDJSON.
+    Each line is {"type": "course" | "task", "data": ...} using the same shapes as the API responses.
+    Documents are read from Mongo cursors batch by batch, so memory use does not grow with the account.
+    """
+    async def generate_lines():
+        courses = courses_collection.find({"userId": current_user["_id"], **LIVE_COURSE_QUERY}, COURSE_PROJECTION).batch_size(EXPORT_BATCH_SIZE)
+        async for course in courses:
+            yield encode_json({"type": "course", "data": format_course(course)}) + b"\n"
+        # Tasks of a deleted course stay in the collections until the purge reaches them; their course line is left out above
+        task_query = exclude_courses({"userId": current_user["_id"]}, await tombstoned_course_ids(current_user["_id"]))
+        for collection in (tasks_collection, tasks_archive_collection):
+            tasks = collection.find(task_query, TASK_PROJECTION).batch_size(EXPORT_BATCH_SIZE)
+            async for task in tasks:
+                yield encode_json({"type": "task", "data": format_task(task)}) + b"\n"
+
+    return StreamingResponse(
+        generate_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="coursework-export.ndjson"'}
     )
-    updated_user = users_collection.find_one({"_id": current_user["_id"]})
-    return updated_user
+
+@router.post("/me/import", response_model=ImportResponse, status_code=status.HTTP_200_OK)
+async def import_data(request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Imports an NDJSON stream in the format produced by GET /users/me/export.
+
+    The request body is read incrementally and written in bounded insert_many batches.
+    Imported courses get new IDs, and tasks are re-pointed at them through their original courseId.
+    Invalid lines are skipped and reported.
+    """
+    course_id_map = {}
+    course_batch, task_batch = [], []
+    summary = {"coursesImported": 0, "tasksImported": 0, "errorCount": 0, "errors": []}
+
+    def record_error(line_number: int, detail: str):
+        summary["errorCount"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_IMPORT_ERRORS:
+            summary["errors"].append({"line": line_number, "detail": detail})
+
+    async def flush():
+        # Courses go first so a task is never stored before the course it points at
+        if course_batch:
+            await courses_collection.insert_many(course_batch, ordered=False)
+            summary["coursesImported"] += len(course_batch)
+            course_batch.clear()
+        if task_batch:
+            active_tasks = [task for task in task_batch if not is_archived_status(task["status"])]
+            archived_tasks = [task for task in task_batch if is_archived_status(task["status"])]
+            if active_tasks:
+                await tasks_collection.insert_many(active_tasks, ordered=False)
+                # insert_many filled in each _id; tasks due inside the loaded window get their reminders now
+                for task in active_tasks:
+                    scheduler.schedule(task)
+            if archived_tasks:
+                await tasks_archive_collection.insert_many(archived_tasks, ordered=False)
+            summary["tasksImported"] += len(task_batch)
+            task_batch.clear()
+
+    async def import_line(line_number: int, line: bytes):
+        if not line.strip():
+            return
+        try:
+            record = json.loads(line)
+            record_type, data = record["type"], record["data"]
+            if record_type == "course":
+                course = CourseCreate.model_validate(data)
+                new_id = ObjectId()
+                course_id_map[data.get("id")] = new_id
+                course_batch.append({"_id": new_id, **course.model_dump(), "userId": current_user["_id"]})
+            elif record_type == "task":
+                task = TaskCreate.model_validate(data)
+                course_id = course_id_map.get(task.courseId)
+                if course_id is None:
+                    record_error(line_number, "Task refers to a course that is not in the import")
+                    return
+                task_document = task.model_dump()
+                task_document.update({"userId": current_user["_id"], "courseId": course_id, "priorityRank": priority_rank(task.priority)})
+                task_batch.append(task_document)
+            else:
+                record_error(line_number, f"Unknown record type: {record_type!r}")
+                return
+        except (ValueError, KeyError, TypeError) as error:
+            # ValidationError is a ValueError, as is JSONDecodeError
+            record_error(line_number, f"Invalid record: {error}")
+            return
+        if len(course_batch) + len(task_batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    buffer = b""
+    line_number = 0
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_number += 1
+                await import_line(line_number, line)
+            if len(buffer) > MAX_IMPORT_LINE_BYTES:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Line {line_number + 1} is too long.")
+        await import_line(line_number + 1, buffer)
+        await flush()
+    finally:
+        # Batches flushed before an aborted import stay stored, so caches must hear about them either way
+        if summary["coursesImported"] or summary["tasksImported"]:
+            await bump_data_version(current_user["_id"])
+            # Too many changes for individual events; connected clients should refetch
+            await broker.publish(current_user["_id"], "resync")
+    return summary
 
 # --- Utility Functions ---
-def get_user_by_email(email: str):
+async def get_user_by_email(email: str):
     """
     Fetch a user from the database by their email.
     
     :param email: The email of the user to fetch.
     :return: The user document if found, otherwise None.
     """
-    return users_collection.find_one({"email": email})
\ No newline at end of file
+    return await users_collection.find_one({"email": email})
\ No newline at end of file
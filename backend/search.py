@@ -0,0 +1,256 @@
+# search.py
+# Full-text search over a user's tasks and courses, with a pluggable backend.
+# The default uses Mongo text indexes; the in-process inverted index is for deployments whose
+# database has no text search, and is kept current from the change events in events.py.
+
+import asyncio
+import heapq
+import re
+from collections import OrderedDict
+
+from bson import ObjectId
+
+# Searchable fields per document type and their relative weights (mirrored by the text indexes)
+SEARCH_FIELDS = {
+    "task": {"title": 3, "description": 1},
+    "course": {"courseName": 3, "courseCode": 2, "description": 1},
+}
+# Longest snippet returned for a highlighted field
+SNIPPET_LENGTH = 160
+# Query terms beyond this many are ignored
+MAX_QUERY_TERMS = 10
+
+_WORD = re.compile(r"\w+")
+# A rough English stemmer for query terms; matching is by prefix, so "reading" finds "read" and "reads"
+_SUFFIXES = ("ing", "ed", "es", "s")
+
+
+def _stem(term: str) -> str:
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[: -len(suffix)]
+    return term
+
+def query_terms(query: str) -> list:
+    """Splits a query into distinct, lower-cased, stemmed terms."""
+    terms = []
+    for word in _WORD.findall(query.lower()):
+        term = _stem(word)
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+def highlight(field: str, text: str, terms: list) -> dict | None:
+    """
+    Returns {"field", "text", "ranges"} for a field containing any of the terms, where `text` is
+    a snippet of at most SNIPPET_LENGTH characters and `ranges` are [start, end) offsets into it.
+    Offsets are returned instead of markup, so clients never have to render stored text as HTML.
+    """
+    matches = [match.span() for match in _WORD.finditer(text) if match.group().lower().startswith(tuple(terms))]
+    if not matches:
+        return None
+    start = 0
+    if len(text) > SNIPPET_LENGTH:
+        # Open the window a little before the first match, without running past the end
+        start = max(0, min(matches[0][0] - SNIPPET_LENGTH // 4, len(text) - SNIPPET_LENGTH))
+    end = start + SNIPPET_LENGTH
+    prefix = "…" if start > 0 else ""
+    snippet = prefix + text[start:end] + ("…" if end < len(text) else "")
+    ranges = [[match_start - start + len(prefix), match_end - start + len(prefix)]
+              for match_start, match_end in matches if match_start >= start and match_end <= end]
+    return {"field": field, "text": snippet, "ranges": ranges}
+
+def search_hit(document_type: str, document: dict, score: float, terms: list) -> dict:
+    """Builds one result from a formatted task or course."""
+    highlights = []
+    for field in SEARCH_FIELDS[document_type]:
+        if document.get(field):
+            field_highlight = highlight(field, document[field], terms)
+            if field_highlight is not None:
+                highlights.append(field_highlight)
+    return {"type": document_type, "id": document["id"], "score": score, document_type: document, "highlights": highlights}
+
+def _rank_key(hit: dict):
+    # Best score first; type and id make the order total, so pages never overlap
+    return (-hit["score"], hit["type"], hit["id"])
+
+
+class SearchBackend:
+    """
+    Interface for the search backends. `search` returns up to `limit` hits after skipping
+    `offset`, ranked best first, each shaped like search_hit().
+    """
+
+    async def search(self, user_id, query: str, limit: int, offset: int) -> list:
+        raise NotImplementedError
+
+
+class MongoTextSearch(SearchBackend):
+    """
+    Queries the per-user text indexes on tasks, archived tasks and courses concurrently and
+    merges the three ranked lists. Every index is prefixed with userId, so a search only
+    touches the current user's entries.
+    """
+
+    def __init__(self, sources: list):
+        # (document type, collection handle, extra filter, projection, formatter) per collection;
+        # the extra filter is a dict, or a coroutine function taking the user ID and returning one
+        self.sources = sources
+
+    async def _search_source(self, source, user_id, query: str, count: int, terms: list) -> list:
+        document_type, collection, extra_filter, projection, formatter = source
+        if callable(extra_filter):
+            extra_filter = await extra_filter(ObjectId(user_id))
+        score = {"$meta": "textScore"}
+        documents = await (
+            collection.find({"userId": ObjectId(user_id), "$text": {"$search": query}, **extra_filter}, {**projection, "score": score})
+            .sort([("score", score)])
+            .limit(count)
+            .to_list()
+        )
+        return [search_hit(document_type, formatter(document), document["score"], terms) for document in documents]
+
+    async def search(self, user_id, query: str, limit: int, offset: int) -> list:
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # Each collection's best offset + limit hits are enough to fill the requested page
+        results = await asyncio.gather(*(self._search_source(source, user_id, query, offset + limit, terms) for source in self.sources))
+        hits = sorted((hit for hits in results for hit in hits), key=_rank_key)
+        return hits[offset:offset + limit]
+
+
+class _UserIndex:
+    """One user's documents and the inverted index over their words."""
+
+    def __init__(self):
+        self.documents: dict = {}  # (type, id) -> (formatted document, {field: set of words})
+        self.postings: dict = {}   # word -> set of (type, id)
+
+    def add(self, document_type: str, document: dict):
+        key = (document_type, document["id"])
+        self.remove(key)
+        words = {field: set(_WORD.findall((document.get(field) or "").lower())) for field in SEARCH_FIELDS[document_type]}
+        self.documents[key] = (document, words)
+        for field_words in words.values():
+            for word in field_words:
+                self.postings.setdefault(word, set()).add(key)
+
+    def remove(self, key):
+        entry = self.documents.pop(key, None)
+        if entry is None:
+            return
+        for field_words in entry[1].values():
+            for word in field_words:
+                keys = self.postings.get(word)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.postings[word]
+
+    def remove_course(self, course_id: str):
+        """Drops a deleted course and its tasks, which the purge worker is about to delete."""
+        self.remove(("course", course_id))
+        for key, (document, _) in list(self.documents.items()):
+            if key[0] == "task" and document.get("courseId") == course_id:
+                self.remove(key)
+
+    def search(self, terms: list, limit: int, offset: int) -> list:
+        """Ranks the matching documents, then builds hits (and highlights) for the requested page only."""
+        scores: dict = {}
+        for term in terms:
+            words = {word for word in self.postings if word.startswith(term)}
+            candidates = set().union(*(self.postings[word] for word in words))
+            for key in candidates:
+                _, fields = self.documents[key]
+                # A term counts once per document, at the weight of the best field it appears in
+                weight = max(SEARCH_FIELDS[key[0]][field] for field, field_words in fields.items() if field_words & words)
+                scores[key] = scores.get(key, 0) + weight
+        ranked = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0][0], item[0][1]))
+        return [search_hit(key[0], self.documents[key][0], score, terms) for key, score in ranked[offset:]]
+
+
+class InMemorySearchIndex(SearchBackend):
+    """
+    An inverted index per user, built from Mongo on the user's first search and then kept
+    current by applying the change events published after every write. With
+    EVENTS_BACKEND=mongo every worker sees every event, so each worker's index stays in step.
+    At most `max_users` indexes are kept; the least recently searched are evicted and rebuilt
+    when needed.
+    """
+
+    def __init__(self, loader, max_users: int):
+        # Coroutine returning a user's (document type, formatted document) pairs
+        self.loader = loader
+        self.max_users = max_users
+        self._users: OrderedDict = OrderedDict()  # user id -> _UserIndex
+        self._loads: dict = {}     # user id -> task building that user's index
+        self._pending: dict = {}   # user id -> events that arrived while the index was being built
+
+        # --- Metrics ---
+        self.builds = 0
+
+    def apply_event(self, user_id: str, event: dict):
+        """Broker listener: applies a change event to the user's index, if it has one."""
+        if user_id in self._pending:
+            self._pending[user_id].append(event)
+        elif user_id in self._users:
+            self._apply(user_id, event)
+
+    def _apply(self, user_id: str, event: dict):
+        event_type = event["type"]
+        if event_type == "resync":
+            # Too many changes to replay; build the index again on the next search
+            self._users.pop(user_id, None)
+            return
+        index = self._users[user_id]
+        if event_type in ("task.created", "task.updated"):
+            index.add("task", event["data"])
+        elif event_type == "task.deleted":
+            index.remove(("task", event["id"]))
+        elif event_type in ("course.created", "course.updated"):
+            index.add("course", event["data"])
+        elif event_type == "course.deleted":
+            index.remove_course(event["id"])
+
+    async def _build(self, user_id: str):
+        self._pending[user_id] = []
+        try:
+            index = _UserIndex()
+            for document_type, document in await self.loader(user_id):
+                index.add(document_type, document)
+            self._users[user_id] = index
+            self.builds += 1
+            # Replay writes that landed while the documents were being read
+            for event in self._pending[user_id]:
+                if user_id in self._users:
+                    self._apply(user_id, event)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        finally:
+            del self._pending[user_id]
+            del self._loads[user_id]
+
+    async def _get_index(self, user_id: str) -> _UserIndex | None:
+        index = self._users.get(user_id)
+        if index is None:
+            # Concurrent first searches share one build
+            if user_id not in self._loads:
+                self._loads[user_id] = asyncio.ensure_future(self._build(user_id))
+            await asyncio.shield(self._loads[user_id])
+            index = self._users.get(user_id)
+        else:
+            self._users.move_to_end(user_id)
+        return index
+
+    async def search(self, user_id, query: str, limit: int, offset: int) -> list:
+        terms = query_terms(query)
+        if not terms:
+            return []
+        index = await self._get_index(str(user_id))
+        if index is None:
+            return []
+        return index.search(terms, limit, offset)
+
+    def stats(self) -> dict:
+        return {"users": len(self._users), "builds": self.builds}
@@ -0,0 +1,60 @@
+# serialization.py
+# An opt-in fast path for list responses that skips FastAPI's response_model re-validation.
+
+import json
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library encoder
+    orjson = None
+
+# Load environment variables from .env file
+load_dotenv()
+# Off by default. Turn on with FAST_JSON_RESPONSES=1 once the formatters are trusted to
+# emit exactly the response model's fields, in its field order (format_task and format_course
+# do), so the bytes match the default path.
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "").lower() in ("1", "true", "yes")
+
+# Headers that belong to the placeholder response FastAPI injects into handlers, not to our body
+_SKIPPED_HEADERS = {"content-length", "content-type"}
+
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        # Match Pydantic's output, which writes UTC as "Z"
+        return value.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_json(content) -> bytes:
+    """Encodes already-formatted content (dicts, lists, strings, numbers, datetimes) to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_encode_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """Encodes already-formatted content straight to bytes, with orjson when it is installed."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return encode_json(content)
+
+
+def trusted_response(content, response: Response):
+    """
+    Returns `content` unchanged for FastAPI to validate and encode, or, in fast mode,
+    a pre-encoded FastJSONResponse that bypasses the response_model entirely.
+
+    Only pass content built by a trusted formatter. `response` is the handler's injected
+    Response; headers set on it (ETag, X-Next-Cursor) are carried over, because FastAPI
+    ignores them when a handler returns its own Response.
+    """
+    if not FAST_JSON_RESPONSES:
+        return content
+    headers = {key: value for key, value in response.headers.items() if key not in _SKIPPED_HEADERS}
+    return FastJSONResponse(content, headers=headers)
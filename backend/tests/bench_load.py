@@ -0,0 +1,267 @@
+# bench_load.py
+# A load-test harness that drives a weighted mix of real API calls at a fixed concurrency
+# and reports throughput and p50/p95/p99 latency per endpoint.
+#
+# By default the app runs in-process (including its lifespan) against MONGO_URI/MONGO_DB_NAME,
+# so point those at a local, throwaway mongod. Use --base-url to load a running server instead.
+#
+# Usage (from the backend directory):
+#   MONGO_DB_NAME=coursework_bench uv run python -m tests.bench_load --concurrency 50 --duration 30
+#   uv run python -m tests.bench_load --compare bench_results/<older>.json
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+# Relative weight of each scenario in the default mix
+DEFAULT_MIX = {
+    "login": 5,
+    "refresh": 5,
+    "dashboard": 30,
+    "list_tasks": 20,
+    "get_task": 10,
+    "create_task": 15,
+    "update_task": 10,
+    "delete_task": 5,
+    "delete_course": 5,
+}
+BENCH_EMAIL_DOMAIN = "bench.example.com"
+BENCH_PASSWORD = "bench-password-123"
+RESULTS_DIR = "bench_results"
+
+# --- SCENARIO STATE ---
+
+class BenchUser:
+    """A registered benchmark user with a token and the IDs it has created."""
+
+    def __init__(self, index: int):
+        self.email = f"bench-{index}@{BENCH_EMAIL_DOMAIN}"
+        self.headers = {}
+        self.refresh_token = None
+        # Workers share users, and a refresh token can only be spent once, so refreshes take turns
+        self.refresh_lock = asyncio.Lock()
+        self.course_ids = []
+        self.task_ids = []
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(fraction * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class Recorder:
+    """Collects (endpoint, latency, status) samples during the measured window."""
+
+    def __init__(self):
+        self.samples = {}
+
+    async def timed(self, endpoint: str, request):
+        started = time.perf_counter()
+        try:
+            response = await request
+            status_code = response.status_code
+        except httpx.HTTPError:
+            response, status_code = None, 0
+        self.samples.setdefault(endpoint, []).append((time.perf_counter() - started, status_code))
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = sorted(latency for latency, _ in samples)
+            errors = sum(1 for _, status_code in samples if status_code == 0 or status_code >= 400)
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": errors,
+                "rps": round(len(samples) / elapsed, 2),
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            }
+        total = sum(result["requests"] for result in endpoints.values())
+        return {"elapsed_seconds": round(elapsed, 3), "total_requests": total, "rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+# --- SCENARIOS ---
+
+def random_task(rng: random.Random, course_id: str, title: str) -> dict:
+    return {
+        "title": title,
+        "courseId": course_id,
+        "dueDate": (datetime.now(timezone.utc) + timedelta(hours=rng.randint(-48, 24 * 30))).isoformat(),
+        "priority": rng.choice(["Low", "Medium", "High"]),
+    }
+
+async def setup_user(client: httpx.AsyncClient, user: BenchUser, rng: random.Random, courses: int, tasks_per_course: int):
+    """Registers (or reuses) a user, logs in and gives it a starting set of courses and tasks."""
+    await client.post("/users/register", json={"username": user.email.split("@")[0], "email": user.email, "password": BENCH_PASSWORD})
+    response = await client.post("/users/login", data={"username": user.email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    user.refresh_token = response.json()["refresh_token"]
+    for course_index in range(courses):
+        response = await client.post("/courses/", headers=user.headers, json={"courseName": f"Bench Course {course_index}"})
+        course_id = response.json()["id"]
+        user.course_ids.append(course_id)
+        payload = {"tasks": [random_task(rng, course_id, f"Bench Task {task_index}") for task_index in range(tasks_per_course)]}
+        response = await client.post("/tasks/bulk", headers=user.headers, json=payload)
+        user.task_ids.extend(result["id"] for result in response.json()["results"] if result["status"] == 201)
+
+async def run_scenario(name: str, client: httpx.AsyncClient, user: BenchUser, rng: random.Random, recorder: Recorder):
+    """Issues the requests for one scenario; only the request named after the endpoint is timed."""
+    if name == "login":
+        await recorder.timed("POST /users/login", client.post("/users/login", data={"username": user.email, "password": BENCH_PASSWORD}))
+    elif name == "refresh":
+        async with user.refresh_lock:
+            response = await recorder.timed("POST /users/refresh", client.post("/users/refresh", json={"refresh_token": user.refresh_token}))
+            if response is not None and response.status_code == 200:
+                user.refresh_token = response.json()["refresh_token"]
+    elif name == "dashboard":
+        await recorder.timed("GET /dashboard", client.get("/dashboard", headers=user.headers, params={"limit": 50}))
+    elif name == "list_tasks":
+        await recorder.timed("GET /tasks/", client.get("/tasks/", headers=user.headers, params={"status": "active", "limit": 50}))
+    elif name == "get_task" and user.task_ids:
+        await recorder.timed("GET /tasks/{id}", client.get(f"/tasks/{rng.choice(user.task_ids)}", headers=user.headers))
+    elif name == "create_task" and user.course_ids:
+        payload = random_task(rng, rng.choice(user.course_ids), "Bench Task New")
+        response = await recorder.timed("POST /tasks/", client.post("/tasks/", headers=user.headers, json=payload))
+        if response is not None and response.status_code == 201:
+            user.task_ids.append(response.json()["id"])
+    elif name == "update_task" and user.task_ids:
+        payload = {"priority": rng.choice(["Low", "Medium", "High"]), "description": f"Updated {rng.random()}"}
+        await recorder.timed("PUT /tasks/{id}", client.put(f"/tasks/{rng.choice(user.task_ids)}", headers=user.headers, json=payload))
+    elif name == "delete_task" and user.task_ids:
+        task_id = user.task_ids.pop(rng.randrange(len(user.task_ids)))
+        await recorder.timed("DELETE /tasks/{id}", client.delete(f"/tasks/{task_id}", headers=user.headers))
+    elif name == "delete_course":
+        # Build a fresh course with tasks so the user's working set stays the same size
+        response = await client.post("/courses/", headers=user.headers, json={"courseName": "Bench Course Doomed"})
+        course_id = response.json()["id"]
+        payload = {"tasks": [random_task(rng, course_id, f"Bench Task Doomed {index}") for index in range(20)]}
+        await client.post("/tasks/bulk", headers=user.headers, json=payload)
+        await recorder.timed("DELETE /courses/{id}", client.delete(f"/courses/{course_id}", headers=user.headers))
+
+async def worker(client, users: list, mix: dict, rng: random.Random, recorder: Recorder, deadline: float):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await run_scenario(rng.choices(names, weights)[0], client, rng.choice(users), rng, recorder)
+
+# --- MAIN BENCHMARK LOGIC ---
+
+async def run_benchmark(args) -> dict:
+    rng = random.Random(args.seed)
+    async with AsyncExitStack() as stack:
+        if args.base_url:
+            client = await stack.enter_async_context(httpx.AsyncClient(base_url=args.base_url, timeout=60))
+        else:
+            # Every in-process request comes from one client address and the logins reuse a few
+            # accounts, so lift the login throttle unless the caller configured it explicitly
+            for setting in ("RATE_LIMIT_IP_BURST", "RATE_LIMIT_ACCOUNT_BURST"):
+                os.environ.setdefault(setting, "1000000000")
+            from main import app
+            # ASGITransport does not run the lifespan, so enter it here (indexes, workers, broker)
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)
+            client = await stack.enter_async_context(httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60))
+
+        print(f"🌱 Preparing {args.users} users with {args.courses} courses x {args.tasks} tasks each...")
+        users = [BenchUser(index) for index in range(args.users)]
+        for user in users:
+            await setup_user(client, user, rng, args.courses, args.tasks)
+
+        if args.warmup:
+            print(f"🔥 Warming up for {args.warmup}s...")
+            warmup_deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(worker(client, users, args.mix, random.Random(rng.random()), Recorder(), warmup_deadline) for _ in range(args.concurrency)))
+
+        print(f"🚀 Running {args.concurrency} concurrent clients for {args.duration}s...")
+        recorder = Recorder()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(client, users, args.mix, random.Random(rng.random()), recorder, deadline) for _ in range(args.concurrency)))
+        return recorder.summary(time.perf_counter() - started)
+
+def cleanup_bench_data():
+    """Removes every benchmark user and their data from the database the in-process app used."""
+    from database import get_sync_database
+    db = get_sync_database()
+    user_ids = [user["_id"] for user in db.users.find({"email": {"$regex": f"@{BENCH_EMAIL_DOMAIN}$"}}, {"_id": 1})]
+    # Deleting courses by userId takes course tombstones along
+    for name in ("courses", "purged_courses", "tasks", "tasks_archive", "notifications", "refresh_tokens"):
+        db[name].delete_many({"userId": {"$in": user_ids}})
+    # Data versions are keyed by the user ID itself
+    db.data_versions.delete_many({"_id": {"$in": user_ids}})
+    db.users.delete_many({"_id": {"$in": user_ids}})
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_summary(summary: dict, baseline: dict | None = None):
+    print(f"\n📊 {summary['total_requests']} requests in {summary['elapsed_seconds']}s ({summary['rps']} req/s)")
+    print(f"   {'endpoint':<24} {'reqs':>7} {'errs':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, result in summary["endpoints"].items():
+        line = (f"   {endpoint:<24} {result['requests']:>7} {result['errors']:>5} {result['rps']:>8} "
+                f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}")
+        previous = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if previous and previous["p95_ms"]:
+            line += f"   p95 {(result['p95_ms'] / previous['p95_ms'] - 1) * 100:+.1f}% vs baseline"
+        print(line)
+
+def parse_mix(value: str) -> dict:
+    """Parses "dashboard=30,create_task=10" into weights; unknown scenarios are rejected."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the API and report per-endpoint throughput and latency.")
+    parser.add_argument("--concurrency", type=int, default=20, help="number of concurrent simulated clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to measure for")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds to run before measuring")
+    parser.add_argument("--users", type=int, default=10, help="benchmark users to spread load across")
+    parser.add_argument("--courses", type=int, default=5, help="courses created per user before the run")
+    parser.add_argument("--tasks", type=int, default=40, help="tasks created per course before the run")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="scenario weights, e.g. dashboard=30,create_task=10")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for a repeatable request sequence")
+    parser.add_argument("--base-url", help="load a running server instead of the in-process app")
+    parser.add_argument("--output", help=f"where to save the JSON results (default: {RESULTS_DIR}/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="a previous results file to compare p95 latencies against")
+    parser.add_argument("--keep-data", action="store_true", help="leave the benchmark users and their data in the database")
+    args = parser.parse_args()
+
+    try:
+        summary = asyncio.run(run_benchmark(args))
+    finally:
+        if not args.base_url and not args.keep_data:
+            cleanup_bench_data()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["summary"]
+    print_summary(summary, baseline)
+
+    commit = current_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    with open(output, "w") as output_file:
+        json.dump({"commit": commit, "timestamp": datetime.now(timezone.utc).isoformat(), "config": config, "summary": summary}, output_file, indent=2)
+    print(f"\n💾 Saved results to {output}")
@@ -0,0 +1,91 @@
+# bench_serialization.py
+# A standalone benchmark comparing the per-item cost of the default list-response path
+# (response_model validation + jsonable_encoder + JSONResponse) with the trusted fast path.
+#
+# Usage (from the backend directory):
+#   uv run python -m tests.bench_serialization --items 10000 --repeat 5
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from main import app
+from routers.tasks import format_task
+import serialization
+
+# --- SAMPLE DATA ---
+
+def make_task_documents(count: int) -> list:
+    """Builds task documents shaped like the ones stored in Mongo."""
+    now = datetime.now().replace(microsecond=0)
+    user_id, course_id = ObjectId(), ObjectId()
+    return [
+        {
+            "_id": ObjectId(),
+            "userId": user_id,
+            "courseId": course_id,
+            "title": f"Benchmark task {index}",
+            "description": "Read the chapter and answer the review questions.",
+            "dueDate": now + timedelta(hours=index),
+            "priority": ("Low", "Medium", "High")[index % 3],
+            "status": "active",
+        }
+        for index in range(count)
+    ]
+
+def get_route(path: str, method: str = "GET") -> APIRoute:
+    return next(route for route in app.routes if isinstance(route, APIRoute) and route.path == path and method in route.methods)
+
+# --- SERIALIZATION PATHS ---
+
+async def default_path(route: APIRoute, items: list) -> bytes:
+    """What FastAPI does with a plain list returned from GET /tasks/."""
+    content = await serialize_response(field=route.response_field, response_content=items, is_coroutine=True)
+    return JSONResponse(content).body
+
+def fast_path(items: list) -> bytes:
+    """What the handler returns in FAST_JSON_RESPONSES mode."""
+    return serialization.FastJSONResponse(items).body
+
+# --- MAIN BENCHMARK LOGIC ---
+
+def run_benchmark(item_count: int, repeat: int):
+    route = get_route("/tasks/")
+    items = [format_task(task) for task in make_task_documents(item_count)]
+
+    # Both paths must produce the same JSON document
+    sample = items[:50]
+    assert json.loads(asyncio.run(default_path(route, sample))) == json.loads(fast_path(sample))
+    encoder = "orjson" if serialization.orjson is not None else "json (orjson not installed)"
+
+    results = {}
+    for name, run in [
+        ("default (validate + jsonable_encoder + json)", lambda: asyncio.run(default_path(route, items))),
+        (f"fast ({encoder})", lambda: fast_path(items)),
+    ]:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started)
+        results[name] = best
+
+    print(f"\n📊 Serializing {item_count} tasks (best of {repeat}):")
+    baseline = next(iter(results.values()))
+    for name, seconds in results.items():
+        per_item = seconds / item_count * 1_000_000
+        print(f"   {name:<48} {seconds * 1000:9.2f} ms total  {per_item:7.2f} µs/item  {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark list-response serialization paths.")
+    parser.add_argument("--items", type=int, default=10_000, help="number of tasks to serialize")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per path; the best run is reported")
+    args = parser.parse_args()
+    run_benchmark(args.items, args.repeat)
@@ -0,0 +1,209 @@
+# generate_data.py
+# A standalone generator for production-scale synthetic data: N users x M courses x K tasks.
+#
+# Documents are built in memory with client-side ObjectIds and written with batched insert_many
+# calls, the password is hashed once, and large runs are split across worker processes.
+# The same --seed always produces the same users, courses and tasks (only the ObjectIds differ).
+#
+# Usage (from the backend directory):
+#   uv run python -m tests.generate_data --users 10000 --courses 5 --tasks 40 --workers 8
+#   uv run python -m tests.generate_data --users 1000 --offset 10000   # add users 10000-10999
+#   uv run python -m tests.generate_data --wipe
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+# --- SETUP ---
+
+# Load environment variables from .env file
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "coursework_lite_db") # Default if not set
+
+# Every generated account uses this domain, which is how --wipe finds them again
+EMAIL_DOMAIN = "generated.example.com"
+PRIORITY_RANKS = {"Low": 1, "Medium": 2, "High": 3}
+COURSE_SUBJECTS = ["Calculus", "Physics", "Chemistry", "Biology", "History", "Literature", "Economics",
+                   "Statistics", "Databases", "Algorithms", "Networks", "Philosophy", "Art History", "Psychology"]
+TASK_VERBS = ["Read", "Review", "Write", "Submit", "Prepare", "Study", "Complete", "Outline", "Revise", "Present"]
+TASK_NOUNS = ["chapter", "problem set", "lab report", "essay draft", "quiz notes", "project proposal",
+              "reading response", "midterm review", "case study", "slides"]
+
+# --- DOCUMENT GENERATION ---
+
+def parse_distribution(value: str) -> dict:
+    """Parses "active=0.7,complete=0.3" into {"active": 0.7, "complete": 0.3}."""
+    distribution = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        distribution[name.strip()] = float(weight)
+    if not distribution or min(distribution.values()) < 0 or sum(distribution.values()) <= 0:
+        raise argparse.ArgumentTypeError(f"invalid distribution: {value!r}")
+    return distribution
+
+def generate_user(rng: random.Random, user_index: int, password_hash: str, config: dict):
+    """Builds one user and all of their courses and tasks."""
+    user_id = ObjectId()
+    user = {"_id": user_id, "username": f"Generated User {user_index}", "email": f"user{user_index}@{EMAIL_DOMAIN}", "password_hash": password_hash}
+    statuses, status_weights = list(config["statuses"]), list(config["statuses"].values())
+    priorities, priority_weights = list(config["priorities"]), list(config["priorities"].values())
+
+    courses, tasks = [], []
+    for course_index in range(config["courses"]):
+        course_id = ObjectId()
+        subject = rng.choice(COURSE_SUBJECTS)
+        courses.append({
+            "_id": course_id,
+            "userId": user_id,
+            "courseName": f"{subject} {course_index + 1}",
+            "courseCode": f"{subject[:3].upper()}{rng.randint(1000, 4999)}",
+            "colorTag": f"#{rng.randrange(0x1000000):06X}",
+            "description": None,
+        })
+        for _ in range(config["tasks"]):
+            priority = rng.choices(priorities, priority_weights)[0]
+            due_date = None
+            if rng.random() >= config["no_due_date"]:
+                # Due dates cluster around "now": a normal spread of --due-spread-days
+                due_date = config["anchor"] + timedelta(days=rng.gauss(config["due_offset_days"], config["due_spread_days"]))
+                due_date = due_date.replace(microsecond=0)
+            tasks.append({
+                "userId": user_id,
+                "courseId": course_id,
+                "title": f"{rng.choice(TASK_VERBS)} {rng.choice(TASK_NOUNS)}",
+                "description": None,
+                "dueDate": due_date,
+                "priority": priority,
+                "priorityRank": PRIORITY_RANKS.get(priority, 0),
+                "status": rng.choices(statuses, status_weights)[0],
+            })
+    return user, courses, tasks
+
+def generate_range(start: int, stop: int, password_hash: str, config: dict) -> dict:
+    """
+    Generates and inserts users [start, stop). Runs in a worker process with its own client.
+    Each user's documents come from an RNG seeded with (seed, user index), so the output
+    does not depend on how the users were split across processes.
+    """
+    db = MongoClient(MONGO_URI)[MONGO_DB_NAME]
+    batch_size = config["batch_size"]
+    pending = {"users": [], "courses": [], "tasks": [], "tasks_archive": []}
+    counts = {name: 0 for name in pending}
+
+    def flush(name: str):
+        if pending[name]:
+            db[name].insert_many(pending[name], ordered=False)
+            counts[name] += len(pending[name])
+            pending[name] = []
+
+    for user_index in range(start, stop):
+        rng = random.Random(f"{config['seed']}:{user_index}")
+        user, courses, tasks = generate_user(rng, user_index, password_hash, config)
+        pending["users"].append(user)
+        pending["courses"].extend(courses)
+        for task in tasks:
+            # Only active tasks live in the hot collection (see archive.py)
+            pending["tasks" if task["status"] == "active" else "tasks_archive"].append(task)
+        # Parents are written before children, so no task ever points at a missing course
+        for name in pending:
+            if len(pending[name]) >= batch_size:
+                flush("users")
+                flush("courses")
+                flush(name)
+    for name in pending:
+        flush(name)
+    return counts
+
+# --- MAIN GENERATION LOGIC ---
+
+def wipe_generated(db):
+    """Deletes every generated user and their data, in batches of users."""
+    print(f"🧹 Removing generated users (@{EMAIL_DOMAIN}) and their data...")
+    removed = 0
+    while True:
+        user_ids = [user["_id"] for user in db.users.find({"email": {"$regex": f"@{EMAIL_DOMAIN}$"}}, {"_id": 1}).limit(1000)]
+        if not user_ids:
+            break
+        for name in ("tasks", "tasks_archive", "courses", "notifications", "refresh_tokens", "data_versions"):
+            db[name].delete_many({"_id" if name == "data_versions" else "userId": {"$in": user_ids}})
+        removed += db.users.delete_many({"_id": {"$in": user_ids}}).deleted_count
+    print(f"✅ Removed {removed} users.")
+
+def generate(args):
+    config = {
+        "seed": args.seed,
+        "courses": args.courses,
+        "tasks": args.tasks,
+        "statuses": args.statuses,
+        "priorities": args.priorities,
+        "no_due_date": args.no_due_date,
+        "due_offset_days": args.due_offset_days,
+        "due_spread_days": args.due_spread_days,
+        "batch_size": args.batch_size,
+        # Midnight today keeps due dates reproducible for the same seed on the same day
+        "anchor": datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None),
+    }
+    # Every generated user shares a password, so bcrypt runs exactly once
+    password_hash = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    total_tasks = args.users * args.courses * args.tasks
+    workers = args.workers if args.workers else (1 if total_tasks < 200_000 else min(os.cpu_count() or 1, 8))
+    chunk = max(1, -(-args.users // (workers * 4)))  # several chunks per worker evens out the load
+    stop = args.offset + args.users
+    ranges = [(start, min(start + chunk, stop)) for start in range(args.offset, stop, chunk)]
+    print(f"🌱 Generating {args.users} users, {args.users * args.courses} courses and {total_tasks} tasks "
+          f"with {workers} process(es)...")
+
+    started = time.perf_counter()
+    totals = {}
+    if workers == 1:
+        results = (generate_range(start, stop, password_hash, config) for start, stop in ranges)
+        for counts in results:
+            totals = {name: totals.get(name, 0) + count for name, count in counts.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(generate_range, start, stop, password_hash, config) for start, stop in ranges]
+            for done, future in enumerate(as_completed(futures), start=1):
+                totals = {name: totals.get(name, 0) + count for name, count in future.result().items()}
+                print(f"   {done}/{len(futures)} chunks written ({totals.get('tasks', 0) + totals.get('tasks_archive', 0)} tasks)")
+
+    elapsed = time.perf_counter() - started
+    written_tasks = totals.get("tasks", 0) + totals.get("tasks_archive", 0)
+    print(f"\n🎉 Wrote {totals.get('users', 0)} users, {totals.get('courses', 0)} courses and {written_tasks} tasks "
+          f"({totals.get('tasks_archive', 0)} archived) in {elapsed:.1f}s ({written_tasks / elapsed:,.0f} tasks/s).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic users, courses and tasks at scale.")
+    parser.add_argument("--users", type=int, default=1000, help="number of users")
+    parser.add_argument("--courses", type=int, default=5, help="courses per user")
+    parser.add_argument("--tasks", type=int, default=20, help="tasks per course")
+    parser.add_argument("--statuses", type=parse_distribution, default="active=0.7,complete=0.3", help="status weights")
+    parser.add_argument("--priorities", type=parse_distribution, default="Low=0.3,Medium=0.5,High=0.2", help="priority weights")
+    parser.add_argument("--no-due-date", type=float, default=0.1, help="fraction of tasks without a due date")
+    parser.add_argument("--due-offset-days", type=float, default=7, help="mean due date, in days from today")
+    parser.add_argument("--due-spread-days", type=float, default=21, help="standard deviation of due dates, in days")
+    parser.add_argument("--password", default="password123", help="password shared by every generated user")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for reproducible data")
+    parser.add_argument("--batch-size", type=int, default=5000, help="documents per insert_many call")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (default: 1 for small runs, else one per CPU up to 8)")
+    parser.add_argument("--wipe", action="store_true", help="remove previously generated users and their data, then exit")
+    parser.add_argument("--offset", type=int, default=0, help="index of the first user; a non-zero offset adds to earlier generated users instead of replacing them")
+    args = parser.parse_args()
+
+    db = MongoClient(MONGO_URI)[MONGO_DB_NAME]
+    if args.wipe:
+        wipe_generated(db)
+    else:
+        if args.offset == 0:
+            wipe_generated(db)
+        generate(args)
@@ -1,5 +1,6 @@
 # seed_db.py
-# A standalone script to populate the MongoDB database with sample data for a single user.
+# A standalone script to populate the MongoDB database with a small, hand-written demo dataset.
+# For production-scale synthetic data use tests/generate_data.py instead.
 
 import os
 from dotenv import load_dotenv
@@ -23,6 +24,7 @@ try:
     users_collection = db.users
     courses_collection = db.courses
     tasks_collection = db.tasks
+    tasks_archive_collection = db.tasks_archive
     print(f"✅ Successfully connected to MongoDB database: '{MONGO_DB_NAME}'")
 except Exception as e:
     print(f"❌ Error connecting to MongoDB: {e}")
@@ -30,6 +32,8 @@ except Exception as e:
 
 # --- UTILITY FUNCTIONS ---
 
+PRIORITY_RANKS = {"Low": 1, "Medium": 2, "High": 3}
+
 def get_password_hash(password: str) -> str:
     """Hashes a plain-text password using bcrypt."""
     password_bytes = password.encode('utf-8')
@@ -133,57 +137,62 @@ def seed_database():
     users_collection.delete_many({})
     courses_collection.delete_many({})
     tasks_collection.delete_many({})
+    tasks_archive_collection.delete_many({})
     print("✅ Collections cleared.")
 
     print("\n🌱 Starting to seed the database for multiple users...")
 
-    # 1. Create the user
+    # Identical passwords share one bcrypt hash instead of being hashed once per user
+    password_hashes = {password: get_password_hash(password) for password in {user["password"] for user in users_data}}
+    user_docs, course_docs, task_docs = [], [], []
+
+    # 1. Create the users
     for user_data in users_data:
         print(f"👤 Creating user: {user_data['username']}")
-        user_doc = {
+        user_id = ObjectId()
+        user_docs.append({
+            "_id": user_id,
             "username": user_data["username"],
             "email": user_data["email"],
-            "password_hash": get_password_hash(user_data["password"]),
-        }
-        user_result = users_collection.insert_one(user_doc)
-        user_id = user_result.inserted_id
-
-        # 2. Create the courses for the user
-        course_docs = []
-        for course_info in courses_data:
-            print(f"  📘 Creating course: {course_info['courseName']}")
-            course_doc = {
-                "userId": user_id,
-                **course_info # Unpack the course details
-            }
-            course_result = courses_collection.insert_one(course_doc)
-            # Store the created document along with its new ID for task association
-            course_docs.append({"_id": course_result.inserted_id, **course_doc})
-        
+            "password_hash": password_hashes[user_data["password"]],
+        })
+
+        # 2. Create the courses for the user; IDs are assigned up front so tasks can point at them
+        user_courses = [{"_id": ObjectId(), "userId": user_id, **course_info} for course_info in courses_data]
+        course_docs.extend(user_courses)
+        course_ids = {course["courseName"]: course["_id"] for course in user_courses}
+
         # 3. Create the tasks, associating them with the correct course
-        print("\n  📝 Creating tasks...")
-        tasks_to_create = get_tasks_data(course_docs)
+        tasks_to_create = get_tasks_data(user_courses)
         for task_info in tasks_to_create:
-            # Find the corresponding course document to get its ID
-            course = next((c for c in course_docs if c["courseName"] == task_info["courseName"]), None)
-            if course:
-                task_doc = {
-                    "userId": user_id,
-                    "courseId": course["_id"],
-                    "title": task_info["title"],
-                    "description": task_info["description"],
-                    "dueDate": task_info["dueDate"],
-                    "priority": task_info["priority"],
-                    "status": task_info["status"],
-                }
-                tasks_collection.insert_one(task_doc)
-                print(f"    ✅ Created task: '{task_info['title']}' for course '{task_info['courseName']}'")
-            else:
+            course_id = course_ids.get(task_info["courseName"])
+            if course_id is None:
                 print(f"    ⚠️ Could not find course '{task_info['courseName']}' to create task.")
+                continue
+            task_docs.append({
+                "userId": user_id,
+                "courseId": course_id,
+                "title": task_info["title"],
+                "description": task_info["description"],
+                "dueDate": task_info["dueDate"],
+                "priority": task_info["priority"],
+                "priorityRank": PRIORITY_RANKS.get(task_info["priority"], 0),
+                "status": task_info["status"],
+            })
+
+    # One insert_many per collection; only active tasks live in the hot collection, the rest go to the archive
+    users_collection.insert_many(user_docs)
+    courses_collection.insert_many(course_docs)
+    active_tasks = [task for task in task_docs if task["status"] == "active"]
+    archived_tasks = [task for task in task_docs if task["status"] != "active"]
+    if active_tasks:
+        tasks_collection.insert_many(active_tasks)
+    if archived_tasks:
+        tasks_archive_collection.insert_many(archived_tasks)
 
     print(f"\n\n🎉 Database seeding complete!")
-    print(f"Created 1 user, {len(courses_data)} courses, and {len(tasks_to_create)} tasks.")
-    print(f"You can now log in as '{user_data['email']}' with the password 'password123'.")
+    print(f"Created {len(user_docs)} users, {len(course_docs)} courses, and {len(task_docs)} tasks.")
+    print(f"You can now log in as '{users_data[0]['email']}' with the password '{users_data[0]['password']}'.")
 
 
 if __name__ == "__main__":
@@ -1,11 +1,34 @@
+import asyncio
+import json
 import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 from fastapi.testclient import TestClient
 from bson import ObjectId
 
 # Import the main app and database collections
 # This assumes your tests are run from the root of the 'backend' directory
 from main import app 
-from database import users_collection, courses_collection, tasks_collection
+import database
+from database import get_sync_database
+from events import EventBroker, LocalBackend, broker
+from ical import calendar_feeds
+from metrics import CommandMetricsListener, MetricsMiddleware, http_request_duration, http_requests, registry
+from profiler import QueryProfiler, query_profiler, query_shape
+from reminders import NotificationDelivery, ReminderScheduler
+from routers.events import is_client_event
+import auth
+import purge
+import routers.admin
+import routers.users
+import serialization
+
+# The app talks to Mongo asynchronously; fixtures clean up through a blocking handle
+db = get_sync_database()
+users_collection = db.users
+courses_collection = db.courses
+tasks_collection = db.tasks
+tasks_archive_collection = db.tasks_archive
 
 # Create a client to make requests to the app
 client = TestClient(app)
@@ -31,13 +54,17 @@ def setup_and_teardown_db():
     # A simple way to clear test data without complex lookups
     courses_collection.delete_many({"courseName": {"$regex": "Test Course"}})
     tasks_collection.delete_many({"title": {"$regex": "Test Task"}})
+    tasks_archive_collection.delete_many({"title": {"$regex": "Test Task"}})
     
-    yield # This is where the entire test session runs
+    # Entering the client runs the app lifespan, which creates the indexes
+    with client:
+        yield # This is where the entire test session runs
     
     # Cleanup after all tests in the session
     users_collection.delete_many({"email": {"$in": user_emails}})
     courses_collection.delete_many({"courseName": {"$regex": "Test Course"}})
     tasks_collection.delete_many({"title": {"$regex": "Test Task"}})
+    tasks_archive_collection.delete_many({"title": {"$regex": "Test Task"}})
 
 
 @pytest.fixture(scope="session")
@@ -68,6 +95,35 @@ def course_for_user_a(auth_headers_user_a):
     return response.json()
 
 
+# --- Database Client Tests ---
+
+def test_async_client_is_closed_with_its_event_loop(monkeypatch):
+    """Each event loop's client is closed when the loop shuts down or at close_client(), never leaked."""
+    closed = []
+    class RecordingClient:
+        def __init__(self, *args, **kwargs):
+            pass
+        async def close(self):
+            closed.append(self)
+    monkeypatch.setattr(database, "AsyncMongoClient", RecordingClient)
+
+    async def use_client():
+        client = database.get_client()
+        assert database.get_client() is client
+        await asyncio.sleep(0)
+        return client
+    client = asyncio.run(use_client())
+    assert closed == [client]
+
+    async def use_then_close_client():
+        client = database.get_client()
+        await database.close_client()
+        return client
+    client = asyncio.run(use_then_close_client())
+    assert closed[-1] is client and len(closed) == 2
+    assert not any(isinstance(existing, RecordingClient) for existing in database._clients.values())
+
+
 # --- User Endpoint Tests ---
 
 def test_register_user_duplicate_email(auth_headers_user_a):
@@ -147,3 +203,361 @@ def test_delete_course_cascades_to_tasks(auth_headers_user_a):
 
     task_get_res = client.get(f"/tasks/{task_id}", headers=auth_headers_user_a)
     assert task_get_res.status_code == 404
+
+
+# --- Dashboard Endpoint Tests ---
+
+def test_dashboard_combines_courses_tasks_and_counts(auth_headers_user_a, course_for_user_a):
+    """Tests that the dashboard returns the user's courses, active tasks and per-course counts together."""
+    course_id = course_for_user_a["id"]
+    client.post("/tasks/", headers=auth_headers_user_a, json={"title": "Test Dashboard Task", "courseId": course_id})
+    client.post("/tasks/", headers=auth_headers_user_a, json={"title": "Test Dashboard Done Task", "courseId": course_id, "status": "complete"})
+
+    response = client.get("/dashboard", headers=auth_headers_user_a)
+    assert response.status_code == 200
+    data = response.json()
+    assert course_id in [course["id"] for course in data["courses"]]
+    assert all(task["status"] == "active" for task in data["tasks"])
+    assert data["taskCounts"][course_id] == {"active": 1, "complete": 1}
+    assert set(data["reminders"]) == {"overdue", "dueSoon", "overdueCount", "dueSoonCount"}
+
+def test_dashboard_requires_authentication():
+    """SECURITY TEST: Ensures the dashboard is not reachable without a token."""
+    response = client.get("/dashboard")
+    assert response.status_code == 401
+
+
+def test_fast_json_responses_match_default_encoding(auth_headers_user_a, course_for_user_a, monkeypatch):
+    """FAST_JSON_RESPONSES=1 must produce the same bytes as the response_model path, with orjson or without."""
+    client.post("/tasks/", headers=auth_headers_user_a, json={"title": "Test Task Encodé ✓", "courseId": course_for_user_a, "dueDate": "2030-05-01T12:00:00.123456Z", "description": 'Quotes " and \\ slashes'})
+    client.post("/tasks/", headers=auth_headers_user_a, json={"title": "Test Task No Date", "courseId": course_for_user_a})
+    paths = ["/tasks/", "/tasks/?limit=1", "/courses/", "/dashboard"]
+
+    monkeypatch.setattr(serialization, "FAST_JSON_RESPONSES", False)
+    default = {path: client.get(path, headers=auth_headers_user_a) for path in paths}
+    monkeypatch.setattr(serialization, "FAST_JSON_RESPONSES", True)
+    for encoder in (serialization.orjson, None):
+        monkeypatch.setattr(serialization, "orjson", encoder)
+        for path in paths:
+            fast = client.get(path, headers=auth_headers_user_a)
+            assert fast.content == default[path].content, path
+            for header in ("content-type", "etag", "x-next-cursor"):
+                assert fast.headers.get(header) == default[path].headers.get(header), (path, header)
+
+
+# --- Export / Import Tests ---
+
+def test_export_then_import_into_another_account(auth_headers_user_a, auth_headers_user_b):
+    """INTEGRATION TEST: Exports User A's data as NDJSON and imports it into User B's account."""
+    course_id = client.post("/courses/", headers=auth_headers_user_a, json={"courseName": "Test Course for Export"}).json()["id"]
+    client.post("/tasks/", headers=auth_headers_user_a, json={"title": "Test Task to Export", "courseId": course_id, "dueDate": "2030-05-01T12:00:00"})
+
+    export_res = client.get("/users/me/export", headers=auth_headers_user_a)
+    assert export_res.status_code == 200
+    assert export_res.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in export_res.text.splitlines()]
+    assert {"type": "course", "data": {"id": course_id, "courseName": "Test Course for Export", "courseCode": None, "colorTag": None, "description": None}} in records
+    exported_tasks = [record["data"] for record in records if record["type"] == "task" and record["data"]["courseId"] == course_id]
+    assert exported_tasks[0]["title"] == "Test Task to Export"
+
+    ndjson = "\n".join(json.dumps(record) for record in records) + "\n{not json}\n"
+    import_res = client.post("/users/me/import", headers={**auth_headers_user_b, "Content-Type": "application/x-ndjson"}, content=ndjson)
+    assert import_res.status_code == 200
+    summary = import_res.json()
+    assert summary["coursesImported"] == len([r for r in records if r["type"] == "course"])
+    assert summary["tasksImported"] == len([r for r in records if r["type"] == "task"])
+    assert summary["errorCount"] == 1
+
+    # The imported copy belongs to User B and points at User B's new course
+    imported_courses = [c for c in client.get("/courses/", headers=auth_headers_user_b).json() if c["courseName"] == "Test Course for Export"]
+    assert len(imported_courses) == 1 and imported_courses[0]["id"] != course_id
+    imported_tasks = client.get(f"/tasks/?course_id={imported_courses[0]['id']}", headers=auth_headers_user_b).json()
+    assert [task["title"] for task in imported_tasks] == ["Test Task to Export"]
+    assert imported_tasks[0]["dueDate"] == "2030-05-01T12:00:00"
+
+def test_export_leaves_out_tasks_of_deleted_courses(auth_headers_user_a, auth_headers_user_b):
+    """An export taken after a course is deleted but before its purge finishes still imports cleanly."""
+    course_id = client.post("/courses/", headers=auth_headers_user_a, json={"courseName": "Test Course Deleted Before Export"}).json()["id"]
+    client.post("/tasks/", headers=auth_headers_user_a, json={"title": "Test Task Not Purged Yet", "courseId": course_id})
+    # Tombstoned, with the purge of its tasks still to come
+    courses_collection.update_one({"_id": ObjectId(course_id)}, {"$set": {"deletedAt": datetime.now(timezone.utc)}})
+    try:
+        records = [json.loads(line) for line in client.get("/users/me/export", headers=auth_headers_user_a).text.splitlines()]
+        assert course_id not in [record["data"]["id"] for record in records if record["type"] == "course"]
+        assert course_id not in [record["data"]["courseId"] for record in records if record["type"] == "task"]
+
+        ndjson = "\n".join(json.dumps(record) for record in records)
+        import_res = client.post("/users/me/import", headers={**auth_headers_user_b, "Content-Type": "application/x-ndjson"}, content=ndjson)
+        assert import_res.json()["errorCount"] == 0
+    finally:
+        asyncio.run(purge.purge_deleted_courses())
+
+def test_import_schedules_reminders(auth_headers_user_b, monkeypatch):
+    """Imported active tasks due soon get their reminders without waiting for the next window load."""
+    scheduler = ReminderScheduler(NotificationDelivery(), due_soon=timedelta(hours=24), horizon=timedelta(hours=48))
+    scheduler._loaded_until = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=48)
+    monkeypatch.setattr(routers.users, "scheduler", scheduler)
+    due_date = (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()
+    records = [
+        {"type": "course", "data": {"id": "c1", "courseName": "Test Course Import Reminders"}},
+        {"type": "task", "data": {"title": "Due Soon", "courseId": "c1", "dueDate": due_date}},
+        {"type": "task", "data": {"title": "Done Already", "courseId": "c1", "dueDate": due_date, "status": "complete"}},
+    ]
+    ndjson = "\n".join(json.dumps(record) for record in records)
+    import_res = client.post("/users/me/import", headers={**auth_headers_user_b, "Content-Type": "application/x-ndjson"}, content=ndjson)
+    assert import_res.json()["tasksImported"] == 2
+    assert scheduler.stats()["scheduled"] == 1
+
+def test_aborted_import_still_bumps_data_version(auth_headers_user_b, monkeypatch):
+    """Batches flushed before a line trips the size limit stay stored, so cached lists must go stale."""
+    monkeypatch.setattr(routers.users, "IMPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr(routers.users, "MAX_IMPORT_LINE_BYTES", 64)
+    etag = client.get("/courses", headers=auth_headers_user_b).headers["ETag"]
+    ndjson = json.dumps({"type": "course", "data": {"id": "c1", "courseName": "Test Course Aborted Import"}}) + "\n" + "x" * 100
+    import_res = client.post("/users/me/import", headers={**auth_headers_user_b, "Content-Type": "application/x-ndjson"}, content=ndjson)
+    assert import_res.status_code == 413
+    refreshed = client.get("/courses", headers={**auth_headers_user_b, "If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert "Test Course Aborted Import" in [course["courseName"] for course in refreshed.json()]
+
+
+# --- Change Feed Tests ---
+
+def test_events_require_authentication():
+    assert client.get("/events").status_code == 401
+    assert client.get("/events?token=not-a-token").status_code == 401
+
+def test_events_token_opens_only_the_stream(auth_headers_user_a):
+    response = client.post("/events/token", headers=auth_headers_user_a)
+    assert response.status_code == 201
+    events_token = response.json()["token"]
+    # Accepted by GET /events in the URL, where EventSource can send it
+    user = asyncio.run(auth.get_events_user(token=events_token, bearer_token=None))
+    assert user["email"] == USER_A_DATA["email"]
+    # ...but it is not an access token, and an access token is not an events token
+    assert client.get("/tasks/", headers={"Authorization": f"Bearer {events_token}"}).status_code == 401
+    access_token = auth_headers_user_a["Authorization"].removeprefix("Bearer ")
+    assert client.get(f"/events?token={access_token}").status_code == 401
+
+def test_stream_forwards_only_client_events():
+    assert is_client_event({"type": "task.updated"}) and is_client_event({"type": "resync"})
+    assert not is_client_event({"type": "calendar.token"}) and not is_client_event({"type": "reminder.dueSoon"})
+
+def test_writes_publish_change_events(auth_headers_user_a):
+    user = users_collection.find_one({"email": USER_A_DATA["email"]})
+    subscription = broker.subscribe(user["_id"])
+    try:
+        course = client.post("/courses/", headers=auth_headers_user_a, json={"courseName": "Test Course Events"}).json()
+        task = client.post("/tasks/", headers=auth_headers_user_a, json={"title": "Test Task Events", "courseId": course["id"]}).json()
+        client.put(f"/tasks/{task['id']}", headers=auth_headers_user_a, json={"priority": "High"})
+        client.delete(f"/tasks/{task['id']}", headers=auth_headers_user_a)
+
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        assert [event["type"] for event in events] == ["course.created", "task.created", "task.updated", "task.deleted"]
+        assert events[2]["data"]["priority"] == "High"
+        assert "data" not in events[3] and events[3]["id"] == task["id"]
+    finally:
+        broker.unsubscribe(subscription)
+
+def test_slow_consumer_is_dropped():
+    test_broker = EventBroker(backend=LocalBackend(), max_queue=2)
+    slow, other = test_broker.subscribe("slow-user"), test_broker.subscribe("other-user")
+
+    async def publish_three():
+        for index in range(3):
+            await test_broker.publish("slow-user", "task.created", index)
+    asyncio.run(publish_three())
+
+    # The backlog is discarded and replaced by the end-of-stream marker
+    assert slow.dropped and slow.queue.get_nowait() is None
+    assert not other.dropped
+    assert test_broker.stats()["subscribers"] == 1
+    assert test_broker.stats()["dropped_consumers"] == 1
+
+
+# --- Metrics Tests ---
+
+def test_metrics_endpoint_reports_routes_and_bcrypt(auth_headers_user_a, course_for_user_a):
+    client.get(f"/tasks/?course_id={course_for_user_a['id']}", headers=auth_headers_user_a)
+    client.get("/no-such-path")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    # Routes are labelled by template, never by the raw path
+    assert 'http_requests_total{method="GET",route="/tasks/",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/tasks/",le="+Inf"}' in body
+    assert 'route="unmatched",status="404"' in body
+    assert 'bcrypt_duration_seconds_count{operation="verify"}' in body
+    assert "hash_pool_queue_depth " in body
+    # Running totals are counters, so rate() works on them
+    assert "# TYPE hash_pool_rejected_total counter\nhash_pool_rejected_total " in body
+    assert "# TYPE user_cache_hits_total counter" in body and "# TYPE hash_pool_queue_depth gauge" in body
+
+def test_request_latency_stops_at_response_headers():
+    """A body streamed after the headers (SSE, exports) does not count towards the request latency."""
+    async def slow_stream_app(scope, receive, send):
+        scope["route"] = SimpleNamespace(path="/slow-stream")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await asyncio.sleep(0.3)
+        await send({"type": "http.response.body", "body": b"done"})
+
+    async def receive():
+        return {"type": "http.request"}
+    async def send(message):
+        pass
+
+    asyncio.run(MetricsMiddleware(slow_stream_app)({"type": "http", "method": "GET"}, receive, send))
+    duration = http_request_duration.labels("GET", "/slow-stream")
+    assert duration.count == 1 and duration.sum < 0.25
+    assert http_requests.labels("GET", "/slow-stream", 200).value == 1
+
+def test_command_listener_times_commands_per_collection():
+    listener = CommandMetricsListener()
+    started = SimpleNamespace(command_name="find", command={"find": "metrics_probe", "filter": {}}, request_id=1, connection_id=("h", 1))
+    listener.started(started)
+    listener.succeeded(SimpleNamespace(request_id=1, connection_id=("h", 1), duration_micros=1500))
+    listener.started(SimpleNamespace(command_name="insert", command={"insert": "metrics_probe"}, request_id=2, connection_id=("h", 1)))
+    listener.failed(SimpleNamespace(request_id=2, connection_id=("h", 1), duration_micros=300))
+
+    body = registry.render()
+    assert 'mongodb_command_duration_seconds_count{collection="metrics_probe",command="find"} 1' in body
+    assert 'mongodb_command_duration_seconds_bucket{collection="metrics_probe",command="find",le="0.0025"} 1' in body
+    assert 'mongodb_command_failures_total{collection="metrics_probe",command="insert"} 1' in body
+
+
+# --- Query Profiler Tests ---
+
+def test_query_shape_hides_values():
+    query = {"userId": ObjectId(), "status": "active", "dueDate": {"$gte": 1}, "_id": {"$in": [1, 2]}, "$or": [{"a": 1}, {"b": 2}]}
+    assert query_shape(query) == {"userId": "?", "status": "?", "dueDate": {"$gte": "?"}, "_id": {"$in": ["?"]}, "$or": [{"a": "?"}, {"b": "?"}]}
+
+def test_profiler_aggregates_query_shapes():
+    profiler = QueryProfiler(slow_ms=5, sample_rate=0, examined_ratio=100, max_shapes=10, explain_cooldown=300)
+    for request_id, (user, micros) in enumerate([("a", 1000), ("b", 9000), ("c", 2000)]):
+        command = {"find": "tasks", "filter": {"userId": user, "status": "active"}, "sort": {"dueDate": 1}}
+        profiler.started(SimpleNamespace(command_name="find", command=command, database_name="db", request_id=request_id, connection_id=1))
+        profiler.succeeded(SimpleNamespace(request_id=request_id, connection_id=1, duration_micros=micros))
+    # Commands that carry no filter are not profiled
+    profiler.started(SimpleNamespace(command_name="hello", command={"hello": 1}, database_name="admin", request_id=9, connection_id=1))
+
+    [stats] = profiler.top()
+    assert stats["collection"] == "tasks" and stats["count"] == 3 and stats["slowCount"] == 1
+    assert stats["maxMs"] == 9.0 and stats["endpoints"] == {"background": 3}
+
+def test_profiler_keeps_and_cancels_sampled_explains(monkeypatch):
+    profiler = QueryProfiler(slow_ms=5, sample_rate=1, examined_ratio=100, max_shapes=10, explain_cooldown=300)
+    started = []
+
+    async def hanging_explain(*args):
+        started.append(args)
+        await asyncio.Event().wait()
+    monkeypatch.setattr(profiler, "_explain", hanging_explain)
+
+    async def run():
+        profiler.started(SimpleNamespace(command_name="find", command={"find": "tasks", "filter": {"userId": 1}}, database_name="db", request_id=1, connection_id=1))
+        profiler.succeeded(SimpleNamespace(request_id=1, connection_id=1, duration_micros=9000))
+        await asyncio.sleep(0)
+        # Referenced while running, so it is not garbage collected halfway
+        assert len(started) == 1 and len(profiler._explains) == 1
+        await profiler.stop()
+        await asyncio.sleep(0)
+        assert not profiler._explains
+    asyncio.run(run())
+
+def test_admin_query_report_requires_token(monkeypatch):
+    assert client.get("/admin/queries").status_code == 404
+    monkeypatch.setattr(routers.admin, "ADMIN_TOKEN", "admin-secret")
+    assert client.get("/admin/queries", headers={"Authorization": "Bearer wrong"}).status_code == 404
+    response = client.get("/admin/queries?order=maxMs", headers={"Authorization": "Bearer admin-secret"})
+    assert response.status_code == 200
+    assert response.json()["slowMs"] == query_profiler.slow_ms
+
+def test_admin_orphan_sweep(monkeypatch):
+    assert client.post("/admin/orphans/sweep").status_code == 404
+    monkeypatch.setattr(routers.admin, "ADMIN_TOKEN", "admin-secret")
+    user_id = ObjectId()
+    tasks_collection.insert_one({"userId": user_id, "courseId": ObjectId(), "title": "Orphan", "status": "active"})
+    response = client.post("/admin/orphans/sweep", headers={"Authorization": "Bearer admin-secret"})
+    assert response.status_code == 200 and response.json()["deleted"] >= 1
+    assert tasks_collection.count_documents({"userId": user_id}) == 0
+
+
+# --- Search Tests ---
+
+def test_search_ranks_highlights_and_pages(auth_headers_user_a, auth_headers_user_b):
+    """Tests that search finds tasks and courses written after the first search, scoped to their owner."""
+    # An early search makes sure later writes are picked up, whichever backend is configured
+    assert client.get("/search", headers=auth_headers_user_a, params={"q": "photosynthesis"}).status_code == 200
+
+    course = client.post("/courses/", headers=auth_headers_user_a, json={"courseName": "Test Course Photosynthesis"}).json()
+    task_data = {"title": "Test Task lab", "description": "Write up the photosynthesis experiment", "courseId": course["id"]}
+    task = client.post("/tasks/", headers=auth_headers_user_a, json=task_data).json()
+
+    response = client.get("/search", headers=auth_headers_user_a, params={"q": "photosynthesis"})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    # The course name outweighs the task description
+    assert [(result["type"], result["id"]) for result in results] == [("course", course["id"]), ("task", task["id"])]
+    [description] = results[1]["highlights"]
+    start, end = description["ranges"][0]
+    assert description["field"] == "description" and description["text"][start:end] == "photosynthesis"
+
+    first_page = client.get("/search", headers=auth_headers_user_a, params={"q": "photosynthesis", "limit": 1})
+    assert first_page.json()["results"][0]["id"] == course["id"]
+    cursor = first_page.headers["X-Next-Cursor"]
+    second_page = client.get("/search", headers=auth_headers_user_a, params={"q": "photosynthesis", "limit": 1, "cursor": cursor})
+    assert second_page.json()["results"][0]["id"] == task["id"]
+    assert "X-Next-Cursor" not in second_page.headers
+
+    assert client.get("/search", headers=auth_headers_user_b, params={"q": "photosynthesis"}).json()["results"] == []
+    client.delete(f"/tasks/{task['id']}", headers=auth_headers_user_a)
+    assert [result["type"] for result in client.get("/search", headers=auth_headers_user_a, params={"q": "photosynthesis"}).json()["results"]] == ["course"]
+
+
+# --- Calendar Feed Tests ---
+
+def test_calendar_feed_is_cached_until_tasks_change(auth_headers_user_a, course_for_user_a):
+    """Tests that polling is served from cache with validators, and that a task write refreshes the feed."""
+    due_date = (datetime.now(timezone.utc) + timedelta(days=3)).replace(microsecond=0)
+    task_data = {"title": "Test Task calendar essay", "courseId": course_for_user_a["id"], "dueDate": due_date.isoformat()}
+    client.post("/tasks/", headers=auth_headers_user_a, json=task_data)
+
+    feed_url = client.post("/calendar/token", headers=auth_headers_user_a).json()["url"]
+    response = client.get(feed_url)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    assert "SUMMARY:[Test Course for Tasks] Test Task calendar essay" in response.text
+    assert f"DTSTART:{due_date.strftime('%Y%m%dT%H%M%SZ')}" in response.text
+
+    renders = calendar_feeds.renders
+    cached = client.get(feed_url, headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert client.get(feed_url, headers={"If-Modified-Since": response.headers["Last-Modified"]}).status_code == 304
+    assert calendar_feeds.renders == renders
+
+    task_data["title"] = "Test Task calendar lab"
+    client.post("/tasks/", headers=auth_headers_user_a, json=task_data)
+    refreshed = client.get(feed_url, headers={"If-None-Match": response.headers["ETag"]})
+    assert refreshed.status_code == 200
+    assert "Test Task calendar lab" in refreshed.text
+
+    # A new token replaces the old feed URL
+    client.post("/calendar/token", headers=auth_headers_user_a)
+    assert client.get(feed_url).status_code == 404
+
+def test_calendar_feed_cache_rechecks_token(auth_headers_user_a):
+    """A token rotated where this worker never hears the event (another worker, local broker) stops working at once."""
+    feed_url = client.post("/calendar/token", headers=auth_headers_user_a).json()["url"]
+    assert client.get(feed_url).status_code == 200
+    renders = calendar_feeds.renders
+    assert client.get(feed_url).status_code == 200
+    assert calendar_feeds.renders == renders
+
+    # Rotated behind the cache's back: no "calendar.token" event reaches this worker
+    users_collection.update_one({"email": USER_A_DATA["email"]}, {"$set": {"calendarTokenHash": "rotated-elsewhere"}})
+    assert client.get(feed_url).status_code == 404
+    client.delete("/calendar/token", headers=auth_headers_user_a)
@@ -1,9 +1,21 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from bson import ObjectId
+from datetime import datetime, timedelta, timezone
 
 from main import app
-from database import courses_collection, users_collection
+from database import get_sync_database
+import purge
+import routers.search
+from reminders import NotificationDelivery, ReminderScheduler
+from search import MongoTextSearch
+
+# The app talks to Mongo asynchronously; fixtures clean up through a blocking handle
+db = get_sync_database()
+courses_collection = db.courses
+tasks_collection = db.tasks
+users_collection = db.users
 
 client = TestClient(app)
 
@@ -17,7 +29,9 @@ TEST_USER_B = {"email": "testuserB@example.com", "password": "password456", "use
 def setup_and_teardown_db():
     users_collection.delete_many({"email": {"$in": [TEST_USER_A["email"], TEST_USER_B["email"]]}})
     courses_collection.delete_many({"userId": {"$exists": True}})
-    yield
+    # Entering the client runs the app lifespan, which creates the indexes
+    with client:
+        yield
     users_collection.delete_many({"email": {"$in": [TEST_USER_A["email"], TEST_USER_B["email"]]}})
     courses_collection.delete_many({"userId": {"$exists": True}})
 
@@ -91,8 +105,124 @@ def test_delete_course_success(auth_headers_user_a):
     delete_response = client.delete(f"/courses/{course_id}", headers=auth_headers_user_a)
     assert delete_response.status_code == 204
 
+def test_delete_course_purges_tasks(auth_headers_user_a):
+    course_id = client.post("/courses", headers=auth_headers_user_a, json={"courseName": "Course With Tasks"}).json()["id"]
+    for index in range(3):
+        client.post("/tasks", headers=auth_headers_user_a, json={"title": f"Cascade Task {index}", "courseId": course_id})
+
+    assert client.delete(f"/courses/{course_id}", headers=auth_headers_user_a).status_code == 204
+    assert client.get(f"/courses/{course_id}", headers=auth_headers_user_a).status_code == 404
+    assert client.delete(f"/courses/{course_id}", headers=auth_headers_user_a).status_code == 404
+    # The purge runs after the response; TestClient waits for it
+    assert tasks_collection.count_documents({"courseId": ObjectId(course_id)}) == 0
+    assert courses_collection.find_one({"_id": ObjectId(course_id)}) is None
+
+def test_purge_resumes_tombstoned_courses_and_sweeps_orphans(monkeypatch):
+    user_id, orphan_course_id = ObjectId(), ObjectId()
+    # A course whose purge was interrupted, and tasks whose course is gone entirely
+    course_id = courses_collection.insert_one({"userId": user_id, "courseName": "Half Deleted", "deletedAt": datetime.now(timezone.utc)}).inserted_id
+    tasks_collection.insert_many([{"userId": user_id, "courseId": course_id, "title": "Leftover", "status": "active"} for _ in range(3)])
+    tasks_collection.insert_one({"userId": user_id, "courseId": orphan_course_id, "title": "Orphan", "status": "active"})
+
+    assert asyncio.run(purge.purge_deleted_courses()) == 1
+    assert courses_collection.find_one({"_id": course_id}) is None
+    # A task written as the purge finished is caught by the sweep of recently purged courses
+    tasks_collection.insert_one({"userId": user_id, "courseId": course_id, "title": "Late Write", "status": "active"})
+    assert asyncio.run(purge.sweep_purged_courses()) == 1
+    assert tasks_collection.count_documents({"courseId": course_id}) == 0
+    db.purged_courses.delete_one({"_id": course_id})
+    # Anything older needs the full sweep
+    assert asyncio.run(purge.sweep_orphaned_tasks()) >= 1
+    assert tasks_collection.count_documents({"userId": user_id}) == 0
+
+    # Course IDs are checked in batches; orphans in every batch go, live courses' tasks stay
+    monkeypatch.setattr(purge, "PURGE_BATCH_SIZE", 2)
+    live_course_id = courses_collection.insert_one({"userId": user_id, "courseName": "Still Here"}).inserted_id
+    tasks_collection.insert_many([{"userId": user_id, "courseId": course_id, "title": "Orphan", "status": "active"} for course_id in (ObjectId(), ObjectId(), ObjectId(), live_course_id)])
+    assert asyncio.run(purge.sweep_orphaned_tasks()) >= 3
+    assert [task["courseId"] for task in tasks_collection.find({"userId": user_id})] == [live_course_id]
+    courses_collection.delete_one({"_id": live_course_id})
+    tasks_collection.delete_many({"userId": user_id})
+
+def test_tasks_of_tombstoned_course_are_hidden_before_the_purge(auth_headers_user_a):
+    course_id = client.post("/courses", headers=auth_headers_user_a, json={"courseName": "Deleted Mid Purge"}).json()["id"]
+    due_date = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    task_id = client.post("/tasks", headers=auth_headers_user_a, json={"title": "Not Purged Yet", "courseId": course_id, "dueDate": due_date}).json()["id"]
+    # Tombstoned, with the purge of its tasks still to come
+    courses_collection.update_one({"_id": ObjectId(course_id)}, {"$set": {"deletedAt": datetime.now(timezone.utc)}})
+    try:
+        assert task_id not in [task["id"] for task in client.get("/tasks/", headers=auth_headers_user_a).json()]
+        assert client.get(f"/tasks/?course_id={course_id}&limit=10", headers=auth_headers_user_a).json() == []
+        reminders = client.get("/tasks/reminders", headers=auth_headers_user_a).json()
+        assert task_id not in [task["id"] for task in reminders["dueSoon"]]
+        dashboard = client.get("/dashboard", headers=auth_headers_user_a).json()
+        assert task_id not in [task["id"] for task in dashboard["tasks"]] and course_id not in dashboard["taskCounts"]
+
+        # The scheduler skips its reminders
+        scheduler = ReminderScheduler(NotificationDelivery(), due_soon=timedelta(hours=24), horizon=timedelta(hours=48))
+        scheduler._loaded_until = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=48)
+        scheduler.schedule(tasks_collection.find_one({"_id": ObjectId(task_id)}))
+        asyncio.run(scheduler.run_due())
+        assert scheduler.stats()["fired"] == 0 and scheduler.stats()["skipped"] == 1
+
+        # Text search filters them out too
+        class RecordingCollection:
+            def find(self, query, projection):
+                self.query = query
+                return self
+            def sort(self, sort):
+                return self
+            def limit(self, limit):
+                return self
+            async def to_list(self):
+                return []
+        collection = RecordingCollection()
+        source = ("task", collection, routers.search.live_task_filter, {}, None)
+        asyncio.run(MongoTextSearch([source]).search(tasks_collection.find_one({"_id": ObjectId(task_id)})["userId"], "purged", 10, 0))
+        assert ObjectId(course_id) in collection.query["courseId"]["$nin"]
+    finally:
+        asyncio.run(purge.purge_deleted_courses())
+
 def test_delete_course_unauthorized_access(auth_headers_user_a, auth_headers_user_b):
     create_response = client.post("/courses", headers=auth_headers_user_a, json={"courseName": "User A's Private Course"})
     course_id_user_a = create_response.json()["id"]
     delete_response = client.delete(f"/courses/{course_id_user_a}", headers=auth_headers_user_b)
     assert delete_response.status_code == 404
+
+def test_get_courses_paginated(auth_headers_user_a):
+    all_ids = [course["id"] for course in client.get("/courses", headers=auth_headers_user_a).json()]
+    assert len(all_ids) > 2
+
+    first_page = client.get("/courses?limit=2", headers=auth_headers_user_a)
+    assert first_page.status_code == 200
+    assert len(first_page.json()) == 2
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    rest = client.get(f"/courses?limit=100&cursor={cursor}", headers=auth_headers_user_a)
+    assert rest.status_code == 200
+    assert "X-Next-Cursor" not in rest.headers
+    paged_ids = [course["id"] for course in first_page.json() + rest.json()]
+    assert sorted(paged_ids) == sorted(all_ids)
+
+def test_get_courses_invalid_cursor(auth_headers_user_a):
+    response = client.get("/courses?limit=2&cursor=not-a-cursor", headers=auth_headers_user_a)
+    assert response.status_code == 400
+
+def test_get_courses_conditional_get(auth_headers_user_a):
+    first = client.get("/courses", headers=auth_headers_user_a)
+    etag = first.headers["ETag"]
+
+    cached = client.get("/courses", headers={**auth_headers_user_a, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # Any write moves the user's data version, so the old ETag no longer matches
+    client.post("/courses", headers=auth_headers_user_a, json={"courseName": "Cache Buster"})
+    refreshed = client.get("/courses", headers={**auth_headers_user_a, "If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["ETag"] != etag
+
+def test_conditional_get_etag_is_per_url(auth_headers_user_a):
+    list_etag = client.get("/courses", headers=auth_headers_user_a).headers["ETag"]
+    page_etag = client.get("/courses?limit=1", headers=auth_headers_user_a).headers["ETag"]
+    assert list_etag != page_etag
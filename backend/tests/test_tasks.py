@@ -1,9 +1,24 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from bson import ObjectId
+from datetime import datetime, timedelta, timezone
 
 from main import app
-from database import tasks_collection, courses_collection, users_collection
+import archive
+import database
+from database import get_sync_database
+from reminders import NotificationDelivery, ReminderScheduler
+import routers.tasks
+
+# The app talks to Mongo asynchronously; fixtures clean up through a blocking handle
+db = get_sync_database()
+tasks_collection = db.tasks
+tasks_archive_collection = db.tasks_archive
+notifications_collection = db.notifications
+migrations_collection = db.migrations
+courses_collection = db.courses
+users_collection = db.users
 
 client = TestClient(app)
 
@@ -21,12 +36,18 @@ def setup_and_teardown_db():
     users_collection.delete_many({"email": {"$in": user_emails}})
     courses_collection.delete_many({"userId": {"$in": user_ids}})
     tasks_collection.delete_many({"userId": {"$in": user_ids}})
-    yield
+    tasks_archive_collection.delete_many({"userId": {"$in": user_ids}})
+    notifications_collection.delete_many({"userId": {"$in": user_ids}})
+    # Entering the client runs the app lifespan, which creates the indexes
+    with client:
+        yield
     users_collection.delete_many({"email": {"$in": user_emails}})
     users = list(users_collection.find({"email": {"$in": user_emails}}))
     user_ids = [user["_id"] for user in users]
     courses_collection.delete_many({"userId": {"$in": user_ids}})
     tasks_collection.delete_many({"userId": {"$in": user_ids}})
+    tasks_archive_collection.delete_many({"userId": {"$in": user_ids}})
+    notifications_collection.delete_many({"userId": {"$in": user_ids}})
 
 
 @pytest.fixture(scope="module")
@@ -89,4 +110,213 @@ def test_delete_task_success(auth_headers_user_a, course_for_user_a):
     task_response = client.post("/tasks", headers=auth_headers_user_a, json={"title": "To Be Deleted", "courseId": course_for_user_a})
     task_id = task_response.json()["id"]
     delete_response = client.delete(f"/tasks/{task_id}", headers=auth_headers_user_a)
-    assert delete_response.status_code == 204
\ No newline at end of file
+    assert delete_response.status_code == 204
+
+def test_get_tasks_paginated_by_due_date(auth_headers_user_a, course_for_user_a):
+    due_dates = ["2030-01-03T09:00:00", None, "2030-01-01T09:00:00", "2030-01-02T09:00:00"]
+    for index, due_date in enumerate(due_dates):
+        task_data = {"title": f"Paged Task {index}", "courseId": course_for_user_a, "dueDate": due_date}
+        client.post("/tasks", headers=auth_headers_user_a, json=task_data)
+
+    pages, cursor = [], None
+    while True:
+        url = f"/tasks?course_id={course_for_user_a}&limit=3" + (f"&cursor={cursor}" if cursor else "")
+        response = client.get(url, headers=auth_headers_user_a)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [3, 1]
+    titles = [task["title"] for page in pages for task in page]
+    # Tasks without a due date sort first
+    assert titles == ["Paged Task 1", "Paged Task 2", "Paged Task 3", "Paged Task 0"]
+
+def test_get_tasks_filtered_and_sorted_by_priority(auth_headers_user_a, course_for_user_a):
+    for title, priority in [("Low Task", "Low"), ("High Task", "High"), ("Medium Task", "Medium")]:
+        task_data = {"title": title, "courseId": course_for_user_a, "priority": priority, "dueDate": "2030-02-01T09:00:00"}
+        client.post("/tasks", headers=auth_headers_user_a, json=task_data)
+    client.post("/tasks", headers=auth_headers_user_a, json={"title": "Done Task", "courseId": course_for_user_a, "status": "complete"})
+
+    response = client.get(f"/tasks?course_id={course_for_user_a}&status=active&sort=priority", headers=auth_headers_user_a)
+    assert response.status_code == 200
+    # Priority sorts in its real order, not alphabetically
+    assert [task["title"] for task in response.json()] == ["High Task", "Medium Task", "Low Task"]
+
+    response = client.get(f"/tasks?course_id={course_for_user_a}&sort=-priority&limit=2", headers=auth_headers_user_a)
+    assert [task["priority"] for task in response.json()] == ["Low", "Medium"]
+
+    response = client.get(f"/tasks?course_id={course_for_user_a}&priority=High&due_before=2030-03-01T00:00:00", headers=auth_headers_user_a)
+    assert [task["title"] for task in response.json()] == ["High Task"]
+
+def test_priority_rank_backfill_runs_once():
+    user_id = ObjectId()
+    migrations_collection.delete_one({"_id": routers.tasks.PRIORITY_RANK_MIGRATION})
+    first = tasks_collection.insert_one({"userId": user_id, "title": "Before Ranks", "priority": "High", "status": "active"}).inserted_id
+    asyncio.run(routers.tasks.backfill_priority_rank())
+    assert tasks_collection.find_one({"_id": first})["priorityRank"] == 3
+    assert migrations_collection.find_one({"_id": routers.tasks.PRIORITY_RANK_MIGRATION}) is not None
+
+    # Later startups skip the scan
+    second = tasks_collection.insert_one({"userId": user_id, "title": "Also Before Ranks", "priority": "High", "status": "active"}).inserted_id
+    asyncio.run(routers.tasks.backfill_priority_rank())
+    assert "priorityRank" not in tasks_collection.find_one({"_id": second})
+    tasks_collection.delete_many({"userId": user_id})
+
+def test_get_reminders(auth_headers_user_b):
+    course_id = client.post("/courses", headers=auth_headers_user_b, json={"courseName": "Reminder Course"}).json()["id"]
+    now = datetime.now(timezone.utc)
+    tasks = [
+        ("Overdue Task", now - timedelta(days=1), "active"),
+        ("Due Soon Task", now + timedelta(hours=2), "active"),
+        ("Later Task", now + timedelta(days=5), "active"),
+        ("Finished Overdue Task", now - timedelta(days=2), "complete"),
+    ]
+    for title, due_date, task_status in tasks:
+        task_data = {"title": title, "courseId": course_id, "dueDate": due_date.isoformat(), "status": task_status}
+        client.post("/tasks", headers=auth_headers_user_b, json=task_data)
+
+    response = client.get("/tasks/reminders", headers=auth_headers_user_b)
+    assert response.status_code == 200
+    data = response.json()
+    assert [task["title"] for task in data["overdue"]] == ["Overdue Task"]
+    assert [task["title"] for task in data["dueSoon"]] == ["Due Soon Task"]
+    assert data["overdueCount"] == 1
+    assert data["dueSoonCount"] == 1
+
+    response = client.get("/tasks/reminders?window_hours=168", headers=auth_headers_user_b)
+    assert response.json()["dueSoonCount"] == 2
+
+def test_created_task_matches_stored_task(auth_headers_user_a, course_for_user_a):
+    # An offset and microseconds: Mongo keeps naive UTC to the millisecond
+    task_data = {"title": "Precise Echo", "courseId": course_for_user_a, "dueDate": "2030-05-01T14:00:00.123456+02:00"}
+    created = client.post("/tasks", headers=auth_headers_user_a, json=task_data).json()
+    assert created["dueDate"] == "2030-05-01T12:00:00.123000"
+    assert client.get(f"/tasks/{created['id']}", headers=auth_headers_user_a).json() == created
+
+    bulk = client.post("/tasks/bulk", headers=auth_headers_user_a, json={"tasks": [task_data]}).json()["results"][0]["task"]
+    assert client.get(f"/tasks/{bulk['id']}", headers=auth_headers_user_a).json() == bulk
+    updated = client.put(f"/tasks/{bulk['id']}", headers=auth_headers_user_a, json={"dueDate": "2030-05-02T00:00:00.999999Z"}).json()
+    assert updated["dueDate"] == "2030-05-02T00:00:00.999000"
+
+def test_update_task_unauthorized(auth_headers_user_a, auth_headers_user_b, course_for_user_a):
+    task_response = client.post("/tasks", headers=auth_headers_user_a, json={"title": "Private Task", "courseId": course_for_user_a})
+    task_id = task_response.json()["id"]
+    response = client.put(f"/tasks/{task_id}", headers=auth_headers_user_b, json={"title": "Hijacked Title"})
+    assert response.status_code == 404
+    response = client.get(f"/tasks/{task_id}", headers=auth_headers_user_a)
+    assert response.json()["title"] == "Private Task"
+
+def test_bulk_create_update_and_delete_tasks(auth_headers_user_a, auth_headers_user_b, course_for_user_a):
+    other_course = client.post("/courses", headers=auth_headers_user_b, json={"courseName": "Other User Course"}).json()["id"]
+    payload = {"tasks": [
+        {"title": "Bulk Task 1", "courseId": course_for_user_a},
+        {"title": "Bulk Task 2", "courseId": course_for_user_a, "priority": "High"},
+        {"title": "Bulk Task 3", "courseId": other_course},
+        {"title": "Bulk Task 4", "courseId": "not-an-id"},
+    ]}
+    response = client.post("/tasks/bulk", headers=auth_headers_user_a, json=payload)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [201, 201, 404, 400]
+    created_ids = [result["id"] for result in results[:2]]
+
+    payload = {"tasks": [{"id": task_id, "status": "complete"} for task_id in created_ids]}
+    response = client.patch("/tasks/bulk", headers=auth_headers_user_a, json=payload)
+    assert [result["task"]["status"] for result in response.json()["results"]] == ["complete", "complete"]
+
+    # User B can neither update nor delete User A's tasks
+    response = client.request("DELETE", "/tasks/bulk", headers=auth_headers_user_b, json={"ids": created_ids})
+    assert [result["status"] for result in response.json()["results"]] == [404, 404]
+
+    response = client.request("DELETE", "/tasks/bulk", headers=auth_headers_user_a, json={"ids": created_ids})
+    assert [result["status"] for result in response.json()["results"]] == [204, 204]
+    assert client.get(f"/tasks/{created_ids[0]}", headers=auth_headers_user_a).status_code == 404
+
+def test_completed_task_moves_to_archive(auth_headers_user_a, course_for_user_a):
+    task_id = client.post("/tasks", headers=auth_headers_user_a, json={"title": "Archive Me", "courseId": course_for_user_a}).json()["id"]
+    response = client.put(f"/tasks/{task_id}", headers=auth_headers_user_a, json={"status": "complete"})
+    assert response.status_code == 200
+    assert tasks_collection.find_one({"_id": ObjectId(task_id)}) is None
+    assert tasks_archive_collection.find_one({"_id": ObjectId(task_id)}) is not None
+
+    # Archived tasks are still reachable by ID and through the archive listing, but not the working set
+    assert client.get(f"/tasks/{task_id}", headers=auth_headers_user_a).json()["status"] == "complete"
+    archived = client.get(f"/tasks/archive?course_id={course_for_user_a}", headers=auth_headers_user_a).json()
+    assert task_id in [task["id"] for task in archived]
+    active = client.get(f"/tasks?course_id={course_for_user_a}", headers=auth_headers_user_a).json()
+    assert task_id not in [task["id"] for task in active]
+
+    # Reopening the task brings it back into the hot collection
+    client.put(f"/tasks/{task_id}", headers=auth_headers_user_a, json={"status": "active"})
+    assert tasks_collection.find_one({"_id": ObjectId(task_id)}) is not None
+    assert tasks_archive_collection.find_one({"_id": ObjectId(task_id)}) is None
+    assert client.delete(f"/tasks/{task_id}", headers=auth_headers_user_a).status_code == 204
+
+def test_archive_mover_invalidates_etags_and_keeps_concurrent_changes(auth_headers_user_a, course_for_user_a):
+    task_ids = [client.post("/tasks", headers=auth_headers_user_a, json={"title": title, "courseId": course_for_user_a}).json()["id"] for title in ("Swept", "Edited While Moving")]
+    # Completed before the archive existed, so still in the hot collection
+    tasks_collection.update_many({"_id": {"$in": [ObjectId(task_id) for task_id in task_ids]}}, {"$set": {"status": "complete"}})
+    etag = client.get("/tasks/archive", headers=auth_headers_user_a).headers["ETag"]
+
+    class EditedWhileMoving:
+        """The hot collection, with a user edit landing between the copy and the delete."""
+        def __getattr__(self, name):
+            return getattr(database.tasks_collection, name)
+        async def bulk_write(self, requests, ordered=True):
+            tasks_collection.update_one({"_id": ObjectId(task_ids[1])}, {"$set": {"title": "Edited"}})
+            return await database.tasks_collection.bulk_write(requests, ordered=ordered)
+
+    moved = asyncio.run(archive._move_tasks(EditedWhileMoving(), database.tasks_archive_collection, {"_id": {"$in": [ObjectId(task_id) for task_id in task_ids]}}))
+    assert [str(document["_id"]) for document in moved] == [task_ids[0]]
+    # The edit survives in the hot collection, and the stale copy is gone from the archive
+    assert tasks_collection.find_one({"_id": ObjectId(task_ids[1])})["title"] == "Edited"
+    assert tasks_archive_collection.find_one({"_id": ObjectId(task_ids[1])}) is None
+
+    # The background sweep picks it up next time, and cached listings go stale
+    assert asyncio.run(archive.archive_inactive_tasks()) >= 1
+    assert tasks_archive_collection.find_one({"_id": ObjectId(task_ids[1])})["title"] == "Edited"
+    assert client.get("/tasks/archive", headers={**auth_headers_user_a, "If-None-Match": etag}).status_code == 200
+
+def test_reminder_scheduler_fires_each_reminder_once(auth_headers_user_b):
+    course_for_user_b = client.post("/courses", headers=auth_headers_user_b, json={"courseName": "Scheduler Course"}).json()["id"]
+    due_date = (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()
+    task_id = client.post("/tasks", headers=auth_headers_user_b, json={"title": "Remind Me", "courseId": course_for_user_b, "dueDate": due_date}).json()["id"]
+
+    async def run_scheduler():
+        # A fresh scheduler behaves like another worker, or this one after a restart
+        scheduler = ReminderScheduler(NotificationDelivery(), due_soon=timedelta(hours=24), horizon=timedelta(hours=48))
+        await scheduler.load_window(datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=48))
+        await scheduler.run_due()
+        return scheduler
+
+    asyncio.run(run_scheduler())
+    asyncio.run(run_scheduler())
+    reminders = list(notifications_collection.find({"taskId": ObjectId(task_id)}))
+    assert [reminder["kind"] for reminder in reminders] == ["dueSoon"]
+
+    # Moving the due date replaces the pending reminders instead of adding to them
+    scheduler = ReminderScheduler(NotificationDelivery(), due_soon=timedelta(hours=1), horizon=timedelta(hours=48))
+    scheduler._loaded_until = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=48)
+    task = tasks_collection.find_one({"_id": ObjectId(task_id)})
+    scheduler.schedule(task)
+    scheduler.schedule({**task, "dueDate": task["dueDate"] + timedelta(hours=1)})
+    assert scheduler.stats()["scheduled"] == 1 and scheduler.stats()["heap_size"] == 4
+    scheduler.unschedule(task["_id"])
+    assert scheduler.stats()["scheduled"] == 0
+
+def test_reminder_fires_for_microsecond_due_date(auth_headers_user_b):
+    course_for_user_b = client.post("/courses", headers=auth_headers_user_b, json={"courseName": "Precise Course"}).json()["id"]
+    # Mongo keeps milliseconds, so the stored due date differs from the one the request carried
+    due_date = datetime.now(timezone.utc).replace(microsecond=123456) + timedelta(hours=2)
+    task_id = client.post("/tasks", headers=auth_headers_user_b, json={"title": "Precise Task", "courseId": course_for_user_b, "dueDate": due_date.isoformat()}).json()["id"]
+    task = tasks_collection.find_one({"_id": ObjectId(task_id)})
+
+    scheduler = ReminderScheduler(NotificationDelivery(), due_soon=timedelta(hours=24), horizon=timedelta(hours=48))
+    scheduler._loaded_until = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=48)
+    # Scheduled from the request's value, as create_task does
+    scheduler.schedule({**task, "dueDate": due_date})
+    asyncio.run(scheduler.run_due())
+    # The app's own scheduler may have fired it first; either way it fires exactly once
+    assert [reminder["kind"] for reminder in notifications_collection.find({"taskId": ObjectId(task_id)})] == ["dueSoon"]
@@ -1,8 +1,19 @@
+import asyncio
+import threading
+import time
 import pytest
 from fastapi.testclient import TestClient
 
+import auth
 from main import app 
-from database import users_collection
+from database import get_sync_database
+from hashing import HashPool, hash_pool
+from ratelimit import TokenBucket, login_throttle
+
+# The app talks to Mongo asynchronously; fixtures clean up through a blocking handle
+db = get_sync_database()
+users_collection = db.users
+refresh_tokens_collection = db.refresh_tokens
 
 client = TestClient(app)
 
@@ -12,6 +23,14 @@ TEST_USER = {
     "email": "test1@example.com",
     "password": "strongpassword123"
 }
+EMAIL_CHANGE_USER = {
+    "username": "test_user_2",
+    "email": "test2@example.com",
+    "password": "strongpassword456"
+}
+CHANGED_EMAIL = "test2-changed@example.com"
+REFRESH_USER_EMAIL = "test3@example.com"
+TEST_EMAILS = [TEST_USER["email"], EMAIL_CHANGE_USER["email"], CHANGED_EMAIL, REFRESH_USER_EMAIL]
 
 # --- Fixtures ---
 @pytest.fixture(scope="module", autouse=True)
@@ -21,9 +40,12 @@ def setup_and_teardown_db():
     is removed from the database before the tests start and after they finish,
     ensuring a clean state.
     """
-    users_collection.delete_one({"email": TEST_USER["email"]})
-    yield
-    users_collection.delete_one({"email": TEST_USER["email"]})
+    users_collection.delete_many({"email": {"$in": TEST_EMAILS}})
+    # Entering the client runs the app lifespan, which creates the indexes
+    with client:
+        yield
+    users_collection.delete_many({"email": {"$in": TEST_EMAILS}})
+    refresh_tokens_collection.delete_many({"email": {"$in": TEST_EMAILS}})
 
 @pytest.fixture(scope="module")
 def register_test_user():
@@ -63,6 +85,7 @@ def test_login_user_success(register_test_user):
     assert response.status_code == 202
     data = response.json()
     assert "access_token" in data
+    assert "refresh_token" in data
     assert data["token_type"] == "bearer"
 
 def test_login_user_incorrect_password(register_test_user):
@@ -79,4 +102,140 @@ def test_login_user_nonexistent_email():
     """
     login_data = {"username": "nosuchuser@example.com", "password": "password123"}
     response = client.post("/users/login", data=login_data)
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+# --- Test Cases for Refresh Tokens ---
+
+def login_test_user() -> dict:
+    login_data = {"username": TEST_USER["email"], "password": TEST_USER["password"]}
+    return client.post("/users/login", data=login_data).json()
+
+def test_refresh_rotates_tokens(register_test_user):
+    """
+    Tests that a refresh token buys a working access token and a new refresh token,
+    that a quick replay (a second tab) gets the same successor, and that replaying a
+    token whose successor was already spent revokes the tokens issued after it.
+    """
+    first = login_test_user()["refresh_token"]
+    response = client.post("/users/refresh", json={"refresh_token": first})
+    assert response.status_code == 200
+    second = response.json()
+    assert second["refresh_token"] != first
+    headers = {"Authorization": f"Bearer {second['access_token']}"}
+    assert client.get("/courses/", headers=headers).status_code == 200
+
+    # Another tab refreshing with the same token moments later is handed the same successor
+    replay = client.post("/users/refresh", json={"refresh_token": first})
+    assert replay.status_code == 200
+    assert replay.json()["refresh_token"] == second["refresh_token"]
+
+    third = client.post("/users/refresh", json={"refresh_token": second["refresh_token"]}).json()
+    # The successor has moved on, so this replay is treated as theft: the whole family is revoked
+    assert client.post("/users/refresh", json={"refresh_token": first}).status_code == 401
+    assert client.post("/users/refresh", json={"refresh_token": third["refresh_token"]}).status_code == 401
+
+def test_refresh_replay_after_grace_revokes_family(register_test_user, monkeypatch):
+    """Tests that a spent token replayed after the grace period revokes its family."""
+    monkeypatch.setattr(auth, "REFRESH_REUSE_GRACE_SECONDS", 0)
+    first = login_test_user()["refresh_token"]
+    second = client.post("/users/refresh", json={"refresh_token": first}).json()["refresh_token"]
+    assert client.post("/users/refresh", json={"refresh_token": first}).status_code == 401
+    assert client.post("/users/refresh", json={"refresh_token": second}).status_code == 401
+
+def test_change_password_revokes_refresh_tokens():
+    """Tests that changing the password signs every session out of refreshing."""
+    user = {"username": "refresh_user", "email": REFRESH_USER_EMAIL, "password": "strongpassword789"}
+    client.post("/users/register", json=user)
+    tokens = client.post("/users/login", data={"username": user["email"], "password": user["password"]}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    password_data = {"current_password": user["password"], "new_password": "evenstrongerpassword"}
+    assert client.put("/users/me/password", headers=headers, json=password_data).status_code == 204
+    assert client.post("/users/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+# --- Test Cases for Account Changes ---
+
+def test_change_email_invalidates_cached_user():
+    """
+    Tests that a token issued for the old email stops working after an email change,
+    even though the user was cached by the previous authenticated request.
+    """
+    client.post("/users/register", json=EMAIL_CHANGE_USER)
+    login_data = {"username": EMAIL_CHANGE_USER["email"], "password": EMAIL_CHANGE_USER["password"]}
+    token = client.post("/users/login", data=login_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/courses/", headers=headers).status_code == 200
+
+    email_data = {"new_email": CHANGED_EMAIL, "password": EMAIL_CHANGE_USER["password"]}
+    response = client.put("/users/me/email", headers=headers, json=email_data)
+    assert response.status_code == 200
+    assert response.json()["email"] == CHANGED_EMAIL
+
+    assert client.get("/courses/", headers=headers).status_code == 401
+
+# --- Test Cases for Login Throttling ---
+
+def test_login_answers_503_when_hash_pool_is_full(register_test_user, monkeypatch):
+    """
+    Tests that a login arriving while every hash pool worker and queue slot is taken is
+    turned away with 503 and a Retry-After header, and that the pool's counters add up.
+    """
+    pool = HashPool(max_workers=1, max_queue=1)
+    monkeypatch.setattr(auth, "hash_pool", pool)
+    release = threading.Event()
+
+    async def fill_pool():
+        # One call holds the only worker and one waits in the queue
+        await asyncio.gather(pool.run(release.wait), pool.run(release.wait))
+
+    filler = threading.Thread(target=asyncio.run, args=(fill_pool(),))
+    filler.start()
+    try:
+        for _ in range(500):
+            if pool.in_flight == 2:
+                break
+            time.sleep(0.01)
+        assert pool.stats()["in_flight"] == 2 and pool.stats()["queue_depth"] == 1
+
+        login_data = {"username": TEST_USER["email"], "password": TEST_USER["password"]}
+        response = client.post("/users/login", data=login_data)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert pool.stats()["rejected"] == 1
+    finally:
+        release.set()
+        filler.join()
+    assert pool.stats()["in_flight"] == 0 and pool.stats()["completed"] == 2
+
+    # A hash that raises is counted as failed, not completed
+    def broken_hash():
+        raise ValueError("bad hash")
+    with pytest.raises(ValueError):
+        asyncio.run(pool.run(broken_hash))
+    assert pool.stats()["failed"] == 1 and pool.stats()["completed"] == 2
+    pool.shutdown()
+
+def test_login_is_throttled_per_account(register_test_user, monkeypatch):
+    """
+    Tests that attempts beyond the account's burst get 429 with a Retry-After header,
+    without another bcrypt call, and that other accounts are not affected.
+    """
+    monkeypatch.setattr(login_throttle, "per_account", TokenBucket(capacity=2, refill_per_second=0.01))
+    login_throttle.store.clear()
+    login_data = {"username": TEST_USER["email"], "password": "wrongpassword"}
+    try:
+        assert client.post("/users/login", data=login_data).status_code == 401
+        assert client.post("/users/login", data=login_data).status_code == 401
+
+        completed = hash_pool.completed
+        response = client.post("/users/login", data=login_data)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+        assert hash_pool.completed == completed
+
+        other_account = {"username": "someone-else@example.com", "password": "wrongpassword"}
+        assert client.post("/users/login", data=other_account).status_code == 401
+        assert 'auth_throttled_attempts_total{endpoint="login",scope="account"}' in client.get("/metrics").text
+    finally:
+        login_throttle.store.clear()
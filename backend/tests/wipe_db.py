@@ -19,6 +19,7 @@ try:
     users_collection = db.users
     courses_collection = db.courses
     tasks_collection = db.tasks
+    tasks_archive_collection = db.tasks_archive
     print("✅ Successfully connected to MongoDB.")
 except Exception as e:
     print(f"❌ Error connecting to MongoDB: {e}")
@@ -28,13 +29,14 @@ except Exception as e:
 
 def wipe_database():
     """
-    Deletes all documents from the users, courses, and tasks collections
+    Deletes all documents from the users, courses, tasks and archived tasks collections
     after receiving user confirmation.
     """
     print("\n🚨 WARNING: This script will permanently delete all data from the following collections:")
     print(f"   - {users_collection.name}")
     print(f"   - {courses_collection.name}")
     print(f"   - {tasks_collection.name}")
+    print(f"   - {tasks_archive_collection.name}")
     
     # Safety confirmation prompt
     confirmation = input("\n👉 Are you sure you want to continue? Type 'yes' to proceed: ")
@@ -50,6 +52,7 @@ def wipe_database():
         users_deleted = users_collection.delete_many({}).deleted_count
         courses_deleted = courses_collection.delete_many({}).deleted_count
         tasks_deleted = tasks_collection.delete_many({}).deleted_count
+        tasks_deleted += tasks_archive_collection.delete_many({}).deleted_count
         
         print("\n--- Deletion Report ---")
         print(f"✅ Users deleted: {users_deleted}")
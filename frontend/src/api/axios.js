@@ -32,18 +32,55 @@ apiClient.interceptors.request.use(
 
 // --- Response Interceptor ---
 // This new part inspects every incoming response from the API.
+
+// One refresh at a time: requests that fail together wait for the same new token,
+// because a refresh token can only be spent once.
+let refreshPromise = null;
+
+const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshPromise = axios
+      .post(`${import.meta.env.VITE_API_BASE_URL}/users/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('token', response.data.access_token);
+        localStorage.setItem('refreshToken', response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 apiClient.interceptors.response.use(
   // If the response is successful (status 2xx), just return it.
   (response) => response,
 
   // If the response has an error...
-  (error) => {
+  async (error) => {
     // Check if the error is a 401 Unauthorized response.
     if (error.response && error.response.status === 401) {
+      const originalRequest = error.config;
+
+      // The access token has probably expired: renew it once and retry the request.
+      if (localStorage.getItem('refreshToken') && !originalRequest._retried) {
+        originalRequest._retried = true;
+        try {
+          const token = await refreshAccessToken();
+          originalRequest.headers.Authorization = `Bearer ${token}`;
+          return apiClient(originalRequest);
+        } catch {
+          // The refresh token is expired or revoked; fall through to logging out.
+        }
+      }
+
       console.log("Caught 401 Unauthorized. Logging out.");
 
-      // Remove the invalid token from storage.
+      // Remove the invalid tokens from storage.
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
 
       // Redirect the user to the login page.
       // We use window.location.hash to work with our simple router.
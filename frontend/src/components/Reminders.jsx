@@ -1,7 +1,8 @@
 import React from 'react';
 
-const Reminders = ({ tasks }) => {
-    const { overdue, dueSoon } = tasks;
+// `reminders` is a GET /tasks/reminders response; each list is capped, the counts are not.
+const Reminders = ({ reminders }) => {
+    const { overdue, dueSoon, overdueCount, dueSoonCount } = reminders;
 
     if (overdue.length === 0 && dueSoon.length === 0) {
         return null;
@@ -16,6 +17,7 @@ const Reminders = ({ tasks }) => {
                         {overdue.map(task => (
                             <li key={task.id}>{task.title}</li>
                         ))}
+                        {overdueCount > overdue.length && <li>and {overdueCount - overdue.length} more</li>}
                     </ul>
                 </div>
             )}
@@ -26,6 +28,7 @@ const Reminders = ({ tasks }) => {
                         {dueSoon.map(task => (
                             <li key={task.id}>{task.title}</li>
                         ))}
+                        {dueSoonCount > dueSoon.length && <li>and {dueSoonCount - dueSoon.length} more</li>}
                     </ul>
                 </div>
             )}
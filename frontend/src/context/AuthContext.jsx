@@ -31,8 +31,10 @@ export const AuthProvider = ({ children }) => {
             headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
         });
 
-        const { access_token } = response.data;
+        const { access_token, refresh_token } = response.data;
         localStorage.setItem('token', access_token);
+        // Used by the API client to renew the access token when it expires
+        localStorage.setItem('refreshToken', refresh_token);
         setUser({ token: access_token });
         return response.data;
     };
@@ -50,6 +52,7 @@ export const AuthProvider = ({ children }) => {
     const logout = () => {
         // Clears the user state and removes the token from storage.
         localStorage.removeItem('token');
+        localStorage.removeItem('refreshToken');
         setUser(null);
     };
 
@@ -28,6 +28,8 @@ const Dashboard = () => {
   const [error, setError] = useState('');
   const [showArchived, setShowArchived] = useState(false);
   const [sortConfig,setSortConfig] = useState({key: 'title',direction: 'ascending'});
+  // Overdue and due-soon buckets come from the server, which sees every active task, not just the loaded ones.
+  const [reminders, setReminders] = useState({ overdue: [], dueSoon: [], overdueCount: 0, dueSoonCount: 0 });
 
   // Manage state for modals
   const [isAddCourseModalOpen, setIsAddCourseModalOpen] = useState(false);
@@ -37,19 +39,23 @@ const Dashboard = () => {
   const [courseToEdit, setCourseToEdit] = useState(null);
   const [taskToEdit, setTaskToEdit] = useState(null);
 
+  // Completed tasks are paged in from the archive only when the user opens it.
+  // archiveCursor is the X-Next-Cursor of the last page; null once every page is loaded.
+  const [archiveLoaded, setArchiveLoaded] = useState(false);
+  const [archiveLoading, setArchiveLoading] = useState(false);
+  const [archiveCursor, setArchiveCursor] = useState(null);
+
   // This useEffect hook is the core of our data fetching.
   // It runs once when the component first mounts.
   useEffect(() => {
     const fetchData = async () => {
       try {
         setLoading(true);
-        // We use Promise.all to make both API calls concurrently for better performance.
-        const [coursesResponse, tasksResponse] = await Promise.all([
-          apiClient.get('/courses/'),
-          apiClient.get('/tasks/'),
-        ]);
-        setCourses(coursesResponse.data);
-        setTasks(tasksResponse.data);
+        // GET /dashboard returns the courses, active tasks and reminders in one round trip.
+        const response = await apiClient.get('/dashboard');
+        setCourses(response.data.courses);
+        setTasks(response.data.tasks);
+        setReminders(response.data.reminders);
       } catch (err) {
         console.error('Error fetching dashboard data:', err);
         setError('Failed to load dashboard data.');
@@ -60,29 +66,42 @@ const Dashboard = () => {
     fetchData();
   }, []); // The empty dependency array [] means this effect runs only once.
 
-  // --- Dynamic Reminder Calculation ---
-  // We use useMemo to derive the reminder tasks from the main tasks state.
-  // This logic will automatically re-run whenever the `tasks` array changes.
-  const reminderTasks = useMemo(() => {
-    const now = new Date();
-    const twentyFourHoursFromNow = new Date(now.getTime() + 24 * 60 * 60 * 1000);
-
-    const overdue = [];
-    const dueSoon = [];
+  // Fetches one page of the archive and merges it in; tasks completed in this session may already be here.
+  const loadArchivedPage = async (cursor) => {
+    try {
+      setArchiveLoading(true);
+      const response = await apiClient.get('/tasks/archive', { params: cursor ? { cursor } : {} });
+      setTasks(prevTasks => {
+        const knownIds = new Set(prevTasks.map(task => task.id));
+        return [...prevTasks, ...response.data.filter(task => !knownIds.has(task.id))];
+      });
+      setArchiveCursor(response.headers['x-next-cursor'] || null);
+      setArchiveLoaded(true);
+    } catch (err) {
+      console.error('Error fetching archived tasks:', err);
+      setError('Failed to load completed tasks.');
+    } finally {
+      setArchiveLoading(false);
+    }
+  };
 
-    tasks.forEach(task => {
-      if (task.status === 'active' && task.dueDate) {
-        const dueDate = new Date(task.dueDate);
-        if (dueDate < now) {
-          overdue.push(task);
-        } else if (dueDate <= twentyFourHoursFromNow) {
-          dueSoon.push(task);
-        }
-      }
-    });
+  const handleToggleArchived = () => {
+    if (!showArchived && !archiveLoaded && !archiveLoading) {
+      loadArchivedPage(null);
+    }
+    setShowArchived(!showArchived);
+  };
 
-    return { overdue, dueSoon };
-  }, [tasks]); // The dependency array ensures this runs when `tasks` is updated.
+  // --- Reminders ---
+  // Refetched after every task or course change; a failure keeps the last buckets shown.
+  const refreshReminders = async () => {
+    try {
+      const response = await apiClient.get('/tasks/reminders');
+      setReminders(response.data);
+    } catch (err) {
+      console.error('Error fetching reminders:', err);
+    }
+  };
 
   // Handlers for adding, editing, and deleting courses and tasks.
   // These functions update the state and handle the logic for adding, editing, and deleting courses
@@ -92,6 +111,7 @@ const Dashboard = () => {
 
   const handleTaskAdded = (newTask) => {
     setTasks(prevTasks => [...prevTasks, newTask]);
+    refreshReminders();
   };
 
   const handleEditCourse = (course) => {
@@ -114,6 +134,7 @@ const Dashboard = () => {
 
   const handleTaskUpdated = (updatedTask) => {
     setTasks(prev => prev.map(t => t.id === updatedTask.id ? updatedTask : t));
+    refreshReminders();
   };
 
   const handleCourseDeleted = async (courseId) => {
@@ -124,6 +145,7 @@ const Dashboard = () => {
         setCourses(prevCourses => prevCourses.filter(course => course.id !== courseId));
         // Remove all tasks associated with the deleted course
         setTasks(prevTasks => prevTasks.filter(task => task.courseId !== courseId));
+        refreshReminders();
         // If the deleted course was selected, reset selection to 'all'
         if (selectedCourseId === courseId) {
           setSelectedCourseId('all');
@@ -139,6 +161,7 @@ const Dashboard = () => {
         try {
             await apiClient.delete(`/tasks/${taskId}`);
             setTasks(prev => prev.filter(t => t.id !== taskId));
+            refreshReminders();
         } catch (err) {
             setError("Failed to delete task.");
         }
@@ -219,10 +242,10 @@ const Dashboard = () => {
             onEditCourse={handleEditCourse}
             onDeleteCourse={handleCourseDeleted}
             showArchived={showArchived}
-            onToggleArchived={() => setShowArchived(!showArchived)}
+            onToggleArchived={handleToggleArchived}
           />
           <div className="task-area">
-            <Reminders tasks={reminderTasks} />
+            <Reminders reminders={reminders} />
             <TaskList
             tasks={sortedAndFilteredTasks}
             courses={courses}
@@ -233,6 +256,11 @@ const Dashboard = () => {
             sortConfig={sortConfig}
             onSort={handleSort}
           />
+            {showArchived && archiveCursor && (
+              <button onClick={() => loadArchivedPage(archiveCursor)} className="add-button" disabled={archiveLoading}>
+                {archiveLoading ? 'Loading...' : 'Load more'}
+              </button>
+            )}
           </div>
         </div>
       </div>